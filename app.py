@@ -2,6 +2,7 @@
 import os
 import sys
 import json
+import asyncio
 from typing import Dict
 from pathlib import Path
 from dotenv import load_dotenv
@@ -17,13 +18,14 @@ from langchain_core.runnables.history import RunnableWithMessageHistory
 # from langchain_pinecone import Pinecone
 
 # QDRANT (Cho Luật)
-from qdrant_client import QdrantClient
-from langchain_qdrant import QdrantVectorStore
+from vectordb.registry import get_registry
 
-from data_processing.pipeline import process_pdf_question
+from data_processing.pipeline import process_pdf_question, aprocess_pdf_question
+from data_processing.embedding_cache import cached_embeddings
 from law_db_query.handler import handle_law_article_query, handle_law_count_query
-from law_db_query.router import route_message
+from law_db_query.router import route_message, aroute_message, aprepare_route
 from mst.router import is_mst_query
+from data_processing.intent import is_iz_agent_query
 from mst.handler import handle_mst_query
 from iz_agent.agent import agent_executor as iz_executor
 from msn_2018.retriever import load_vsic_2018_retriever
@@ -44,25 +46,43 @@ QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_COLLECTION_NAME_LAW = os.getenv("QDRANT_COLLECTION_NAME_LAW", "legal_documents")
 
 EMBEDDING_DIM = 3072
+# Số chiều xin từ API (text-embedding-3, tham số dimensions). Để trống = EMBEDDING_DIM:
+# retriever tự cắt vector câu hỏi theo số chiều từng collection (vectordb/quantization.py),
+# chỉ đặt khi MỌI collection đã chuyển sang số chiều này (processing/migrate_embeddings.py)
+OPENAI__EMBEDDING_DIMENSIONS = int(os.getenv("OPENAI__EMBEDDING_DIMENSIONS") or 0) or None
+
+# Timeout từng lời gọi OpenAI (giây) — trần cứng, ngoài ngân sách deadline của /chat
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "40"))
+LANG_MODEL_TIMEOUT_SECONDS = float(os.getenv("LANG_MODEL_TIMEOUT_SECONDS", "30"))
+EMBEDDING_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_TIMEOUT_SECONDS", "10"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "1"))
 
 # ===================== INIT LLM =====================
 llm = ChatOpenAI(
     api_key=OPENAI__API_KEY,
     model=OPENAI__MODEL_NAME,
-    temperature=float(OPENAI__TEMPERATURE) if OPENAI__TEMPERATURE else 0
+    temperature=float(OPENAI__TEMPERATURE) if OPENAI__TEMPERATURE else 0,
+    timeout=OPENAI_TIMEOUT_SECONDS,
+    max_retries=OPENAI_MAX_RETRIES
 )
 
 lang_llm = ChatOpenAI(
     api_key=LANG_MODEL_API_KEY,
     model="gpt-4o-mini",
-    temperature=0
+    temperature=0,
+    timeout=LANG_MODEL_TIMEOUT_SECONDS,
+    max_retries=OPENAI_MAX_RETRIES
 )
 
 # ===================== INIT EMBEDDING =====================
-emb = OpenAIEmbeddings(
+# Bọc cache: retriever luật / MST / VSIC 2018 và cache ngữ nghĩa dùng chung 1 vector mỗi câu hỏi
+emb = cached_embeddings(OpenAIEmbeddings(
     api_key=OPENAI__API_KEY,
-    model=OPENAI__EMBEDDING_MODEL
-)
+    model=OPENAI__EMBEDDING_MODEL,
+    dimensions=OPENAI__EMBEDDING_DIMENSIONS,
+    timeout=EMBEDDING_TIMEOUT_SECONDS,
+    max_retries=OPENAI_MAX_RETRIES
+))
 
 # ===================== INIT PINECONE (COMMENTED) =====================
 # if not PINECONE_API_KEY:
@@ -126,29 +146,20 @@ def load_vectordb():
         print("⚠️ Thiếu QDRANT_URL trong biến môi trường")
         return None
 
-    try:
-        client = QdrantClient(
-            url=QDRANT_URL, 
-            api_key=None, 
-            timeout=60, 
-            prefer_grpc=False,  # Dùng HTTP thay vì gRPC
-            check_compatibility=False
-        )
-    except Exception as e:
-        print(f"❌ Lỗi kết nối Qdrant: {e}")
+    # Client + retriever dùng chung (vectordb/registry.py)
+    registry = get_registry()
+    collection_info = registry.collection_info(QDRANT_COLLECTION_NAME_LAW, refresh=True)
+    if collection_info.error:
+        print(f"❌ Lỗi kết nối Qdrant: {collection_info.error}")
         return None
 
-    if not client.collection_exists(QDRANT_COLLECTION_NAME_LAW):
+    if not collection_info.exists:
         print(f"⚠️ Collection '{QDRANT_COLLECTION_NAME_LAW}' chưa tồn tại trên Qdrant.")
         return None
 
-    vectordb = QdrantVectorStore(
-        client=client,
-        collection_name=QDRANT_COLLECTION_NAME_LAW,
-        embedding=emb,
-    )
-
-    retriever = vectordb.as_retriever(search_kwargs={"k": 4})
+    # Retriever hỗ trợ cả invoke (CLI) và ainvoke (AsyncQdrantClient cho /chat)
+    # Theo thông tin collection mới nhất: đổi số chiều / thêm sparse vector không cần restart
+    retriever = registry.live_retriever(QDRANT_COLLECTION_NAME_LAW, emb, k=4)
     print("✅ Qdrant Law retriever sẵn sàng")
     
     # ===== VSIC 2018 (đối chứng - đã chuyển sang Qdrant) =====
@@ -162,52 +173,25 @@ def load_vectordb():
     return retriever
 
 def get_vectordb_stats() -> Dict:
-    """Kiểm tra trạng thái Qdrant"""
+    """Kiểm tra trạng thái Qdrant (thông tin collection cache trong registry)"""
     try:
-        if not QDRANT_URL:
+        registry = get_registry()
+        if registry is None:
             return {"exists": False, "error": "Thiếu QDRANT_URL"}
-        
-        client = QdrantClient(
-            url=QDRANT_URL, 
-            api_key=None, 
-            timeout=60, 
-            prefer_grpc=False,
-            check_compatibility=False
-        )
-        
-        if not client.collection_exists(QDRANT_COLLECTION_NAME_LAW):
-            return {"exists": False, "error": f"Collection '{QDRANT_COLLECTION_NAME_LAW}' không tồn tại"}
-        
-        collection_info = client.get_collection(QDRANT_COLLECTION_NAME_LAW)
-        
-        return {
-            "exists": True,
-            "total_documents": collection_info.points_count,
-            "dimension": collection_info.config.params.vectors.size
-        }
+        return registry.collection_info(QDRANT_COLLECTION_NAME_LAW).as_stats()
     except Exception as e:
         return {"exists": False, "error": str(e)}
 
-# ===================== ROUTER CHO IZ_AGENT =====================
-def is_iz_agent_query(message: str) -> bool:
-    """Router nhận diện câu hỏi liên quan đến BĐS Công Nghiệp (KCN/CCN)
-    để chuyển hướng sang iz_agent xử lý."""
-    keywords = [
-        "kcn", "ccn", "khu công nghiệp", "cụm công nghiệp",
-        "giá thuê", "giá đất", "diện tích", "biểu đồ", "so sánh", 
-        "mật độ", "tỷ lệ lấp đầy", "chủ đầu tư", "vẽ biểu đồ",
-        "danh sách", "liệt kê", "bao nhiêu", "ở đâu"
-    ]
-    
-    # Kiểm tra xem câu hỏi có chứa keyword VÀ có ngữ cảnh công nghiệp không
-    msg = message.lower()
-    
-    # Nếu câu hỏi chứa từ khóa cốt lõi thì bắt luôn
-    core_hits = any(k in msg for k in keywords)
-    
-    # Nếu chỉ hỏi chung chung "vẽ biểu đồ" mà không nói gì thêm thì có thể để Agent xử lý
-    # hoặc thêm logic chặt chẽ hơn nếu cần.
-    return core_hits
+async def aget_vectordb_stats() -> Dict:
+    """Bản async của get_vectordb_stats (dùng cho GET / của FastAPI): không gọi Qdrant
+    trên đường request, trừ lần đầu; hết hạn → làm mới ở nền"""
+    try:
+        registry = get_registry()
+        if registry is None:
+            return {"exists": False, "error": "Thiếu QDRANT_URL"}
+        return (await registry.acollection_info(QDRANT_COLLECTION_NAME_LAW)).as_stats()
+    except Exception as e:
+        return {"exists": False, "error": str(e)}
 
 # ===================== PIPELINE WRAPPER =====================
 # (Đã xóa logic excel_handler cũ)
@@ -242,7 +226,51 @@ def pdf_dispatch(i: Dict):
         excel_handler=None
     )
 
-pdf_chain = RunnableLambda(pdf_dispatch)
+async def apdf_dispatch(i: Dict):
+    """Bản async của pdf_dispatch: LLM/Qdrant/Postgres đều chạy native async
+    (ainvoke, AsyncQdrantClient, asyncpg) thay vì chiếm thread pool."""
+    global retriever, retriever_vsic_2018
+
+    if retriever is None:
+        await asyncio.to_thread(load_vectordb)
+
+    result = await aroute_message(
+        i,
+        llm=llm,
+        lang_llm=lang_llm,
+        retriever=retriever,
+        retriever_vsic_2018=retriever_vsic_2018,
+        excel_handler=None
+    )
+
+    if isinstance(result, str) and result.strip():
+        return result
+
+    return await aprocess_pdf_question(
+        i,
+        llm=llm,
+        lang_llm=lang_llm,
+        retriever=retriever,
+        retriever_vsic_2018=retriever_vsic_2018,
+        excel_handler=None
+    )
+
+async def apdf_prepare(i: Dict):
+    """Chuẩn bị câu trả lời tới trước lần gọi LLM cuối (dùng cho /chat/stream)."""
+    if retriever is None:
+        await asyncio.to_thread(load_vectordb)
+
+    return await aprepare_route(
+        i,
+        llm=llm,
+        lang_llm=lang_llm,
+        retriever=retriever,
+        retriever_vsic_2018=retriever_vsic_2018,
+        excel_handler=None
+    )
+
+# invoke() → pdf_dispatch (CLI), ainvoke() → apdf_dispatch (FastAPI)
+pdf_chain = RunnableLambda(pdf_dispatch, afunc=apdf_dispatch)
 
 def get_history(session_id: str):
     # Tạm thời disable database để tránh lỗi connection pool
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /chat threaded (run_in_threadpool) vs async end-to-end.
+
+Không gọi OpenAI/Qdrant thật: LLM và retriever được giả lập bằng độ trễ I/O
+(time.sleep cho bản sync, asyncio.sleep cho bản async) để đo riêng khả năng
+giữ nhiều request đồng thời của 1 worker.
+
+- threaded : giống main.py cũ — mỗi request chiếm 1 thread của Starlette
+             (mặc định anyio giới hạn 40 thread).
+- async    : aprocess_pdf_question với ainvoke / AsyncQdrantClient.
+
+Run:
+    python benchmarks/bench_async_chat.py --requests 300 --llm-latency 1.0
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from starlette.concurrency import run_in_threadpool
+
+from data_processing.context_builder import build_context_from_hits
+from data_processing.language import detect_language_openai
+from data_processing.pipeline import aprocess_pdf_question
+from system_prompts.pdf_reader_system import PDF_READER_SYS
+
+
+# ===================== FAKE COMPONENTS =====================
+class FakeLLM:
+    def __init__(self, latency: float, reply: str):
+        self.latency = latency
+        self.reply = reply
+
+    def invoke(self, messages, **kwargs):
+        time.sleep(self.latency)
+        return AIMessage(content=self.reply)
+
+    async def ainvoke(self, messages, **kwargs):
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self.reply)
+
+
+class FakeRetriever:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.docs = [
+            Document(page_content="Điều 25. Thời gian thử việc ...", metadata={"source": "bo_luat_lao_dong.pdf", "page": 12}),
+            Document(page_content="Điều 26. Tiền lương thử việc ...", metadata={"source": "bo_luat_lao_dong.pdf", "page": 13}),
+        ]
+
+    def invoke(self, query, **kwargs):
+        time.sleep(self.latency)
+        return self.docs
+
+    async def ainvoke(self, query, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self.docs
+
+
+# ===================== 2 CÁCH CHẠY =====================
+def threaded_chat(question: str, llm, lang_llm, retriever) -> str:
+    """Chuỗi bước sync như trước khi chuyển sang async."""
+    user_lang = detect_language_openai(question, lang_llm)
+    hits = retriever.invoke(question)
+    context = build_context_from_hits(hits)
+    messages = [
+        SystemMessage(content=PDF_READER_SYS + f"\n\nNgười dùng đang dùng ngôn ngữ: '{user_lang}'."),
+        HumanMessage(content=f"Câu hỏi: {question}\n\nNội dung liên quan:\n{context}"),
+    ]
+    return llm.invoke(messages).content
+
+
+async def run_mode(mode: str, n_requests: int, llm, lang_llm, retriever):
+    question = "Thời gian thử việc tối đa là bao lâu?"
+    latencies = []
+
+    async def one():
+        t0 = time.perf_counter()
+        if mode == "threaded":
+            await run_in_threadpool(threaded_chat, question, llm, lang_llm, retriever)
+        else:
+            await aprocess_pdf_question(
+                {"message": question, "history": []},
+                llm=llm,
+                lang_llm=lang_llm,
+                retriever=retriever,
+            )
+        latencies.append(time.perf_counter() - t0)
+
+    t_start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n_requests)))
+    wall = time.perf_counter() - t_start
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return {
+        "mode": mode,
+        "requests": n_requests,
+        "wall_s": wall,
+        "throughput_rps": n_requests / wall,
+        "p50_s": p50,
+        "p99_s": p99,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser("Benchmark threaded vs async /chat")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="giây / lần gọi LLM sinh câu trả lời")
+    parser.add_argument("--lang-latency", type=float, default=0.3, help="giây / lần gọi detect ngôn ngữ")
+    parser.add_argument("--retrieval-latency", type=float, default=0.1, help="giây / lần search Qdrant")
+    args = parser.parse_args()
+
+    llm = FakeLLM(args.llm_latency, "Thời gian thử việc tối đa 180 ngày ...")
+    lang_llm = FakeLLM(args.lang_latency, "vi")
+    retriever = FakeRetriever(args.retrieval_latency)
+
+    print("=" * 80)
+    print(f"🚀 {args.requests} request đồng thời | LLM {args.llm_latency}s | lang {args.lang_latency}s | Qdrant {args.retrieval_latency}s")
+    print("=" * 80)
+    for mode in ("threaded", "async"):
+        r = asyncio.run(run_mode(mode, args.requests, llm, lang_llm, retriever))
+        print(
+            f"{r['mode']:<9} wall={r['wall_s']:.2f}s  rps={r['throughput_rps']:.1f}  "
+            f"p50={r['p50_s']:.2f}s  p99={r['p99_s']:.2f}s"
+        )
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: context cũ (đếm ký tự, dừng ở hit đầu tiên không vừa) vs context đóng gói
+theo token (bỏ phần trùng chunk_overlap, cắt hit cuối tại ranh giới câu).
+
+Dữ liệu: văn bản luật tổng hợp cắt bằng RecursiveCharacterTextSplitter(chunk_size=1000,
+chunk_overlap=300) như các script ingest; mỗi "request" lấy k hit gồm vài chunk liền nhau
+cùng trang (như retrieval thật hay trả về) + chunk ngẫu nhiên, thứ tự xáo trộn.
+
+- token gửi   : token của context đưa vào prompt
+- nội dung mới: số ký tự văn bản KHÁC NHAU (không tính phần lặp) có trong context
+
+Run:
+    python benchmarks/bench_context_packer.py --requests 200 --k 6
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from data_processing.context_builder import count_tokens, pack_context
+
+
+def build_context_by_chars(hits, max_chars: int = 6000) -> str:
+    """Bản cũ của data_processing/context_builder.build_context_from_hits"""
+    ctx = []
+    total = 0
+    for h in hits:
+        seg = f"[Nguồn: {h.metadata.get('source', 'unknown')}, Trang: {h.metadata.get('page', '?')}]\n{h.page_content.strip()}"
+        if total + len(seg) > max_chars:
+            break
+        ctx.append(seg)
+        total += len(seg)
+    return "\n\n".join(ctx)
+
+
+def corpus(pages: int, rng: random.Random):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=300)
+    chunks = []
+    article = 1
+    for page in range(pages):
+        sentences = []
+        for _ in range(rng.randint(25, 40)):
+            sentences.append(
+                f"Điều {article}. Người sử dụng lao động phải bảo đảm điều kiện làm việc số {article}; "
+                f"thời gian thử việc không quá {rng.choice([6, 30, 60, 180])} ngày đối với công việc {article}."
+            )
+            article += 1
+        page_chunks = splitter.split_text(" ".join(sentences))
+        chunks.append([Document(page_content=c, metadata={"source": "luat.pdf", "page": page}) for c in page_chunks])
+    return chunks
+
+
+def unique_chars(context: str, hits) -> int:
+    """Số ký tự nguồn khác nhau xuất hiện trong context (theo cửa sổ 40 ký tự)"""
+    seen = set()
+    for h in hits:
+        text = h.page_content
+        for i in range(0, max(1, len(text) - 40), 20):
+            window = text[i:i + 40]
+            if window in context:
+                seen.add(window)
+    return len(seen) * 20
+
+
+def main(args):
+    rng = random.Random(0)
+    pages = corpus(200, rng)
+
+    rows = {"cũ (6000 ký tự)": [], f"token ({args.max_tokens})": []}
+    saved = []
+    for _ in range(args.requests):
+        page = rng.choice(pages)
+        start = rng.randrange(max(1, len(page) - 3))
+        hits = page[start:start + 3] + [rng.choice(rng.choice(pages)) for _ in range(args.k - 3)]
+        rng.shuffle(hits)
+
+        old = build_context_by_chars(hits)
+        packed = pack_context(hits, args.max_tokens)
+        rows["cũ (6000 ký tự)"].append((count_tokens(old), unique_chars(old, hits)))
+        rows[f"token ({args.max_tokens})"].append((packed.tokens, unique_chars(packed.text, hits)))
+        saved.append(packed.overlap_tokens_saved)
+
+    print(f"{args.requests} request, k={args.k}\n")
+    print(f"{'':<18}{'token gửi':>12}{'nội dung mới':>16}{'ký tự / token':>16}")
+    for name, values in rows.items():
+        tokens = statistics.mean(v[0] for v in values)
+        content = statistics.mean(v[1] for v in values)
+        print(f"{name:<18}{tokens:>12.0f}{content:>16.0f}{content / tokens:>16.2f}")
+    print(f"\nToken trùng lặp bỏ được / request: trung bình {statistics.mean(saved):.0f}, "
+          f"p95 {sorted(saved)[int(len(saved) * 0.95)]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--k", type=int, default=6)
+    parser.add_argument("--max-tokens", type=int, default=2000)
+    main(parser.parse_args())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: số lần gọi embeddings API / thời gian khi nhiều retriever cùng embed 1 câu hỏi.
+
+Không gọi OpenAI thật: embedding giả lập bằng asyncio.sleep + vector ngẫu nhiên 3072 chiều.
+Mỗi "request" embed cùng câu hỏi ở N chỗ đồng thời (cache ngữ nghĩa, retrieval chạy
+trước, retriever MST / VSIC 2018...), sau đó 1 phần câu hỏi được hỏi lại.
+
+- không cache : OpenAIEmbeddings như trước
+- cache       : CachedEmbeddings (LRU + gom lời gọi đang chạy)
+
+Run:
+    python benchmarks/bench_embedding_cache.py --requests 200 --repeat-ratio 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.embeddings import Embeddings
+
+from data_processing.embedding_cache import CachedEmbeddings
+
+
+# ===================== FAKE COMPONENTS =====================
+class FakeEmbeddings(Embeddings):
+    model = "fake-embedding"
+
+    def __init__(self, latency: float, dim: int = 3072):
+        self.latency = latency
+        self.dim = dim
+        self.calls = 0
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        rng = random.Random(text)
+        return [rng.random() for _ in range(self.dim)]
+
+
+async def run(embedding, questions, fanout):
+    t0 = time.perf_counter()
+    for q in questions:
+        await asyncio.gather(*(embedding.aembed_query(q) for _ in range(fanout)))
+    return time.perf_counter() - t0
+
+
+async def main(args):
+    rng = random.Random(0)
+    distinct = [f"Câu hỏi số {i} về thời gian thử việc?" for i in range(args.requests)]
+    questions = [
+        rng.choice(distinct[:i]) if i and rng.random() < args.repeat_ratio else distinct[i]
+        for i in range(args.requests)
+    ]
+
+    print(f"{args.requests} request, mỗi request embed {args.fanout} lần, "
+          f"{args.repeat_ratio:.0%} câu hỏi lặp lại, API {args.latency * 1000:.0f}ms\n")
+    print(f"{'':<12}{'lần gọi API':>12}{'thời gian':>12}")
+
+    plain = FakeEmbeddings(args.latency)
+    elapsed = await run(plain, questions, args.fanout)
+    print(f"{'không cache':<12}{plain.calls:>12}{elapsed:>11.2f}s")
+
+    inner = FakeEmbeddings(args.latency)
+    elapsed = await run(CachedEmbeddings(inner), questions, args.fanout)
+    print(f"{'cache':<12}{inner.calls:>12}{elapsed:>11.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--repeat-ratio", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.005)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bộ nhớ / độ trễ / recall của dense vector rút gọn chiều + quantization
+so với hiện tại (3072 chiều float32, không quantization). Xem vectordb/quantization.py.
+
+Dữ liệu:
+- mặc định: vector tổng hợp kiểu Matryoshka (phương sai giảm dần theo chiều, có cụm chủ đề)
+- --from-collection legal_documents: vector thật lấy từ Qdrant (QDRANT_URL)
+Câu hỏi = tài liệu giữ lại (không nằm trong tập tìm kiếm) + nhiễu; đáp án = top-k theo
+vector gốc 3072 chiều.
+
+Cách đo:
+- offline (mặc định): numpy mô phỏng đúng phép chấm điểm (cắt chiều + chuẩn hóa; int8
+  quantile 0.99; binary = dấu từng chiều) rồi rescore bằng vector float của cùng số chiều.
+  Độ trễ = quét toàn bộ bằng numpy (chỉ so sánh tương đối giữa các cấu hình float)
+- --qdrant-url: tạo collection tạm cho từng cấu hình trên Qdrant thật → độ trễ query_points
+  (HNSW + quantization + rescore) và recall thật; xóa collection sau khi đo
+
+Bộ nhớ tính cho --scale points: RAM = vector dùng để duyệt (quantized nếu có, còn lại float32),
+đĩa = vector float32 gốc (chỉ đọc lúc rescore).
+
+Run:
+    python benchmarks/bench_embedding_compression.py --docs 10000 --queries 200 --k 10
+    python benchmarks/bench_embedding_compression.py --qdrant-url http://localhost:6333
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+FULL_DIM = 3072
+
+# (số chiều, quantization, oversampling rescore; None = không rescore)
+CONFIGS = [
+    (3072, "none", None),
+    (1536, "none", None),
+    (1024, "none", None),
+    (512, "none", None),
+    (3072, "scalar", None),
+    (3072, "scalar", 2.0),
+    (1024, "scalar", 2.0),
+    (3072, "binary", None),
+    (3072, "binary", 3.0),
+    (1536, "binary", 3.0),
+]
+
+
+# ===================== DỮ LIỆU =====================
+def _normalize(m: np.ndarray) -> np.ndarray:
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+def synthetic(n: int, rng: np.random.Generator, topics: int = 200) -> np.ndarray:
+    # Chiều đầu mang nhiều thông tin hơn (giống text-embedding-3)
+    scale = (1 + np.arange(FULL_DIM) / 64.0) ** -0.5
+    centroids = rng.standard_normal((topics, FULL_DIM), dtype=np.float32) * scale
+    labels = rng.integers(0, topics, n)
+    docs = centroids[labels] + 0.8 * rng.standard_normal((n, FULL_DIM), dtype=np.float32) * scale
+    return _normalize(docs.astype(np.float32))
+
+
+def from_collection(name: str, n: int) -> np.ndarray:
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+    from vectordb.client import create_qdrant_clients
+
+    client, _ = create_qdrant_clients(os.environ["QDRANT_URL"], timeout=120)
+    vectors, offset = [], None
+    while len(vectors) < n:
+        points, offset = client.scroll(name, limit=min(512, n - len(vectors)), offset=offset, with_vectors=True)
+        for p in points:
+            v = p.vector
+            if isinstance(v, dict):
+                v = next(x for x in v.values() if isinstance(x, list))
+            vectors.append(v)
+        if offset is None:
+            break
+    client.close()
+    return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+# ===================== MÔ PHỎNG CHẤM ĐIỂM =====================
+def truncate(m: np.ndarray, dim: int) -> np.ndarray:
+    return m if dim >= m.shape[1] else _normalize(m[:, :dim])
+
+
+def scalar_quantize(m: np.ndarray, quantile: float = 0.99):
+    lo, hi = np.quantile(m, [1 - quantile, quantile])
+    q = np.round((np.clip(m, lo, hi) - lo) / (hi - lo) * 255 - 128).astype(np.int8)
+    return q, lo, hi
+
+
+def dequantize(q: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    return (q.astype(np.float32) + 128) / 255 * (hi - lo) + lo
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, idx, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(idx, order, axis=1)
+
+
+def offline_search(docs, queries, dim, quant, oversampling, k):
+    d, q = truncate(docs, dim), truncate(queries, dim)
+    limit = int(k * oversampling) if oversampling else k
+
+    # Tài liệu quantize sẵn (như lúc index), không tính vào độ trễ
+    if quant == "scalar":
+        stored = dequantize(*scalar_quantize(d))
+    elif quant == "binary":
+        # Qdrant binary: dấu từng chiều, điểm = số chiều cùng dấu
+        stored, q_scan = np.sign(d), np.sign(q)
+    else:
+        stored = d
+    if quant != "binary":
+        q_scan = q
+
+    t0 = time.perf_counter()
+    scores = q_scan @ stored.T
+    candidates = top_k(scores, limit)
+    if oversampling:
+        exact = np.einsum("qd,qkd->qk", q, d[candidates])
+        candidates = np.take_along_axis(candidates, exact.argsort(axis=1)[:, ::-1], axis=1)
+    result = candidates[:, :k]
+    return result, (time.perf_counter() - t0) / len(queries)
+
+
+# ===================== QDRANT THẬT =====================
+def qdrant_search(url, docs, queries, dim, quant, oversampling, k):
+    from qdrant_client import QdrantClient, models
+    from vectordb.quantization import quantization_config, search_params
+
+    client = QdrantClient(url=url, timeout=300, check_compatibility=False)
+    name = f"bench_{dim}_{quant}_{uuid.uuid4().hex[:6]}"
+    client.create_collection(
+        name,
+        vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE, on_disk=quant != "none"),
+        quantization_config=quantization_config(quant),
+    )
+    try:
+        d, q = truncate(docs, dim), truncate(queries, dim)
+        for start in range(0, len(d), 512):
+            client.upload_collection(name, vectors=d[start:start + 512], ids=range(start, min(start + 512, len(d))))
+        while client.get_collection(name).status != models.CollectionStatus.GREEN:
+            time.sleep(0.5)
+
+        params = search_params(oversampling) if oversampling else (
+            search_params(1.0, rescore=False) if quant != "none" else None
+        )
+        result, samples = [], []
+        for v in q:
+            t0 = time.perf_counter()
+            res = client.query_points(name, query=v.tolist(), limit=k, search_params=params)
+            samples.append(time.perf_counter() - t0)
+            result.append([p.id for p in res.points] + [-1] * (k - len(res.points)))
+        return np.asarray(result), statistics.median(samples)
+    finally:
+        client.delete_collection(name)
+        client.close()
+
+
+# ===================== BÁO CÁO =====================
+def bytes_per_vector(dim: int, quant: str):
+    float_bytes = dim * 4
+    ram = {"none": float_bytes, "scalar": dim, "binary": dim // 8}[quant]
+    disk = float_bytes if quant != "none" else 0
+    return ram, disk
+
+
+def recall(result: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(r) & set(t)) / k for r, t in zip(result, truth)]))
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    total = args.docs + args.queries
+    vectors = from_collection(args.from_collection, total) if args.from_collection else synthetic(total, rng)
+    docs, held_out = vectors[:-args.queries], vectors[-args.queries:]
+    queries = _normalize(held_out + 0.02 * rng.standard_normal(held_out.shape, dtype=np.float32))
+    truth = top_k(queries @ docs.T, args.k)
+
+    mode = f"Qdrant {args.qdrant_url}" if args.qdrant_url else "numpy offline"
+    print(f"{len(docs)} tài liệu, {len(queries)} câu hỏi, k={args.k}, đo: {mode}; "
+          f"bộ nhớ tính cho {args.scale:,} points\n")
+    print(f"{'cấu hình':<26}{'RAM':>10}{'đĩa':>10}{'độ trễ':>12}{f'recall@{args.k}':>12}")
+    for dim, quant, oversampling in CONFIGS:
+        if dim > docs.shape[1]:
+            continue
+        if args.qdrant_url:
+            result, latency = qdrant_search(args.qdrant_url, docs, queries, dim, quant, oversampling, args.k)
+        else:
+            result, latency = offline_search(docs, queries, dim, quant, oversampling, args.k)
+        ram, disk = bytes_per_vector(dim, quant)
+        name = f"{dim} {quant}" + (f" rescore×{oversampling:g}" if oversampling else "")
+        print(
+            f"{name:<26}{ram * args.scale / 2**20:>8.0f}MB{disk * args.scale / 2**20:>8.0f}MB"
+            f"{latency * 1000:>10.2f}ms{recall(result, truth):>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--scale", type=int, default=100_000, help="Số points để quy đổi bộ nhớ")
+    parser.add_argument("--from-collection", help="Lấy vector thật từ collection Qdrant (QDRANT_URL)")
+    parser.add_argument("--qdrant-url", help="Đo trên Qdrant thật (tạo / xóa collection tạm)")
+    main(parser.parse_args())
@@ -0,0 +1,103 @@
+# benchmarks/bench_intent.py
+"""
+Thời gian nhận diện intent cho 1 câu hỏi:
+- scan cũ : mỗi hàm is_*_query tự lower() + quét danh sách từ khóa của nó
+            (law_count, mst, iz_agent, law_article, greeting, flowchart, vsic, labor)
+- classify: 1 lần quét regex từ khóa (dạng trie) cho mọi intent (không cache)
+- cached  : classify() lặp lại cùng câu (main.py + pipeline hỏi cùng 1 câu)
+
+Câu hỏi lấy từ check/intent_corpus.json. Câu dài (người dùng dán cả đoạn văn bản):
+- 2000 ký tự ghép từ các câu hỏi trên: dày đặc từ khóa (~1 từ khóa / 15 ký tự), trường hợp xấu
+- 2000 ký tự văn bản luật (json/quyet_dinh_36_by_sections_01_99.json), nếu có file
+Chạy:  python benchmarks/bench_intent.py
+"""
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from data_processing.intent import (
+    FLOWCHART_KEYWORDS,
+    GREETING_KEYWORDS,
+    IZ_AGENT_KEYWORDS,
+    LABOR_KEYWORDS,
+    LAW_COUNT_KEYWORDS,
+    MST_KEYWORDS,
+    VSIC_KEYWORDS,
+    classify,
+)
+
+ROUNDS = 200
+LAW_TEXT_PATH = ROOT / "json" / "quyet_dinh_36_by_sections_01_99.json"
+
+
+def legacy_scan(text: str):
+    """Tương đương các hàm is_*_query trước khi gộp"""
+    def any_in(keywords):
+        t = text.lower()
+        return any(k in t for k in keywords)
+
+    q = text.lower().strip()
+    return (
+        any_in(LAW_COUNT_KEYWORDS),
+        any_in(MST_KEYWORDS),
+        any_in(IZ_AGENT_KEYWORDS),
+        re.search(r"điều\s+\d+.*luật\s+.+", text.lower()) is not None,
+        any(q in g or q.startswith(g) for g in GREETING_KEYWORDS),
+        any_in(FLOWCHART_KEYWORDS),
+        bool(re.search(r"\b\d{5}\b", q)) or any_in(VSIC_KEYWORDS),
+        any_in(LABOR_KEYWORDS),
+    )
+
+
+def law_text(chars: int = 2000) -> str:
+    """Đoạn văn bản luật thật (giá trị chuỗi dài trong file JSON); "" nếu không có file"""
+    if not LAW_TEXT_PATH.exists():
+        return ""
+    strings, stack = [], [json.loads(LAW_TEXT_PATH.read_text(encoding="utf-8"))]
+    while stack and sum(map(len, strings)) < chars:
+        node = stack.pop()
+        if isinstance(node, str) and len(node) > 40:
+            strings.append(node)
+        elif isinstance(node, dict):
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return " ".join(strings)[:chars]
+
+
+def per_call_us(fn, texts) -> float:
+    t0 = time.perf_counter()
+    for _ in range(ROUNDS):
+        for t in texts:
+            fn(t)
+    return (time.perf_counter() - t0) / (ROUNDS * len(texts)) * 1e6
+
+
+def main():
+    corpus = json.loads((ROOT / "check" / "intent_corpus.json").read_text(encoding="utf-8"))
+    texts = [c["text"] for c in corpus["cases"]]
+    avg_len = sum(map(len, texts)) / len(texts)
+
+    uncached = classify.__wrapped__
+    print(f"{len(texts)} câu, dài trung bình {avg_len:.0f} ký tự, {ROUNDS} vòng")
+    print(f"{'scan cũ':<12}{per_call_us(legacy_scan, texts):>8.2f} µs/câu")
+    print(f"{'classify':<12}{per_call_us(uncached, texts):>8.2f} µs/câu")
+    classify.cache_clear()
+    print(f"{'cached':<12}{per_call_us(classify, texts):>8.2f} µs/câu")
+
+    long_texts = [("ghép câu hỏi", " ".join(texts)[:2000]), ("văn bản luật", law_text())]
+    for name, long_text in long_texts:
+        if not long_text:
+            continue
+        print(f"\nCâu dài {len(long_text)} ký tự ({name}):")
+        print(f"{'scan cũ':<12}{per_call_us(legacy_scan, [long_text]):>8.2f} µs")
+        print(f"{'classify':<12}{per_call_us(uncached, [long_text]):>8.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_iz_response.py
+"""
+Kích thước + thời gian serialize / nén của response IZ Agent thật
+(search_flexible_tool / search_single_zone_tool trên data/kcn_ccn_data.xlsx).
+
+So sánh:
+- stdlib : jsonable_encoder + JSONResponse của Starlette (mặc định FastAPI trước đây)
+- orjson : serving.responses.FastJSONResponse
+- gzip-6 / brotli-4 : kích thước sau nén + thời gian nén
+- Ước lượng thời gian tải trên mạng di động chậm (3G ~ 400 kbps)
+
+Chạy:  EXCEL_FILE_PATH=./data/kcn_ccn_data.xlsx python benchmarks/bench_iz_response.py
+"""
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("EXCEL_FILE_PATH", "./data/kcn_ccn_data.xlsx")
+os.environ.setdefault("CHART_STORE_DIR", "")
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from iz_agent.tools import search_flexible_tool, search_single_zone_tool
+from serving.responses import FastJSONResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SLOW_LINK_BPS = 400_000  # 3G chậm
+ITERATIONS = 200
+
+QUERIES = [
+    ("toàn quốc (ALL)", search_flexible_tool, {"filter_json": json.dumps({"zone_type": "ALL"}), "view_option": "list"}),
+    ("KCN toàn quốc", search_flexible_tool, {"filter_json": json.dumps({"zone_type": "KCN"}), "view_option": "list"}),
+    ("CCN Hà Nội", search_flexible_tool, {"filter_json": json.dumps({"zone_type": "CCN", "Tỉnh/Thành phố": "Hà Nội"}), "view_option": "list"}),
+    ("KCN Hồ Chí Minh", search_flexible_tool, {"filter_json": json.dumps({"zone_type": "KCN", "Tỉnh/Thành phố": "Hồ Chí Minh"}), "view_option": "list"}),
+    ("tên chứa 'công nghiệp'", search_single_zone_tool, {"zone_name": "công nghiệp"}),
+]
+
+
+def as_chat_payload(tool_output: dict) -> dict:
+    """Giống cấu trúc /chat trả về cho client (xem run_iz_agent trong main.py)"""
+    if tool_output.get("type") == "multiple_choices":
+        return {"answer": tool_output.get("message"), "choices": tool_output.get("choices", []),
+                "total_found": tool_output.get("total_found")}
+    return {"answer": tool_output.get("text"), "chart_url": None, "chart_base64": None,
+            "data": tool_output.get("data", []), "province": tool_output.get("province"),
+            "count": tool_output.get("count"), "total_found": tool_output.get("total_found")}
+
+
+def timed_ms(fn, n=ITERATIONS):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    header = f"{'query':<26}{'raw KB':>8}{'std ms':>8}{'orjson ms':>10}{'gzip KB':>9}{'gz ms':>7}{'br KB':>7}{'br ms':>7}{'3G raw s':>9}{'3G best s':>10}"
+    print(header)
+    print("-" * len(header))
+
+    for name, tool_fn, args in QUERIES:
+        payload = as_chat_payload(tool_fn.invoke(args))
+
+        def std():
+            return JSONResponse(jsonable_encoder(payload)).body
+
+        def fast():
+            return FastJSONResponse(payload).body
+
+        try:
+            std_ms = timed_ms(std)
+        except ValueError:
+            std_ms = float("nan")  # NaN trong payload → JSON chuẩn báo lỗi
+        fast_ms = timed_ms(fast)
+
+        body = fast()
+        gz = gzip.compress(body, compresslevel=6)
+        gz_ms = timed_ms(lambda: gzip.compress(body, compresslevel=6), 50)
+        if brotli:
+            br = brotli.compress(body, quality=4)
+            br_ms = timed_ms(lambda: brotli.compress(body, quality=4), 50)
+            best = min(len(gz), len(br))
+        else:
+            br, br_ms, best = b"", float("nan"), len(gz)
+
+        print(
+            f"{name:<26}{len(body) / 1024:>8.1f}{std_ms:>8.2f}{fast_ms:>10.2f}"
+            f"{len(gz) / 1024:>9.1f}{gz_ms:>7.2f}{len(br) / 1024:>7.1f}{br_ms:>7.2f}"
+            f"{len(body) * 8 / SLOW_LINK_BPS:>9.2f}{best * 8 / SLOW_LINK_BPS:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
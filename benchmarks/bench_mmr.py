@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark: MMR (vectordb/mmr.py) so với top-k thuần trên fetch_k ứng viên.
+
+Dữ liệu tổng hợp giống collection luật: mỗi điều khoản cắt thành vài chunk overlap
+(vector gần trùng nhau), câu hỏi liên quan tới vài điều khoản với mức độ khác nhau.
+Đo số điều khoản KHÁC NHAU trong k kết quả (cùng k → cùng ngân sách context),
+tỉ lệ giữ được kết quả top-1, và thời gian chọn MMR mỗi câu hỏi.
+
+Run:
+    python benchmarks/bench_mmr.py --articles 500 --chunks 4 --queries 300 --k 4 --fetch-k 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from vectordb.mmr import mmr_select
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    return m / np.linalg.norm(m, axis=-1, keepdims=True)
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    articles = _normalize(rng.standard_normal((args.articles, args.dim), dtype=np.float32))
+    # Các chunk cùng điều khoản: vector điều khoản + nhiễu nhỏ (phần overlap)
+    docs = _normalize(
+        np.repeat(articles, args.chunks, axis=0)
+        + 0.25 / np.sqrt(args.dim) * rng.standard_normal((args.articles * args.chunks, args.dim), dtype=np.float32)
+    )
+    article_of = np.repeat(np.arange(args.articles), args.chunks)
+
+    print(f"{args.articles} điều khoản × {args.chunks} chunk, {args.queries} câu hỏi, k={args.k}, "
+          f"fetch_k={args.fetch_k}\n")
+    print(f"{'chọn':<16}{'điều khoản khác nhau':>22}{'giữ top-1':>12}{'thời gian':>12}")
+
+    queries = []
+    for _ in range(args.queries):
+        related = rng.choice(args.articles, 3, replace=False)
+        weights = np.array([1.0, 0.6, 0.4], dtype=np.float32)
+        queries.append(_normalize(weights @ articles[related]))
+    queries = np.asarray(queries)
+    scores = queries @ docs.T
+    candidates = np.argsort(-scores, axis=1)[:, :args.fetch_k]
+
+    baseline = [len(set(article_of[c[:args.k]])) for c in candidates]
+    print(f"{'top-k':<16}{statistics.mean(baseline):>22.2f}{1.0:>12.2f}{'-':>12}")
+
+    for lam in args.lambdas:
+        distinct, kept, samples = [], [], []
+        for q_scores, cand in zip(scores, candidates):
+            t0 = time.perf_counter()
+            picked = mmr_select(q_scores[cand], docs[cand], args.k, lam)
+            samples.append(time.perf_counter() - t0)
+            chosen = cand[picked]
+            distinct.append(len(set(article_of[chosen])))
+            kept.append(chosen[0] == cand[0])
+        print(
+            f"{f'MMR λ={lam:g}':<16}{statistics.mean(distinct):>22.2f}{np.mean(kept):>12.2f}"
+            f"{statistics.median(samples) * 1e6:>10.0f}µs"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=500)
+    parser.add_argument("--chunks", type=int, default=4)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--lambdas", type=float, nargs="+", default=[0.3, 0.5, 0.7, 0.9])
+    main(parser.parse_args())
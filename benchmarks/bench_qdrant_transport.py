@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Benchmark: độ trễ query_points REST (JSON) vs gRPC (protobuf), client sync và async.
+
+Không cần Qdrant / Docker: dựng 2 server giả lập Qdrant ngay trong process
+- REST : Starlette + uvicorn, route POST /collections/{name}/points/query
+         (parse JSON vector đầu vào, trả JSON cùng định dạng Qdrant)
+- gRPC : grpc.server với PointsServicer.Query của qdrant_client.grpc
+Cả 2 trả về k điểm cố định (payload ~ 1 chunk luật) → chênh lệch chủ yếu do
+encode / decode vector 3072 chiều + payload và transport, không tính thời gian search.
+
+Run:
+    python benchmarks/bench_qdrant_transport.py --queries 500 --dim 3072 --k 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent import futures
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import grpc
+import uvicorn
+from qdrant_client.grpc import json_with_int_pb2, points_pb2, points_service_pb2_grpc, qdrant_common_pb2
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+from vectordb.client import create_qdrant_clients
+
+COLLECTION = "legal_documents"
+CHUNK = (
+    "Điều 25. Thời gian thử việc. Thời gian thử việc do hai bên thỏa thuận căn cứ vào "
+    "tính chất và mức độ phức tạp của công việc nhưng chỉ được thử việc một lần đối với "
+    "một công việc và bảo đảm điều kiện sau đây: "
+) * 6
+
+
+def _payload(i: int):
+    return {"page_content": CHUNK, "metadata": {"source": "Bộ luật Lao động 2019", "article": 25 + i}}
+
+
+# ===================== REST STAND-IN =====================
+def rest_app(k: int) -> Starlette:
+    async def query(request):
+        body = json.loads(await request.body())
+        assert len(body["query"]) > 0
+        points = [
+            {"id": i, "version": 0, "score": 0.9 - i * 0.01, "payload": _payload(i)}
+            for i in range(min(k, body.get("limit", k)))
+        ]
+        return Response(
+            json.dumps({"result": {"points": points}, "status": "ok", "time": 0.0}, ensure_ascii=False),
+            media_type="application/json"
+        )
+
+    return Starlette(routes=[Route("/collections/{name}/points/query", query, methods=["POST"])])
+
+
+def start_rest(k: int, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(rest_app(k), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+# ===================== gRPC STAND-IN =====================
+def _grpc_value(v) -> json_with_int_pb2.Value:
+    if isinstance(v, dict):
+        return json_with_int_pb2.Value(struct_value=json_with_int_pb2.Struct(
+            fields={key: _grpc_value(x) for key, x in v.items()}
+        ))
+    if isinstance(v, int):
+        return json_with_int_pb2.Value(integer_value=v)
+    return json_with_int_pb2.Value(string_value=str(v))
+
+
+class PointsStandIn(points_service_pb2_grpc.PointsServicer):
+    def __init__(self, k: int):
+        self.k = k
+
+    def Query(self, request, context):
+        assert len(request.query.nearest.dense.data or request.query.nearest.data) > 0
+        return points_pb2.QueryResponse(
+            result=[
+                points_pb2.ScoredPoint(
+                    id=qdrant_common_pb2.PointId(num=i),
+                    score=0.9 - i * 0.01,
+                    version=0,
+                    payload={key: _grpc_value(v) for key, v in _payload(i).items()},
+                )
+                for i in range(min(self.k, request.limit or self.k))
+            ],
+            time=0.0,
+        )
+
+
+def start_grpc(k: int, port: int) -> grpc.Server:
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=8))
+    points_service_pb2_grpc.add_PointsServicer_to_server(PointsStandIn(k), server)
+    server.add_insecure_port(f"127.0.0.1:{port}")
+    server.start()
+    return server
+
+
+# ===================== ĐO =====================
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return statistics.median(ordered) * 1000, p99 * 1000
+
+
+def bench_sync(client, vectors, k):
+    samples = []
+    for v in vectors:
+        t0 = time.perf_counter()
+        res = client.query_points(collection_name=COLLECTION, query=v, limit=k, with_payload=True)
+        samples.append(time.perf_counter() - t0)
+        assert len(res.points) == k
+    return _percentiles(samples)
+
+
+async def bench_async(async_client, vectors, k):
+    samples = []
+    for v in vectors:
+        t0 = time.perf_counter()
+        res = await async_client.query_points(collection_name=COLLECTION, query=v, limit=k, with_payload=True)
+        samples.append(time.perf_counter() - t0)
+        assert len(res.points) == k
+    return _percentiles(samples)
+
+
+def main(args):
+    rest_port, grpc_port = _free_port(), _free_port()
+    rest_server = start_rest(args.k, rest_port)
+    grpc_server = start_grpc(args.k, grpc_port)
+
+    rng = random.Random(0)
+    vectors = [[rng.uniform(-1, 1) for _ in range(args.dim)] for _ in range(args.queries)]
+    url = f"http://127.0.0.1:{rest_port}"
+
+    print(f"{args.queries} query, vector {args.dim} chiều, k={args.k}\n")
+    print(f"{'transport':<10}{'client':<8}{'p50':>10}{'p99':>10}")
+    for prefer_grpc in (False, True):
+        client, async_client = create_qdrant_clients(url, prefer_grpc=prefer_grpc, grpc_port=grpc_port)
+        name = "gRPC" if prefer_grpc else "REST"
+        # Làm nóng kết nối
+        bench_sync(client, vectors[:10], args.k)
+        p50, p99 = bench_sync(client, vectors, args.k)
+        print(f"{name:<10}{'sync':<8}{p50:>8.2f}ms{p99:>8.2f}ms")
+
+        async def run_async():
+            await bench_async(async_client, vectors[:10], args.k)
+            result = await bench_async(async_client, vectors, args.k)
+            await async_client.close()
+            return result
+
+        p50, p99 = asyncio.run(run_async())
+        print(f"{name:<10}{'async':<8}{p50:>8.2f}ms{p99:>8.2f}ms")
+        client.close()
+
+    grpc_server.stop(0)
+    rest_server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--k", type=int, default=4)
+    main(parser.parse_args())
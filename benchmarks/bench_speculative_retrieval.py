@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark: thời gian aprepare_answer (tới trước lần gọi LLM cuối) trên 2 nhánh RAG hay gặp.
+
+Không gọi OpenAI/Qdrant thật: LLM phân loại và retriever được giả lập bằng asyncio.sleep.
+- follow-up có history → NEW_TOPIC : retrieval chạy song song với LLM phân loại follow-up
+                                     (SPECULATIVE_RETRIEVAL bật) hay chạy sau (tắt)
+- follow-up có history → FOLLOW_UP : kết quả retrieval chạy trước bị bỏ, không chậm hơn
+- VSIC                              : 2025 và 2018 truy vấn song song (trước đây tuần tự)
+
+Run:
+    python benchmarks/bench_speculative_retrieval.py --llm-latency 0.6 --retrieval-latency 0.3
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ANSWER_CACHE_PATH", "")
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+
+import data_processing.pipeline as pipeline
+
+
+# ===================== FAKE COMPONENTS =====================
+class FakeClassifierLLM:
+    """Trả lời prompt phân loại follow-up (không hỗ trợ structured output)"""
+
+    def __init__(self, latency: float, reply: str):
+        self.latency = latency
+        self.reply = reply
+
+    def with_structured_output(self, schema, **kwargs):
+        raise NotImplementedError
+
+    async def ainvoke(self, messages, **kwargs):
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self.reply)
+
+
+class FakeRetriever:
+    embedding = None
+
+    def __init__(self, latency: float, name: str):
+        self.latency = latency
+        self.name = name
+
+    async def ainvoke(self, question):
+        await asyncio.sleep(self.latency)
+        return [Document(page_content=f"Nội dung {self.name}", metadata={"source": self.name})]
+
+
+HISTORY = [
+    HumanMessage(content="Thời gian thử việc tối đa là bao lâu?"),
+    AIMessage(content="Không quá 180 ngày đối với người quản lý doanh nghiệp."),
+]
+
+
+async def timed_prepare(question, history, lang_llm, retriever, retriever_2018=None, rounds=5):
+    samples = []
+    route = None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        prepared = await pipeline.aprepare_answer(
+            {"message": question, "history": history},
+            llm=None,
+            lang_llm=lang_llm,
+            retriever=retriever,
+            retriever_vsic_2018=retriever_2018
+        )
+        samples.append(time.perf_counter() - t0)
+        route = prepared.route
+    return route, statistics.median(samples)
+
+
+async def main(args):
+    retriever = FakeRetriever(args.retrieval_latency, "luat")
+    retriever_2018 = FakeRetriever(args.retrieval_latency, "vsic_2018")
+    question = "Còn đối với lao động phổ thông thì sao?"
+
+    print(f"LLM phân loại {args.llm_latency:.2f}s, retrieval {args.retrieval_latency:.2f}s\n")
+    print(f"{'kịch bản':<34}{'route':<10}{'tuần tự':>9}{'song song':>11}")
+
+    for reply in ("NEW_TOPIC", "FOLLOW_UP"):
+        lang_llm = FakeClassifierLLM(args.llm_latency, reply)
+        results = {}
+        for speculative in (False, True):
+            pipeline.SPECULATIVE_RETRIEVAL = speculative
+            results[speculative] = await timed_prepare(question, HISTORY, lang_llm, retriever)
+        route = results[True][0]
+        print(f"{'history → ' + reply:<34}{route:<10}{results[False][1]:>8.2f}s{results[True][1]:>10.2f}s")
+
+    # VSIC: trước đây 2 retrieval nối tiếp nhau
+    lang_llm = FakeClassifierLLM(args.llm_latency, "NEW_TOPIC")
+    route, elapsed = await timed_prepare("Mã ngành 46510 là gì?", [], lang_llm, retriever, retriever_2018)
+    print(f"{'VSIC 2025 + 2018':<34}{route:<10}{2 * args.retrieval_latency:>8.2f}s{elapsed:>10.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency", type=float, default=0.6)
+    parser.add_argument("--retrieval-latency", type=float, default=0.3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tra mã ngành VSIC bằng bảng mã trong bộ nhớ (data_processing/vsic_index.py).
+
+Trước đây câu hỏi VSIC = embed câu hỏi + vector search 2 collection (2025, 2018)
+→ hàng trăm ms mỗi câu; LLM tự so sánh 2 đoạn văn bản.
+Giờ: tách mã trong câu hỏi → dict lookup + chuỗi cấp cha + đối chiếu 2018 ↔ 2025.
+
+Run:
+    python benchmarks/bench_vsic_lookup.py --rounds 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_processing.vsic_index import compare_code, extract_codes, load_vsic_2018, load_vsic_2025, render_comparison
+
+
+def main(args):
+    t0 = time.perf_counter()
+    old, new = load_vsic_2018(), load_vsic_2025()
+    print(f"Nạp bảng mã: {(time.perf_counter() - t0) * 1000:.1f}ms "
+          f"(2018: {len(old)} mã, 2025: {len(new)} mã)\n")
+
+    codes = sorted(set(old.entries) | set(new.entries))
+    questions = [f"Mã ngành {code} là gì, so với 2018 có gì thay đổi?" for code in codes]
+    compare_code(codes[0])  # nạp singleton
+
+    for name, fn in (
+        ("tách mã", lambda q: extract_codes(q)),
+        ("tách + so sánh", lambda q: [compare_code(c) for c in extract_codes(q)]),
+        ("tách + so sánh + context", lambda q: [render_comparison(compare_code(c)) for c in extract_codes(q)]),
+    ):
+        samples = []
+        for _ in range(args.rounds):
+            t0 = time.perf_counter()
+            for q in questions:
+                fn(q)
+            samples.append((time.perf_counter() - t0) / len(questions))
+        print(f"{name:<26}{statistics.median(samples) * 1e6:>8.1f}µs / câu hỏi")
+
+    print("\nTrạng thái đối chiếu:", dict(Counter(compare_code(c).status for c in codes)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20)
+    main(parser.parse_args())
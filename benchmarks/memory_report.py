@@ -0,0 +1,146 @@
+# benchmarks/memory_report.py
+"""
+So sánh bộ nhớ thường trú (RSS) và bộ nhớ chia theo tỷ lệ (PSS) của từng process:
+
+  1. hiện tại  : python main.py (uvicorn reload=True, 1 worker; process reloader
+                 cũng đã import main.py nên dữ liệu bị nạp 2 lần)
+  2. gunicorn  : N worker, mỗi worker tự nạp dữ liệu (PRELOAD_DATASETS=0)
+  3. gunicorn  : N worker, master nạp dữ liệu trước fork (PRELOAD_DATASETS=1)
+
+PSS chia trang dùng chung cho số process dùng nó → tổng PSS mới là bộ nhớ thật
+của cả server. Chỉ chạy trên Linux (đọc /proc/<pid>/smaps_rollup).
+
+Chạy:  python benchmarks/memory_report.py --workers 4
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+FIELDS = ["Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"]
+
+
+def smaps_rollup(pid: int) -> dict:
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts and parts[0].rstrip(":") in FIELDS:
+                out[parts[0].rstrip(":")] = int(parts[1]) / 1024  # kB → MB
+    return out
+
+
+def children(pid: int) -> list:
+    result = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            result.append(int(entry))
+    return sorted(result)
+
+
+def is_helper(pid: int) -> bool:
+    """Process phụ của multiprocessing (resource_tracker...) — không phải worker."""
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return b"resource_tracker" in f.read()
+    except OSError:
+        return False
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port: int, expected_children: int, root_pid: int, timeout: float = 180):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=2):
+                pass
+            if len([p for p in children(root_pid) if not is_helper(p)]) >= expected_children:
+                return
+        except OSError:
+            pass
+        time.sleep(1)
+    raise TimeoutError("Server không sẵn sàng")
+
+
+def measure(name: str, cmd: list, env: dict, port: int, expected_children: int, warm_requests: int):
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port, expected_children, proc.pid)
+        # Mỗi worker xử lý vài request để đủ trạng thái "đang chạy"
+        for _ in range(warm_requests):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read()
+        time.sleep(3)
+
+        rows = [("master", proc.pid, smaps_rollup(proc.pid))]
+        rows += [
+            ("helper" if is_helper(pid) else "worker", pid, smaps_rollup(pid))
+            for pid in children(proc.pid)
+        ]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    print(f"\n=== {name} ===")
+    print(f"{'role':<8}{'pid':>8}{'RSS MB':>10}{'PSS MB':>10}{'Shared MB':>11}{'Private MB':>12}")
+    for role, pid, m in rows:
+        shared = m.get("Shared_Clean", 0) + m.get("Shared_Dirty", 0)
+        private = m.get("Private_Clean", 0) + m.get("Private_Dirty", 0)
+        print(f"{role:<8}{pid:>8}{m['Rss']:>10.1f}{m['Pss']:>10.1f}{shared:>11.1f}{private:>12.1f}")
+
+    workers = [m for role, _, m in rows if role == "worker"]
+    total_pss = sum(m["Pss"] for _, _, m in rows)
+    avg_rss = sum(m["Rss"] for m in workers) / max(1, len(workers))
+    print(f"→ RSS trung bình / worker: {avg_rss:.1f} MB | tổng PSS cả server: {total_pss:.1f} MB")
+    return {"name": name, "workers": len(workers), "avg_rss": avg_rss, "total_pss": total_pss}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--warm-requests", type=int, default=20)
+    args = parser.parse_args()
+
+    base_env = dict(os.environ, PYTHONUNBUFFERED="1")
+    results = []
+
+    port = free_port()
+    results.append(measure(
+        "hiện tại: python main.py (uvicorn, 1 worker)",
+        [sys.executable, "main.py"],
+        dict(base_env, PORT=str(port)),
+        port, 1, args.warm_requests
+    ))
+
+    for preload in ("0", "1"):
+        port = free_port()
+        results.append(measure(
+            f"gunicorn {args.workers} worker, PRELOAD_DATASETS={preload}",
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app_fastapi"],
+            dict(base_env, PORT=str(port), WEB_CONCURRENCY=str(args.workers), PRELOAD_DATASETS=preload),
+            port, args.workers, args.warm_requests
+        ))
+
+    print("\n=== TÓM TẮT ===")
+    for r in results:
+        print(f"{r['name']:<50} worker={r['workers']:<3} RSS/worker={r['avg_rss']:>7.1f} MB  tổng PSS={r['total_pss']:>8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
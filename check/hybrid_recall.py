@@ -0,0 +1,114 @@
+# check/hybrid_recall.py
+"""
+So recall@k của dense search với hybrid search (dense + sparse BM25, RRF) trên
+collection Qdrant thật, dùng bộ câu hỏi có nhãn check/hybrid_recall_queries.json.
+
+Cần chạy processing/backfill_sparse_vectors.py trước (collection chưa có sparse
+vector → chỉ đo được dense).
+
+Chạy:  python check/hybrid_recall.py [--k 1 2 4 8]
+Recall@k = tỉ lệ câu hỏi có ít nhất 1 tài liệu trong top-k chứa đoạn "expected".
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv(override=True)
+
+from langchain_openai import OpenAIEmbeddings
+
+from data_processing.embedding_cache import cached_embeddings
+from vectordb.registry import HYBRID_IDENTIFIER_WEIGHT, HYBRID_PREFETCH_LIMIT, get_registry
+from vectordb.retriever import QdrantRetriever
+from vectordb.sparse import SPARSE_VECTOR_NAME, has_legal_identifier
+
+QUERIES_PATH = Path(__file__).resolve().parent / "hybrid_recall_queries.json"
+COLLECTIONS = {
+    "law": os.getenv("QDRANT_COLLECTION_NAME_LAW", "legal_documents"),
+    "msn_2018": os.getenv("QDRANT_COLLECTION_NAME_MSN_2018", "masonganh"),
+}
+
+
+def _hit(docs, expected: str) -> bool:
+    expected = expected.lower()
+    return any(expected in (d.page_content or "").lower() for d in docs)
+
+
+async def run(ks) -> int:
+    registry = get_registry()
+    if registry is None:
+        print("❌ Thiếu QDRANT_URL")
+        return 1
+    client, async_client = registry.clients()
+    emb = cached_embeddings(OpenAIEmbeddings(
+        api_key=os.getenv("OPENAI__API_KEY"),
+        model=os.getenv("OPENAI__EMBEDDING_MODEL")
+    ))
+    cases = json.loads(QUERIES_PATH.read_text(encoding="utf-8"))["cases"]
+    max_k = max(ks)
+
+    # mode → collection key → retriever
+    retrievers = {"dense": {}, "hybrid": {}}
+    for key, name in COLLECTIONS.items():
+        info = registry.collection_info(name)
+        if not info.exists:
+            print(f"⚠️ Collection {name} không tồn tại — bỏ qua các câu '{key}'")
+            continue
+        common = dict(
+            client=client, async_client=async_client, collection_name=name,
+            embedding=emb, k=max_k, vector_name=info.vector_name, vector_size=info.dimension
+        )
+        retrievers["dense"][key] = QdrantRetriever(**common)
+        if SPARSE_VECTOR_NAME in info.sparse_vectors:
+            retrievers["hybrid"][key] = QdrantRetriever(
+                **common,
+                sparse_vector_name=SPARSE_VECTOR_NAME,
+                prefetch_limit=HYBRID_PREFETCH_LIMIT,
+                identifier_weight=HYBRID_IDENTIFIER_WEIGHT,
+            )
+        else:
+            print(f"⚠️ {name} chưa có sparse vector '{SPARSE_VECTOR_NAME}' — chỉ đo dense")
+
+    # mode → k → số câu trúng; đếm riêng nhóm câu có định danh pháp luật
+    hits = {mode: {k: 0 for k in ks} for mode in retrievers}
+    ident_hits = {mode: {k: 0 for k in ks} for mode in retrievers}
+    total = {mode: 0 for mode in retrievers}
+    ident_total = {mode: 0 for mode in retrievers}
+
+    for case in cases:
+        with_ident = has_legal_identifier(case["question"])
+        for mode, by_key in retrievers.items():
+            retriever = by_key.get(case["collection"])
+            if retriever is None:
+                continue
+            docs = await retriever.ainvoke(case["question"])
+            total[mode] += 1
+            ident_total[mode] += with_ident
+            for k in ks:
+                if _hit(docs[:k], case["expected"]):
+                    hits[mode][k] += 1
+                    ident_hits[mode][k] += with_ident
+            if mode == "hybrid" and not _hit(docs[:max_k], case["expected"]):
+                print(f"❌ hybrid trượt: {case['question']!r} (cần {case['expected']!r})")
+
+    print()
+    print(f"{'mode':<8}{'nhóm':<14}" + "".join(f"{f'R@{k}':>8}" for k in ks))
+    for mode in retrievers:
+        if not total[mode]:
+            continue
+        for group, h, n in (("tất cả", hits[mode], total[mode]), ("có định danh", ident_hits[mode], ident_total[mode])):
+            if n:
+                print(f"{mode:<8}{group:<14}" + "".join(f"{h[k] / n:>8.2f}" for k in ks))
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 2, 4, 8])
+    sys.exit(asyncio.run(run(parser.parse_args().k)))
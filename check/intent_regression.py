@@ -0,0 +1,43 @@
+# check/intent_regression.py
+"""
+So kết quả data_processing.intent.classify() với bộ câu hỏi chuẩn check/intent_corpus.json
+(intent nào khớp + route của main.py + route của pipeline).
+
+Chạy:  python check/intent_regression.py
+Sửa từ khóa / thứ tự ưu tiên mà làm đổi kết quả → script báo từng câu bị đổi, exit code 1.
+"""
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_processing.intent import API_ROUTE_PRIORITY, PIPELINE_ROUTE_PRIORITY, classify
+
+CORPUS_PATH = Path(__file__).resolve().parent / "intent_corpus.json"
+
+
+def run() -> int:
+    cases = json.loads(CORPUS_PATH.read_text(encoding="utf-8"))["cases"]
+    failures = 0
+
+    for case in cases:
+        match = classify(case["text"])
+        got = {
+            "intents": sorted(match.intents),
+            "route": match.first(API_ROUTE_PRIORITY) or "rag",
+            "pipeline_route": match.first(PIPELINE_ROUTE_PRIORITY) or "rag",
+        }
+        diff = {k: (case[k], v) for k, v in got.items() if case[k] != v}
+        if diff:
+            failures += 1
+            print(f"❌ {case['text']!r}")
+            for field, (expected, actual) in diff.items():
+                print(f"   {field}: mong đợi {expected} — nhận {actual}")
+
+    print(f"{'✅' if not failures else '❌'} {len(cases) - failures}/{len(cases)} câu khớp")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
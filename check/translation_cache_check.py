@@ -0,0 +1,89 @@
+# check/translation_cache_check.py
+"""
+Bước dịch hết giờ / lỗi thì câu trả lời tiếng Việt KHÔNG được lưu vào cache ngữ nghĩa
+dưới user_lang (nếu lưu, mọi câu hỏi tương tự bằng tiếng Anh sẽ nhận bản tiếng Việt).
+Bản stream (/chat/stream): dịch lỗi trước token đầu hoặc giữa chừng → không lưu cả
+cache ngữ nghĩa lẫn cache bản dịch; vẫn gửi đủ bản tiếng Việt và đặt prepared.degraded_text.
+
+Dùng LLM giả (không gọi OpenAI), cache chỉ trong bộ nhớ.
+Chạy:  python check/translation_cache_check.py   → exit code 1 nếu có trường hợp sai
+"""
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_processing import pipeline
+from data_processing.answer_cache import SemanticAnswerCache
+from data_processing.deadline import deadline_scope
+from data_processing.translation import TRANSLATION_CACHE
+
+ANSWER_VI = "Thời gian thử việc tối đa là 180 ngày đối với người quản lý doanh nghiệp."
+ANSWER_EN = "The maximum probation period is 180 days for enterprise managers."
+
+
+class FakeLLM:
+    """
+    delay: giây chờ trước khi trả lời; fail: raise thay vì trả lời
+    fail_after: (stream) raise sau chừng ấy token
+    """
+
+    def __init__(self, reply: str, delay: float = 0, fail: bool = False, fail_after: int = -1):
+        self.reply, self.delay, self.fail, self.fail_after = reply, delay, fail, fail_after
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("LLM giả lỗi")
+        return SimpleNamespace(content=self.reply)
+
+    async def astream(self, messages, *args, **kwargs):
+        for i, word in enumerate(self.reply.split(" ")):
+            if i == self.fail_after:
+                raise RuntimeError("LLM giả lỗi giữa chừng")
+            yield SimpleNamespace(content=word + " ")
+
+
+async def _run(name: str, lang_llm: FakeLLM, budget: float, expect_cached: bool, stream: bool = False) -> bool:
+    cache = SemanticAnswerCache(path="")
+    pipeline.get_answer_cache = lambda: cache
+
+    # Mỗi trường hợp 1 câu trả lời khác nhau → không trúng cache bản dịch của trường hợp trước
+    text = f"{ANSWER_VI} ({name})"
+    prepared = pipeline.PreparedAnswer(
+        route="rag", user_lang="en", text=text, translate=True, cache_vector=[1.0, 0.0, 0.0]
+    )
+    with deadline_scope(budget):
+        if stream:
+            answer = "".join([p async for p in pipeline.astream_answer(prepared, llm=None, lang_llm=lang_llm)])
+        else:
+            answer = await pipeline.agenerate_answer(prepared, llm=None, lang_llm=lang_llm)
+    cache.flush()
+
+    translation_cached = TRANSLATION_CACHE.get(text, "en") is not None
+    ok = (len(cache) > 0) == expect_cached and (not stream or translation_cached == expect_cached)
+    if stream and not expect_cached:
+        # Dịch lỗi → client nhận đủ bản tiếng Việt, nơi gọi có bản đầy đủ để lưu lịch sử
+        ok = ok and answer.endswith(text) and prepared.degraded_text == text
+    print(f"{'✅' if ok else '❌'} {name}: trả {answer[:40]!r}…{answer[-20:]!r}, cache {len(cache)} mục")
+    return ok
+
+
+async def main() -> int:
+    results = [
+        await _run("dịch xong", FakeLLM(ANSWER_EN), budget=5, expect_cached=True),
+        await _run("dịch hết giờ", FakeLLM(ANSWER_EN, delay=2), budget=0.2, expect_cached=False),
+        await _run("dịch lỗi", FakeLLM(ANSWER_EN, fail=True), budget=5, expect_cached=False),
+        await _run("stream dịch xong", FakeLLM(ANSWER_EN), budget=5, expect_cached=True, stream=True),
+        await _run("stream lỗi trước token đầu", FakeLLM(ANSWER_EN, fail_after=0), budget=5,
+                   expect_cached=False, stream=True),
+        await _run("stream lỗi giữa chừng", FakeLLM(ANSWER_EN, fail_after=4), budget=5,
+                   expect_cached=False, stream=True),
+    ]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
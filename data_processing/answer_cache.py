@@ -0,0 +1,259 @@
+# data_processing/answer_cache.py
+"""
+Cache câu trả lời theo NGỮ NGHĨA cho nhánh RAG (process_pdf_question).
+
+Câu hỏi diễn đạt khác nhau nhưng cùng ý ("thời gian thử việc tối đa?" /
+"thử việc được bao lâu?") có embedding rất gần nhau → dùng lại câu trả lời
+thay vì gọi thêm 2-3 lần LLM.
+
+- Key: embedding câu hỏi + route + ngôn ngữ trả lời; model_key ("model:số chiều", giống
+  CachedEmbeddings) tách cache theo model embedding → đổi model / số chiều (OPENAI__EMBEDDING_DIMENSIONS)
+  thì các câu trả lời cũ trên đĩa bị bỏ khi nạp
+- Khớp khi cosine >= threshold VÀ cùng tập con số trong câu hỏi
+  ("Điều 35" và "Điều 36" có embedding gần nhau nhưng KHÔNG được dùng chung)
+- TTL + LRU (giới hạn số entry)
+- Backend đĩa: SQLite, TẮT mặc định (bật: ANSWER_CACHE_PATH), nạp lại khi khởi động.
+  Ghi đĩa chạy ở 1 thread riêng, lỗi (vd: nhiều worker gunicorn khóa cùng 1 file) chỉ
+  ghi metric answer_cache_disk_errors_total — không chặn event loop, không làm hỏng câu trả lời
+"""
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from monitoring import metrics
+
+_NUM_RE = re.compile(r"\d+")
+
+
+def number_signature(text: str) -> str:
+    """Tập các con số trong câu hỏi (điều, khoản, năm, mã ngành...)"""
+    return ",".join(sorted(set(_NUM_RE.findall(text or ""))))
+
+
+def _unit(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm > 0 else v
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl_seconds: float = 86400,
+        max_entries: int = 2000,
+        path: Optional[str] = None,
+        model_key: str = ""
+    ):
+        self.model_key = model_key
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.path = path
+
+        # id -> entry, thứ tự = LRU (cuối = mới dùng nhất)
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        # (sql, rows) chờ ghi đĩa; thread ghi tạo lần đầu dùng (sau khi gunicorn fork worker)
+        self._writes: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+        if path:
+            try:
+                self._open_db(path)
+            except sqlite3.Error as e:
+                self._db = None
+                metrics.counter("answer_cache_disk_errors_total").inc(label="open")
+                print(f"⚠️ Không mở được cache câu trả lời trên đĩa ({path}), chỉ dùng RAM: {e}")
+
+    # ---------------- DISK BACKEND ----------------
+    def _open_db(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._db.execute("""
+            create table if not exists answer_cache (
+                id text primary key,
+                route text,
+                lang text,
+                signature text,
+                vector blob,
+                answer text,
+                sources text,
+                created_at real,
+                model text
+            )
+        """)
+        # File tạo trước khi có cột model: các dòng cũ có model NULL → bị bỏ bên dưới
+        columns = {r[1] for r in self._db.execute("pragma table_info(answer_cache)")}
+        if "model" not in columns:
+            self._db.execute("alter table answer_cache add column model text")
+        dropped = self._db.execute(
+            "delete from answer_cache where model is null or model != ?", (self.model_key,)
+        ).rowcount
+        if dropped:
+            print(f"♻️ Bỏ {dropped} câu trả lời cache của model embedding khác '{self.model_key}'")
+        self._db.commit()
+
+        now = time.time()
+        rows = self._db.execute(
+            "select id, route, lang, signature, vector, answer, sources, created_at "
+            "from answer_cache order by created_at"
+        ).fetchall()
+        for r in rows:
+            if now - r[7] > self.ttl_seconds:
+                continue
+            self._entries[r[0]] = {
+                "route": r[1],
+                "lang": r[2],
+                "signature": r[3],
+                "vector": np.frombuffer(r[4], dtype=np.float32),
+                "answer": r[5],
+                "sources": json.loads(r[6] or "[]"),
+                "created_at": r[7],
+            }
+        self._db.execute("delete from answer_cache where created_at < ?", (now - self.ttl_seconds,))
+        self._db.commit()
+        self._evict_over_capacity()
+
+    def _db_write(self, sql: str, rows: List[tuple]):
+        """Xếp hàng ghi đĩa (không chờ)"""
+        if self._db is None or not rows:
+            return
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_loop, name="answer-cache-writer", daemon=True)
+            self._writer.start()
+        self._writes.put((sql, rows))
+
+    def _write_loop(self):
+        while True:
+            sql, rows = self._writes.get()
+            try:
+                self._db.executemany(sql, rows)
+                self._db.commit()
+            except sqlite3.Error as e:
+                metrics.counter("answer_cache_disk_errors_total").inc(label="write")
+                print(f"⚠️ Lỗi ghi cache câu trả lời xuống đĩa: {e}")
+                try:
+                    self._db.rollback()
+                except sqlite3.Error:
+                    pass
+            finally:
+                self._writes.task_done()
+
+    def flush(self):
+        """Chờ ghi xong mọi thay đổi đang xếp hàng (tắt máy / kiểm tra)"""
+        if self._writer is not None:
+            self._writes.join()
+
+    def _db_delete(self, ids: List[str]):
+        self._db_write("delete from answer_cache where id = ?", [(i,) for i in ids])
+
+    # ---------------- API ----------------
+    def lookup(self, vector, route: str, lang: str, signature: str) -> Optional[Dict[str, Any]]:
+        q = _unit(vector)
+        now = time.time()
+
+        with self._lock:
+            expired = [k for k, e in self._entries.items() if now - e["created_at"] > self.ttl_seconds]
+            for k in expired:
+                del self._entries[k]
+            self._db_delete(expired)
+
+            ids = [
+                k for k, e in self._entries.items()
+                if e["route"] == route and e["lang"] == lang and e["signature"] == signature
+                and e["vector"].shape == q.shape
+            ]
+            if not ids:
+                metrics.counter("answer_cache_total").inc(label="miss")
+                return None
+
+            matrix = np.stack([self._entries[k]["vector"] for k in ids])
+            sims = matrix @ q
+            best = int(np.argmax(sims))
+            best_sim = float(sims[best])
+            metrics.summary("answer_cache_best_similarity").observe(best_sim, label=route)
+
+            if best_sim < self.threshold:
+                metrics.counter("answer_cache_total").inc(label="miss")
+                return None
+
+            key = ids[best]
+            self._entries.move_to_end(key)
+            metrics.counter("answer_cache_total").inc(label="hit")
+            return dict(self._entries[key], similarity=best_sim)
+
+    def put(self, vector, route: str, lang: str, signature: str, answer: str, sources=None):
+        entry = {
+            "route": route,
+            "lang": lang,
+            "signature": signature,
+            "vector": _unit(vector),
+            "answer": answer,
+            "sources": sources or [],
+            "created_at": time.time(),
+        }
+        key = uuid.uuid4().hex
+
+        with self._lock:
+            self._entries[key] = entry
+            self._db_write(
+                "insert into answer_cache values (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(key, route, lang, signature, entry["vector"].tobytes(), answer,
+                  json.dumps(entry["sources"], ensure_ascii=False), entry["created_at"], self.model_key)]
+            )
+            self._evict_over_capacity()
+
+    def _evict_over_capacity(self):
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            k, _ = self._entries.popitem(last=False)
+            evicted.append(k)
+        self._db_delete(evicted)
+        if evicted:
+            metrics.counter("answer_cache_evictions_total").inc(amount=len(evicted))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# ===================== SINGLETON (cấu hình qua ENV) =====================
+_cache: Optional[SemanticAnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def embedding_model_key() -> str:
+    """Cùng định dạng CachedEmbeddings.model_key, theo cấu hình embedding của app.py"""
+    model = os.getenv("OPENAI__EMBEDDING_MODEL") or ""
+    dimensions = int(os.getenv("OPENAI__EMBEDDING_DIMENSIONS") or 0)
+    return f"{model}:{dimensions}" if dimensions else model
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """None nếu ANSWER_CACHE_ENABLED=0"""
+    global _cache
+    if os.getenv("ANSWER_CACHE_ENABLED", "1") != "1":
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticAnswerCache(
+                threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400")),
+                max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000")),
+                # Mặc định chỉ RAM; bật đĩa: ANSWER_CACHE_PATH=.cache/answer_cache.sqlite3
+                path=os.getenv("ANSWER_CACHE_PATH", "") or None,
+                model_key=embedding_model_key(),
+            )
+    return _cache
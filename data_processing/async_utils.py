@@ -0,0 +1,26 @@
+# data_processing/async_utils.py
+import asyncio
+import threading
+
+# Event loop nền dùng chung cho các lời gọi sync (CLI app.py, script).
+# Pipeline chính viết bằng async; bản sync chỉ là cầu nối gọi vào loop này.
+# Dùng 1 loop cố định (thay vì asyncio.run mỗi lần) để các client async
+# (AsyncQdrantClient, asyncpg pool, httpx của OpenAI) không bị gắn vào loop đã đóng.
+_loop = None
+_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            t = threading.Thread(target=_loop.run_forever, name="sync-bridge-loop", daemon=True)
+            t.start()
+    return _loop
+
+
+def run_sync(coro):
+    """Chạy coroutine từ code sync và trả về kết quả (block tới khi xong)."""
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    return future.result()
@@ -1,18 +1,223 @@
 # data_processing/context_builder.py
+"""
+Ghép các hit retrieval thành context cho prompt, giới hạn theo TOKEN (tiktoken):
 
-def build_context_from_hits(hits, max_chars: int = 6000) -> str:
-    ctx = []
-    total = 0
+1. Chunk ingest có chunk_overlap=300 → 2 chunk liền nhau cùng source/page lặp lại
+   ~300 ký tự. Phần trùng bị bỏ: chunk sau nối tiếp vào chunk trước (giữ 1 header)
+2. Xếp theo thứ tự liên quan; hit không vừa ngân sách → cắt tại ranh giới câu
+   thay vì bỏ hẳn; phần còn lại quá nhỏ thì bỏ qua và thử các hit sau (có thể ngắn hơn)
+3. Số token tiết kiệm được (phần trùng) ghi vào metrics mỗi lần ghép
 
-    for h in hits:
-        source = h.metadata.get("source", "unknown")
-        page = h.metadata.get("page", "?")
-        seg = f"[Nguồn: {source}, Trang: {page}]\n{h.page_content.strip()}"
+Không nạp được encoding của tiktoken (thiếu thư viện / không tải được file BPE)
+→ ước lượng theo số ký tự.
+"""
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import List, Optional
 
-        if total + len(seg) > max_chars:
-            break
+from monitoring import metrics
 
-        ctx.append(seg)
-        total += len(seg)
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
-    return "\n\n".join(ctx)
+# Ngân sách context cho 1 prompt (≈ 6000 ký tự tiếng Việt của bản đếm ký tự cũ)
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "2000"))
+# Phần cắt từ hit cuối ít hơn mức này → bỏ qua hit đó
+CONTEXT_MIN_TAIL_TOKENS = int(os.getenv("CONTEXT_MIN_TAIL_TOKENS", "60"))
+TIKTOKEN_ENCODING = os.getenv("TIKTOKEN_ENCODING", "o200k_base")  # gpt-4o / gpt-4o-mini
+# Ước lượng khi không có tiktoken
+CHARS_PER_TOKEN_ESTIMATE = float(os.getenv("CHARS_PER_TOKEN_ESTIMATE", "3"))
+
+# Phần trùng giữa 2 chunk: ngắn hơn → có thể chỉ là cụm từ hay gặp; dài hơn → không phải overlap
+MIN_OVERLAP_CHARS = 30
+MAX_OVERLAP_CHARS = int(os.getenv("CONTEXT_MAX_OVERLAP_CHARS", "600"))
+
+_SENTENCE_END_RE = re.compile(r"[.!?;:…](?=\s)|\n")
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+
+# ===================== ĐẾM TOKEN =====================
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is not None or _encoding_failed or tiktoken is None:
+        return _encoding
+    with _encoding_lock:
+        if _encoding is None and not _encoding_failed:
+            try:
+                _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+            except Exception as e:
+                _encoding_failed = True
+                print(f"⚠️ Không nạp được tiktoken '{TIKTOKEN_ENCODING}', đếm token gần đúng: {e}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    enc = _get_encoding()
+    if enc is None:
+        return int(len(text) / CHARS_PER_TOKEN_ESTIMATE + 0.5)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def _head_by_tokens(text: str, max_tokens: int) -> str:
+    enc = _get_encoding()
+    if enc is None:
+        return text[:int(max_tokens * CHARS_PER_TOKEN_ESTIMATE)]
+    return enc.decode(enc.encode(text, disallowed_special=())[:max_tokens])
+
+
+def truncate_at_sentence(text: str, max_tokens: int) -> str:
+    """Phần đầu của text trong max_tokens, kết thúc ở cuối câu (không có thì ở khoảng trắng)"""
+    head = _head_by_tokens(text, max_tokens)
+    if len(head) >= len(text):
+        return text
+    ends = [m.end() for m in _SENTENCE_END_RE.finditer(head)]
+    # Bỏ quá nửa đoạn đã cắt chỉ để tròn câu thì không đáng
+    if ends and ends[-1] >= len(head) // 2:
+        return head[:ends[-1]].rstrip()
+    cut = head.rfind(" ")
+    return (head[:cut] if cut > 0 else head).rstrip() + " …"
+
+
+# ===================== BỎ PHẦN TRÙNG =====================
+def overlap_length(prev: str, nxt: str) -> int:
+    """Độ dài phần cuối của prev trùng với phần đầu của nxt (0 nếu không trùng)"""
+    tail = prev[-MAX_OVERLAP_CHARS:]
+    probe = nxt[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    start = tail.find(probe)
+    while start != -1:
+        length = len(tail) - start
+        if nxt.startswith(tail[start:]):
+            return length
+        start = tail.find(probe, start + 1)
+    return 0
+
+
+@dataclass
+class _Segment:
+    source: str
+    page: str
+    text: str
+
+    @property
+    def header(self) -> str:
+        return f"[Nguồn: {self.source}, Trang: {self.page}]"
+
+    def render(self, text: Optional[str] = None) -> str:
+        return f"{self.header}\n{self.text if text is None else text}"
+
+
+def _combine(a: str, b: str) -> Optional[str]:
+    """a và b trùng / nối tiếp nhau → văn bản gộp; không liên quan → None"""
+    if b in a:
+        return a
+    if a in b:
+        return b
+    n = overlap_length(a, b)
+    if n:
+        return a + b[n:]
+    n = overlap_length(b, a)
+    if n:
+        return b + a[n:]
+    return None
+
+
+def _merge(segments: List[_Segment], source: str, page: str, text: str) -> bool:
+    """Gộp text vào segment cùng source/page nếu trùng / nối tiếp; False = segment mới"""
+    same = [seg for seg in segments if seg.source == source and seg.page == page]
+    for seg in same:
+        combined = _combine(seg.text, text)
+        if combined is None:
+            continue
+        seg.text = combined
+        # Chunk mới có thể nối 2 segment trước đó (hit 1 rồi hit 3, sau đó mới tới hit 2)
+        for other in same:
+            if other is not seg and other in segments:
+                joined = _combine(seg.text, other.text)
+                if joined is not None:
+                    seg.text = joined
+                    segments.remove(other)
+        return True
+    return False
+
+
+# ===================== GHÉP CONTEXT =====================
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    # Token của các hit ghép nguyên văn (mỗi hit 1 header, chưa bỏ trùng / cắt ngân sách)
+    raw_tokens: int
+    overlap_tokens_saved: int
+    merged: int = 0
+    truncated: int = 0
+    dropped: int = 0
+
+
+def pack_context(hits, max_tokens: int = CONTEXT_MAX_TOKENS) -> PackedContext:
+    segments: List[_Segment] = []
+    raw_tokens = 0
+    merged = 0
+    for h in hits or []:
+        source = str(h.metadata.get("source", "unknown"))
+        page = str(h.metadata.get("page", "?"))
+        text = (h.page_content or "").strip()
+        if not text:
+            continue
+        raw_tokens += count_tokens(f"[Nguồn: {source}, Trang: {page}]\n{text}")
+        if _merge(segments, source, page, text):
+            merged += 1
+        else:
+            segments.append(_Segment(source, page, text))
+
+    rendered = [seg.render() for seg in segments]
+    seg_tokens = [count_tokens(r) for r in rendered]
+    overlap_saved = max(0, raw_tokens - sum(seg_tokens))
+
+    parts: List[str] = []
+    used = truncated = dropped = 0
+    separator = count_tokens("\n\n")
+    for seg, text, tokens in zip(segments, rendered, seg_tokens):
+        cost = tokens + (separator if parts else 0)
+        if used + cost <= max_tokens:
+            parts.append(text)
+            used += cost
+            continue
+
+        remaining = max_tokens - used - (separator if parts else 0) - count_tokens(seg.header + "\n")
+        if remaining >= CONTEXT_MIN_TAIL_TOKENS:
+            piece = seg.render(truncate_at_sentence(seg.text, remaining))
+            parts.append(piece)
+            used += count_tokens(piece) + (separator if len(parts) > 1 else 0)
+            truncated += 1
+        else:
+            dropped += 1
+
+    text = "\n\n".join(parts)
+    return PackedContext(
+        text=text,
+        tokens=used,
+        raw_tokens=raw_tokens,
+        overlap_tokens_saved=overlap_saved,
+        merged=merged,
+        truncated=truncated,
+        dropped=dropped
+    )
+
+
+def build_context_from_hits(hits, max_tokens: int = CONTEXT_MAX_TOKENS) -> str:
+    packed = pack_context(hits, max_tokens)
+    metrics.summary("context_tokens").observe(packed.tokens)
+    metrics.summary("context_overlap_tokens_saved").observe(packed.overlap_tokens_saved)
+    for label, amount in (("merged", packed.merged), ("truncated", packed.truncated), ("dropped", packed.dropped)):
+        if amount:
+            metrics.counter("context_chunks_total").inc(label=label, amount=amount)
+    return packed.text
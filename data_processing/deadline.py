@@ -0,0 +1,83 @@
+# data_processing/deadline.py
+"""
+Ngân sách thời gian (deadline) cho 1 request, truyền ngầm qua contextvars.
+
+main.py đặt deadline khi nhận request (deadline_scope); mỗi bước của pipeline
+(nhận diện ngôn ngữ, phân loại follow-up, retrieval, sinh câu trả lời, dịch)
+chạy qua `within(...)`:
+- chỉ được dùng phần thời gian CÒN LẠI
+- hết giờ → hủy bước đó, trả `fallback` để pipeline xuống cấp nhẹ nhàng
+  (bỏ dịch, trả nguyên văn tài liệu thay vì để LLM viết lại...)
+- không có fallback → raise DeadlineExceeded
+
+Không đặt deadline (CLI, script) → mọi bước chạy như cũ.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Optional
+
+from monitoring import metrics
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+_RAISE = object()
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage: str):
+        super().__init__(f"Hết thời gian ở bước: {stage}")
+        self.stage = stage
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Đặt deadline cho đoạn code bên trong (và mọi Task tạo ra từ đó)."""
+    token = _deadline.set(time.monotonic() + seconds if seconds else None)
+    try:
+        yield
+    finally:
+        try:
+            _deadline.reset(token)
+        except ValueError:
+            # Async generator (SSE) bị đóng từ context khác khi client ngắt kết nối
+            pass
+
+
+def remaining() -> Optional[float]:
+    """Số giây còn lại; None nếu không có deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+async def within(aw: Awaitable, stage: str, fallback: Any = _RAISE, cap: Optional[float] = None):
+    """
+    Chạy 1 bước trong phần ngân sách còn lại.
+    cap: thời gian tối đa riêng của bước (vd: bước phân loại rẻ không được ăn hết
+    ngân sách của bước sinh câu trả lời). Chỉ áp dụng khi có deadline.
+    """
+    left = remaining()
+    if left is None:
+        return await aw
+    if cap is not None:
+        left = min(left, cap)
+
+    try:
+        if left <= 0:
+            raise asyncio.TimeoutError
+        return await asyncio.wait_for(aw, timeout=left)
+    except asyncio.TimeoutError:
+        if asyncio.iscoroutine(aw):
+            aw.close()  # chưa kịp chạy → tránh cảnh báo "never awaited"
+        metrics.counter("deadline_exceeded_total").inc(label=stage)
+        print(f"⏱️ Hết ngân sách thời gian ở bước '{stage}'")
+        if fallback is _RAISE:
+            raise DeadlineExceeded(stage)
+        return fallback
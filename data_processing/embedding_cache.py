@@ -0,0 +1,312 @@
+# data_processing/embedding_cache.py
+"""
+Cache embedding câu hỏi dùng chung cho MỌI retriever trong process.
+
+1 câu hỏi trước đây có thể bị embed 3+ lần (retriever luật, MST, VSIC 2018,
+cache ngữ nghĩa...) — mỗi lần 1 vector 3072 chiều giống hệt nhau.
+CachedEmbeddings bọc ngoài OpenAIEmbeddings (app.emb):
+- Key: (model, câu hỏi đã chuẩn hóa Unicode NFC + gộp khoảng trắng)
+- RAM: LRU giới hạn số vector (EMBEDDING_CACHE_MAX_ENTRIES)
+- Đĩa: SQLite tùy chọn (EMBEDDING_CACHE_PATH), đọc khi RAM miss; LRU theo used_at (cập nhật
+  mỗi lần dùng), dọn về EMBEDDING_CACHE_DISK_MAX_ENTRIES định kỳ. Không chạy SQLite trên
+  event loop: đọc qua asyncio.to_thread, ghi ở 1 thread riêng (giống answer_cache)
+- Async: nhiều coroutine cùng embed 1 câu (vd: retrieval chạy trước song song với
+  cache ngữ nghĩa) → chỉ 1 lần gọi API, các coroutine còn lại chờ kết quả đó
+Embedding không phụ thuộc thời gian → không có TTL.
+"""
+import asyncio
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from monitoring import metrics
+
+
+def normalize_for_embedding(text: str) -> str:
+    t = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", t).strip()
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(
+        self,
+        inner: Embeddings,
+        max_entries: int = 2048,
+        path: Optional[str] = None,
+        disk_max_entries: int = 100000,
+        prune_seconds: float = 600
+    ):
+        self.inner = inner
+        self.max_entries = max_entries
+        self.path = path
+        self.disk_max_entries = disk_max_entries
+        self.prune_seconds = prune_seconds
+
+        # key -> vector float32, thứ tự = LRU (cuối = mới dùng nhất)
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Mở SQLite lần đầu dùng (sau khi gunicorn fork worker); _db_lock bảo vệ connection
+        self._db = None
+        self._db_opened = False
+        self._db_lock = threading.Lock()
+        # (sql, rows) chờ ghi đĩa, thread ghi tạo lần đầu dùng (giống answer_cache)
+        self._writes: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._inserted_since_prune = 0
+        self._pruned_at = time.time()
+
+    def __getattr__(self, name):
+        # model, dimensions, client... của embedding gốc
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    @property
+    def model_key(self) -> str:
+        model = getattr(self.inner, "model", None) or type(self.inner).__name__
+        dimensions = getattr(self.inner, "dimensions", None)
+        return f"{model}:{dimensions}" if dimensions else str(model)
+
+    def _key(self, text: str) -> str:
+        return f"{self.model_key}\x1f{normalize_for_embedding(text)}"
+
+    # ---------------- DISK BACKEND ----------------
+    # SQLite không chạy trên event loop: bản async đọc qua asyncio.to_thread; ghi vector mới,
+    # cập nhật used_at (LRU trên đĩa) và dọn bớt về disk_max_entries chạy ở 1 thread ghi riêng
+    def _disk(self):
+        """Gọi khi đang giữ _db_lock"""
+        if self._db_opened:
+            return self._db
+        self._db_opened = True
+        if not self.path:
+            return None
+        try:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            db.execute("""
+                create table if not exists embedding_cache (
+                    key text primary key,
+                    vector blob,
+                    used_at real
+                )
+            """)
+            db.execute("create index if not exists embedding_cache_used_at on embedding_cache (used_at)")
+            db.commit()
+            self._db = db
+            self._prune()
+        except sqlite3.Error as e:
+            metrics.counter("embedding_cache_disk_errors_total").inc(label="open")
+            print(f"⚠️ Không mở được cache embedding trên đĩa ({self.path}): {e}")
+        return self._db
+
+    def _prune(self):
+        """Giữ tối đa disk_max_entries vector dùng gần nhất. Gọi khi đang giữ _db_lock"""
+        removed = self._db.execute("""
+            delete from embedding_cache where key not in (
+                select key from embedding_cache order by used_at desc limit ?
+            )
+        """, (self.disk_max_entries,)).rowcount
+        self._db.commit()
+        self._inserted_since_prune = 0
+        self._pruned_at = time.time()
+        if removed:
+            metrics.counter("embedding_cache_disk_pruned_total").inc(amount=removed)
+
+    def _disk_get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Đọc vector trên đĩa (chạy ngoài event loop); trúng → cập nhật used_at"""
+        if not self.path or not keys:
+            return {}
+        found = {}
+        with self._db_lock:
+            db = self._disk()
+            if db is None:
+                return {}
+            try:
+                for key in keys:
+                    row = db.execute("select vector from embedding_cache where key = ?", (key,)).fetchone()
+                    if row is not None:
+                        found[key] = np.frombuffer(row[0], dtype=np.float32)
+            except sqlite3.Error as e:
+                metrics.counter("embedding_cache_disk_errors_total").inc(label="read")
+                print(f"⚠️ Lỗi đọc cache embedding trên đĩa: {e}")
+        self._touch(list(found))
+        return found
+
+    def _touch(self, keys: List[str]):
+        if keys:
+            now = time.time()
+            self._db_write("update embedding_cache set used_at = ? where key = ?", [(now, k) for k in keys])
+
+    def _db_write(self, sql: str, rows: List[tuple]):
+        """Xếp hàng ghi đĩa (không chờ)"""
+        if not self.path or not rows:
+            return
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_loop, name="embedding-cache-writer", daemon=True)
+            self._writer.start()
+        self._writes.put((sql, rows))
+
+    def _write_loop(self):
+        while True:
+            sql, rows = self._writes.get()
+            try:
+                with self._db_lock:
+                    db = self._disk()
+                    if db is None:
+                        continue
+                    db.executemany(sql, rows)
+                    db.commit()
+                    if sql.startswith("insert"):
+                        self._inserted_since_prune += len(rows)
+                    # Dọn định kỳ: sau mỗi 10% dung lượng ghi mới hoặc mỗi prune_seconds
+                    if self._inserted_since_prune and (
+                        self._inserted_since_prune >= max(1, self.disk_max_entries // 10)
+                        or time.time() - self._pruned_at > self.prune_seconds
+                    ):
+                        self._prune()
+            except sqlite3.Error as e:
+                metrics.counter("embedding_cache_disk_errors_total").inc(label="write")
+                print(f"⚠️ Lỗi ghi cache embedding xuống đĩa: {e}")
+                try:
+                    self._db.rollback()
+                except sqlite3.Error:
+                    pass
+            finally:
+                self._writes.task_done()
+
+    def flush(self):
+        """Chờ ghi xong mọi thay đổi đang xếp hàng (tắt máy / kiểm tra)"""
+        if self._writer is not None:
+            self._writes.join()
+
+    # ---------------- LOOKUP / STORE ----------------
+    def _lookup_memory(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is None:
+                return None
+            self._vectors.move_to_end(key)
+        metrics.counter("embedding_cache_total").inc(label="memory")
+        self._touch([key])
+        return vector.tolist()
+
+    def _from_disk(self, found: Dict[str, np.ndarray]) -> Dict[str, List[float]]:
+        with self._lock:
+            for key, vector in found.items():
+                self._remember(key, vector)
+        if found:
+            metrics.counter("embedding_cache_total").inc(label="disk", amount=len(found))
+        return {key: vector.tolist() for key, vector in found.items()}
+
+    def _lookup(self, key: str) -> Optional[List[float]]:
+        """Bản sync (CLI): RAM rồi đĩa"""
+        vector = self._lookup_memory(key)
+        if vector is None:
+            vector = self._from_disk(self._disk_get([key])).get(key)
+        return vector
+
+    async def _alookup_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        """RAM trên event loop; các key còn thiếu đọc đĩa 1 lần trong thread"""
+        vectors = [self._lookup_memory(k) for k in keys]
+        missing = [k for k, v in zip(keys, vectors) if v is None]
+        if missing and self.path:
+            found = self._from_disk(await asyncio.to_thread(self._disk_get, missing))
+            vectors = [v if v is not None else found.get(k) for k, v in zip(keys, vectors)]
+        return vectors
+
+    def _store(self, key: str, vector: List[float]) -> List[float]:
+        """Lưu float32; trả về đúng vector đã lưu để lần đầu và các lần sau giống hệt nhau"""
+        v = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, v)
+        self._db_write("insert or replace into embedding_cache values (?, ?, ?)", [(key, v.tobytes(), time.time())])
+        return v.tolist()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """Gọi khi đang giữ _lock"""
+        self._vectors[key] = vector
+        self._vectors.move_to_end(key)
+        while len(self._vectors) > self.max_entries:
+            self._vectors.popitem(last=False)
+        metrics.gauge("embedding_cache_entries").set(len(self._vectors))
+
+    # ---------------- EMBEDDINGS API ----------------
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = self._lookup(key)
+        if vector is None:
+            metrics.counter("embedding_cache_total").inc(label="miss")
+            vector = self._store(key, self.inner.embed_query(text))
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        vector = (await self._alookup_many([key]))[0]
+        if vector is not None:
+            return vector
+
+        future = self._inflight.get(key)
+        if future is not None:
+            metrics.counter("embedding_cache_total").inc(label="inflight")
+            return np.asarray(await asyncio.shield(future), dtype=np.float32).tolist()
+
+        metrics.counter("embedding_cache_total").inc(label="miss")
+        # Request đầu bị hủy thì lời gọi API vẫn chạy tiếp cho các request đang chờ
+        future = asyncio.ensure_future(self.inner.aembed_query(text))
+        self._inflight[key] = future
+        future.add_done_callback(lambda f: self._settle(key, f))
+        return np.asarray(await asyncio.shield(future), dtype=np.float32).tolist()
+
+    def _settle(self, key: str, future: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self._store(key, future.result())
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        vectors = [self._lookup(k) for k in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            metrics.counter("embedding_cache_total").inc(label="miss", amount=len(missing))
+            for i, v in zip(missing, self.inner.embed_documents([texts[i] for i in missing])):
+                vectors[i] = self._store(keys[i], v)
+        return vectors
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """1 lần gọi API cho các câu chưa có trong cache (vd: /chat/batch)"""
+        keys = [self._key(t) for t in texts]
+        vectors = await self._alookup_many(keys)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            metrics.counter("embedding_cache_total").inc(label="miss", amount=len(missing))
+            embedded = await self.inner.aembed_documents([texts[i] for i in missing])
+            for i, v in zip(missing, embedded):
+                vectors[i] = self._store(keys[i], v)
+        return vectors
+
+    def __len__(self):
+        return len(self._vectors)
+
+
+def cached_embeddings(inner: Embeddings) -> Embeddings:
+    """Bọc embedding gốc, cấu hình qua ENV (EMBEDDING_CACHE_ENABLED=0 → trả về nguyên embedding gốc)"""
+    if os.getenv("EMBEDDING_CACHE_ENABLED", "1") != "1":
+        return inner
+    return CachedEmbeddings(
+        inner,
+        max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "2048")),
+        path=os.getenv("EMBEDDING_CACHE_PATH", "") or None,
+        disk_max_entries=int(os.getenv("EMBEDDING_CACHE_DISK_MAX_ENTRIES", "100000")),
+        prune_seconds=float(os.getenv("EMBEDDING_CACHE_PRUNE_SECONDS", "600")),
+    )
@@ -1,54 +1,290 @@
 # data_processing/intent.py
+"""
+Nhận diện intent câu hỏi bằng MỘT lần quét văn bản.
+
+Trước đây mỗi hàm is_*_query tự lower() rồi quét lại câu hỏi với danh sách từ khóa
+riêng (main.py, pipeline, mst, law_db_query...) → 1 câu hỏi bị quét ~8 lần.
+Giờ mọi từ khóa được biên dịch vào 1 regex (dạng trie, xem _KeywordMatcher):
+- classify(text) trả về TẤT CẢ từ khóa khớp + vị trí, theo từng intent
+- Các hàm is_*_query cũ giữ nguyên tên / kết quả, chỉ đọc từ classify()
+- IntentMatch.first(...) chọn intent theo thứ tự ưu tiên (giống thứ tự if/elif cũ)
+
+Văn bản được lower() + chuẩn hóa Unicode NFC trước khi quét: câu gõ bằng bộ gõ
+dựng sẵn / tổ hợp (NFD) cho cùng kết quả.
+
+Danh sách từ khóa giữ NGUYÊN như cũ (kể cả các chuỗi bị dính do thiếu dấu phẩy)
+để routing không đổi — xem check/intent_corpus.json.
+"""
 import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
 
-def is_vsic_code_query(text: str) -> bool:
+# ===================== TỪ KHÓA THEO INTENT =====================
+VSIC_KEYWORDS = [
+    "mã ngành",
+    "ngành nghề",
+    "vsic",
+    "hệ thống ngành kinh tế",
+    "mã kinh tế",
+]
+
+# Vẽ flowchart
+FLOWCHART_KEYWORDS = [
+    # VI
+    "flowchart", "sơ đồ", "sơ đồ luồng", "luồng", "quy trình", "diagram",
+    "vẽ luồng", "vẽ sơ đồ", "vẽ flow", "mermaid","vẽ"
+    # EN
+    "workflow", "process flow", "flow chart"
+]
+
+# Chào hỏi
+GREETING_KEYWORDS = [
+    # VI
+    "xin chào", "chào", "chào bạn", "chào anh", "chào chị",
+    "bạn là ai", "bạn làm được gì", "giúp tôi", "giúp mình","bạn biết làm những gì", "chatiip là gì"
+    # EN
+    "hello", "hi", "hey", "good morning", "good afternoon", "good evening",
+    "who are you", "what can you do", "help me"
+]
+
+LAW_COUNT_KEYWORDS = [
+    "bao nhiêu luật",
+    "số lượng luật",
+    "bao nhiêu văn bản luật",
+    "số lượng văn bản luật",
+    "bao nhiêu văn bản pháp luật",
+    "trong hệ thống có bao nhiêu luật",
+    "trong database có bao nhiêu luật"
+]
+
+MST_KEYWORDS = [
+    "mã số thuế",
+    "mst",
+    "tra cứu mst",
+    "mã số doanh nghiệp",
+    "tax code"
+]
+
+# BĐS Công Nghiệp (KCN/CCN) → iz_agent
+IZ_AGENT_KEYWORDS = [
+    "kcn", "ccn", "khu công nghiệp", "cụm công nghiệp",
+    "giá thuê", "giá đất", "diện tích", "biểu đồ", "so sánh",
+    "mật độ", "tỷ lệ lấp đầy", "chủ đầu tư", "vẽ biểu đồ",
+    "danh sách", "liệt kê", "bao nhiêu", "ở đâu"
+]
+
+LABOR_KEYWORDS = [
+    "lao động", "việc làm", "người lao động", "người sử dụng lao động",
+    "hợp đồng lao động", "thử việc", "thời gian thử việc",
+    "tiền lương", "lương", "tiền công", "trả lương",
+    "bảo hiểm xã hội", "bhxh", "bảo hiểm y tế", "bhyt",
+    "bảo hiểm thất nghiệp", "bhtn",
+    "doanh nghiệp", "công ty"
+]
+
+# Câu hỏi tham chiếu rõ ràng tới hội thoại trước → chắc chắn là follow-up
+# (không cần hỏi LLM; xem data_processing/preclassify.py)
+FOLLOWUP_REF_KEYWORDS = [
+    "điều luật trên", "nội dung trên", "vừa nêu", "ở trên", "như trên", "nói trên",
+    "vừa rồi", "câu trả lời trước", "câu hỏi trước", "bạn vừa", "điều đó", "luật đó",
+    "văn bản đó", "vấn đề đó", "trường hợp đó", "giải thích thêm", "chi tiết hơn",
+    "cụ thể hơn", "nói rõ hơn",
+    "mentioned above", "as above", "previous answer", "you just said", "tell me more",
+    "more details", "that law", "that article",
+]
+
+# Tra điều luật: "Điều 30 luật lao động". Regex chỉ chạy khi đã thấy cả 2 từ
+LAW_ARTICLE_PATTERN = re.compile(r"điều\s+\d+.*luật\s+.+")
+_LAW_ARTICLE_MARKERS = ["điều", "luật"]
+
+# Mã VSIC 5 chữ số (vd: 46510). Tương đương r"\b\d{5}\b" nhưng mở đầu bằng \d
+# → re bỏ qua nhanh các ký tự không phải chữ số (câu dài nhanh hơn ~2.5 lần)
+_VSIC_CODE_PATTERN = re.compile(r"\d(?<!\w\d)\d{4}(?!\w)")
+
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "greeting": GREETING_KEYWORDS,
+    "flowchart": FLOWCHART_KEYWORDS,
+    "law_count": LAW_COUNT_KEYWORDS,
+    "mst": MST_KEYWORDS,
+    "iz_agent": IZ_AGENT_KEYWORDS,
+    "vsic": VSIC_KEYWORDS,
+    "labor": LABOR_KEYWORDS,
+    "_law_article": _LAW_ARTICLE_MARKERS,
+    "_followup_ref": FOLLOWUP_REF_KEYWORDS,
+}
+
+# ===================== THỨ TỰ ƯU TIÊN =====================
+# main.py (resolve_route): LAW COUNT → MST → IZ AGENT → RAG
+API_ROUTE_PRIORITY = ("law_count", "mst", "iz_agent")
+# pipeline (aprepare_answer): CHÀO HỎI → FLOWCHART → (excel, law_count từ DB) → VSIC → RAG
+PIPELINE_ROUTE_PRIORITY = ("greeting", "flowchart", "vsic")
+
+
+# ===================== REGEX TỪ KHÓA =====================
+_END = ""
+
+
+class _KeywordMatcher:
     """
-    Nhận diện câu hỏi liên quan đến mã ngành kinh tế (VSIC)
+    Tìm mọi từ khóa (kể cả chồng lấn nhau, vd "bao nhiêu" trong "bao nhiêu luật") bằng
+    1 regex biên dịch từ trie của các từ khóa: phần duyệt từng ký tự chạy trong C (re),
+    không phải vòng lặp Python (automaton Python cũ chậm ~3 lần scan cũ với câu dài).
+    - regex dạng trie, khớp tham lam → tại mỗi vị trí lấy từ khóa DÀI NHẤT
+    - các từ khóa nằm trọn trong từ khóa vừa khớp ("bao nhiêu" trong "bao nhiêu luật",
+      "lao động" trong "người lao động") tính sẵn theo từng từ khóa (_plan)
+    - tìm tiếp từ sau từ khóa vừa khớp, hoặc sớm hơn nếu 1 từ khóa khác có thể bắt đầu
+      bên trong nó và kéo dài ra ngoài (đuôi của nó là phần đầu của từ khóa khác)
     """
 
-    if not text:
-        return False
+    def __init__(self, keywords: Iterable[Tuple[str, str]]):
+        trie: Dict[str, dict] = {}
+        owners: Dict[str, List[Tuple[str, str]]] = {}
+        for intent, keyword in keywords:
+            if not keyword:
+                continue
+            pairs = owners.setdefault(keyword, [])
+            if (intent, keyword) not in pairs:
+                pairs.append((intent, keyword))
+            node = trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[_END] = {}
 
-    t = text.lower().strip()
+        heads = {k[:j] for k in owners for j in range(1, len(k))}
+        # từ khóa dài nhất khớp tại vị trí s → (tìm tiếp từ s + resume, [(intent, keyword, lệch so với s)])
+        self._plan: Dict[str, Tuple[int, Tuple[Tuple[str, str, int], ...]]] = {}
+        for keyword in owners:
+            resume = next((i for i in range(1, len(keyword)) if keyword[i:] in heads), len(keyword))
+            self._plan[keyword] = (resume, tuple(
+                (intent, k, i)
+                for i in range(resume)
+                for j in range(i + 1, len(keyword) + 1)
+                for intent, k in owners.get(keyword[i:j], ())
+            ))
+        self._pattern = re.compile("|".join(re.escape(ch) + self._tail(child) for ch, child in trie.items()))
 
-    if re.search(r"\b\d{5}\b", t):
-        return True
+    @classmethod
+    def _tail(cls, node: Dict[str, dict]) -> str:
+        """Regex khớp phần còn lại của các từ khóa dưới node trie, ưu tiên phần dài nhất"""
+        alts = [re.escape(ch) + cls._tail(child) for ch, child in node.items() if ch != _END]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else f"(?:{'|'.join(alts)})"
+        return f"(?:{body})?" if _END in node else body
 
-    # 2️⃣ Từ khóa đặc trưng
-    keywords = [
-        "mã ngành",
-        "ngành nghề",
-        "vsic",
-        "hệ thống ngành kinh tế",
-        "mã kinh tế",
-    ]
+    def scan(self, text: str) -> List[Tuple[str, str, int]]:
+        """[(intent, keyword, vị trí bắt đầu)] theo thứ tự vị trí bắt đầu"""
+        search, plan = self._pattern.search, self._plan
+        hits = []
+        m = search(text)
+        while m:
+            start = m.start()
+            resume, inner = plan[m.group()]
+            for intent, keyword, offset in inner:
+                hits.append((intent, keyword, start + offset))
+            m = search(text, start + resume)
+        return hits
+
+
+_MATCHER = _KeywordMatcher(
+    (intent, k) for intent, keywords in INTENT_KEYWORDS.items() for k in keywords
+)
+
+_GREETING_PREFIXES = tuple(GREETING_KEYWORDS)
+
+# Chào hỏi khớp cả khi CẢ câu là 1 phần của lời chào ("chà", "hel"...) — giữ như cũ
+_GREETING_FRAGMENTS = frozenset(
+    g[i:j] for g in GREETING_KEYWORDS for i in range(len(g)) for j in range(i, len(g) + 1)
+)
+
+
+# ===================== KẾT QUẢ PHÂN LOẠI =====================
+@dataclass(frozen=True)
+class IntentMatch:
+    """
+    - text   : văn bản đã lower() + NFC (vị trí trong hits tính trên chuỗi này)
+    - hits   : mọi (intent, keyword, vị trí) khớp; intent bắt đầu bằng "_" là nội bộ
+    - intents: các intent thỏa điều kiện (đã áp quy tắc riêng của greeting / vsic / law_article)
+    """
+    text: str
+    hits: Tuple[Tuple[str, str, int], ...]
+    intents: FrozenSet[str]
+
+    def has(self, intent: str) -> bool:
+        return intent in self.intents
+
+    def keywords(self, intent: str) -> List[str]:
+        return [k for i, k, _ in self.hits if i == intent]
+
+    def first(self, priority: Sequence[str]) -> Optional[str]:
+        """Intent đầu tiên theo thứ tự ưu tiên (None nếu không có)"""
+        for intent in priority:
+            if intent in self.intents:
+                return intent
+        return None
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFC", (text or "").lower())
+
+
+@lru_cache(maxsize=4096)
+def classify(text: str) -> IntentMatch:
+    """
+    Quét câu hỏi 1 lần, trả về mọi intent khớp.
+    Có cache: main.py và pipeline cùng hỏi về 1 câu → chỉ quét 1 lần.
+    """
+    t = normalize_text(text)
+    hits = tuple(_MATCHER.scan(t))
+    matched = {intent for intent, _, _ in hits}
+    intents = {intent for intent in matched if not intent.startswith("_") and intent != "greeting"}
+
+    # Chào hỏi: câu BẮT ĐẦU bằng lời chào (bỏ khoảng trắng đầu), hoặc cả câu nằm trong 1 lời chào
+    q = t.strip()
+    lead = len(t) - len(t.lstrip())
+    if q in _GREETING_FRAGMENTS or ("greeting" in matched and t.startswith(_GREETING_PREFIXES, lead)):
+        intents.add("greeting")
+
+    if "vsic" not in intents and _VSIC_CODE_PATTERN.search(t):
+        intents.add("vsic")
+
+    if (
+        "_law_article" in matched
+        and all(marker in t for marker in _LAW_ARTICLE_MARKERS)
+        and LAW_ARTICLE_PATTERN.search(t)
+    ):
+        intents.add("law_article")
+
+    return IntentMatch(text=t, hits=hits, intents=frozenset(intents))
+
+
+# ===================== API CŨ (giữ nguyên tên) =====================
+def is_vsic_code_query(text: str) -> bool:
+    """
+    Nhận diện câu hỏi liên quan đến mã ngành kinh tế (VSIC)
+    """
+    if not text:
+        return False
+    return classify(text).has("vsic")
 
-    return any(k in t for k in keywords)
 
-# Vẽ flowchart
 def is_flowchart_intent(message: str) -> bool:
     """
     Nhận diện intent vẽ flowchart/sơ đồ luồng/quy trình
     """
-    keywords = [
-        # VI
-        "flowchart", "sơ đồ", "sơ đồ luồng", "luồng", "quy trình", "diagram",
-        "vẽ luồng", "vẽ sơ đồ", "vẽ flow", "mermaid","vẽ"
-        # EN
-        "workflow", "process flow", "flow chart"
-    ]
-    msg = (message or "").lower()
-    return any(k in msg for k in keywords)
+    return classify(message or "").has("flowchart")
+
 
-# Chào hỏi
 def is_greeting_question(question: str) -> bool:
-    greetings = [
-        # VI
-        "xin chào", "chào", "chào bạn", "chào anh", "chào chị",
-        "bạn là ai", "bạn làm được gì", "giúp tôi", "giúp mình","bạn biết làm những gì", "chatiip là gì"
-        # EN
-        "hello", "hi", "hey", "good morning", "good afternoon", "good evening",
-        "who are you", "what can you do", "help me"
-    ]
-    q = question.lower().strip()
-    return any(q in g or q.startswith(g) for g in greetings)
\ No newline at end of file
+    return classify(question).has("greeting")
+
+
+def is_iz_agent_query(message: str) -> bool:
+    """Kiểm tra xem câu hỏi có liên quan đến BĐS Công Nghiệp (KCN/CCN) không"""
+    return classify(message).has("iz_agent")
+
+
+def is_labor_related_question(question: str) -> bool:
+    return classify(question).has("labor")
@@ -1,46 +1,298 @@
 # data_processing/language.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 from langchain_core.messages import SystemMessage, HumanMessage
 
+from data_processing.sessions import SHARED_SESSIONS
+from monitoring import metrics
+
+try:
+    from langdetect.detector_factory import DetectorFactory, PROFILES_DIRECTORY
+    from langdetect.lang_detect_exception import LangDetectException
+except ImportError:
+    DetectorFactory = None
+
+lang_mapping = {
+    "vi": "Tiếng Việt",
+    "en": "English",
+    "ko": "Korean",
+    "ja": "Japanese",
+    "zh": "Chinese",
+    "fr": "French",
+    "de": "German",
+    "es": "Spanish",
+    "th": "Thai"
+}
+
+
+def _detect_messages(text: str):
+    return [
+        SystemMessage(
+            content=(
+                "Bạn là module phát hiện ngôn ngữ. "
+                "Chỉ trả về mã ISO-639-1: vi, en, ja, ko, zh, fr, es. "
+                "KHÔNG giải thích."
+            )
+        ),
+        HumanMessage(content=text)
+    ]
+
+
+def _convert_messages(text: str, target_lang: str):
+    target_lang_name = lang_mapping.get(target_lang, target_lang)
+    return [
+        SystemMessage(
+            content="Bạn là một phiên dịch chuyên nghiệp. Chỉ trả về bản dịch."
+        ),
+        HumanMessage(
+            content=f"Dịch nội dung sau sang {target_lang_name}:\n\n{text}"
+        )
+    ]
+
+
 def detect_language_openai(text: str, lang_llm) -> str:
     try:
-        res = lang_llm.invoke([
-            SystemMessage(
-                content=(
-                    "Bạn là module phát hiện ngôn ngữ. "
-                    "Chỉ trả về mã ISO-639-1: vi, en, ja, ko, zh, fr, es. "
-                    "KHÔNG giải thích."
-                )
-            ),
-            HumanMessage(content=text)
-        ]).content
+        res = lang_llm.invoke(_detect_messages(text)).content
         return res.strip().lower()
     except Exception:
         return "vi"
 
 
+async def adetect_language_openai(text: str, lang_llm) -> str:
+    try:
+        res = (await lang_llm.ainvoke(_detect_messages(text))).content
+        return res.strip().lower()
+    except Exception:
+        return "vi"
+
+
+# ======================================================
+# NHẬN DIỆN NGÔN NGỮ CỤC BỘ (không gọi LLM)
+# ======================================================
+# Dưới ngưỡng này mới hỏi LLM (detect_language_openai)
+LANG_DETECT_MIN_CONFIDENCE = float(os.getenv("LANG_DETECT_MIN_CONFIDENCE", "0.8"))
+
+# Chữ cái chỉ tiếng Việt dùng (tiếng Pháp / Tây Ban Nha cũng có à, é, â, ô...)
+_VI_ONLY_CHARS = set(
+    "ăđơưạảãấầẩẫậắằẳẵặẹẻẽếềểễệỉĩịọỏõốồổỗộớờởỡợụủũứừửữựỳỵỷỹ"
+)
+_VI_CHARS = _VI_ONLY_CHARS | set("àáâèéêìíòóôùúý")
+# Chữ cái KHÔNG có trong tiếng Việt → chắc chắn không phải tiếng Việt
+_NON_VI_LATIN_CHARS = set("çñüöäßœëïîûÿ¿¡")
+
+# langdetect chỉ chọn trong các ngôn ngữ hệ thống hỗ trợ (lang_mapping)
+_LANGDETECT_CODES = {
+    "vi": "vi", "en": "en", "ko": "ko", "ja": "ja", "zh-cn": "zh", "zh-tw": "zh",
+    "fr": "fr", "de": "de", "es": "es", "th": "th",
+}
+# Câu chỉ gồm chữ ASCII ngắn hơn mức này: langdetect hay đoán sai với xác suất ~1.0
+# ("Compare rental prices" → es) → hạ độ tin cậy theo tỉ lệ độ dài
+_ASCII_FULL_CONFIDENCE_LETTERS = 30
+
+_factory = None
+_factory_lock = threading.Lock()
+
+
+def load_language_profiles():
+    """Nạp profile n-gram của langdetect (~0.2s, 1 lần / process; gọi sẵn ở serving/preload.py)"""
+    global _factory
+    if DetectorFactory is None:
+        return None
+    with _factory_lock:
+        if _factory is None:
+            factory = DetectorFactory()
+            factory.load_profile(PROFILES_DIRECTORY)
+            factory.set_seed(0)  # cùng câu → cùng kết quả
+            _factory = factory
+    return _factory
+
+
+def _script_language(text: str) -> Optional[str]:
+    """Ngôn ngữ xác định chắc chắn được từ bảng chữ cái (tiếng Việt có dấu, CJK, Thái)"""
+    counts = {"ko": 0, "ja": 0, "han": 0, "th": 0}
+    letters = 0
+    for ch in text:
+        if not ch.isalpha():
+            continue
+        letters += 1
+        code = ord(ch)
+        if 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF or 0x3130 <= code <= 0x318F:
+            counts["ko"] += 1
+        elif 0x3040 <= code <= 0x30FF:
+            counts["ja"] += 1
+        elif 0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF:
+            counts["han"] += 1
+        elif 0x0E00 <= code <= 0x0E7F:
+            counts["th"] += 1
+
+    if not letters:
+        return None
+    if counts["ko"] / letters >= 0.3:
+        return "ko"
+    if counts["ja"]:
+        # Có kana → tiếng Nhật (kể cả khi kanji nhiều hơn)
+        return "ja" if (counts["ja"] + counts["han"]) / letters >= 0.3 else None
+    if counts["han"] / letters >= 0.3:
+        return "zh"
+    if counts["th"] / letters >= 0.3:
+        return "th"
+
+    lowered = text.lower()
+    if any(ch in _NON_VI_LATIN_CHARS for ch in lowered):
+        return None
+    words = lowered.split()
+    vi_words = sum(1 for w in words if any(ch in _VI_CHARS for ch in w))
+    # Câu tiếng Anh chứa địa danh ("KCN Bình Dương") không tính là tiếng Việt
+    if any(ch in _VI_ONLY_CHARS for ch in lowered) and vi_words / len(words) >= 0.3:
+        return "vi"
+    return None
+
+
+def detect_language_local(text: str) -> Tuple[Optional[str], float]:
+    """
+    Nhận diện ngôn ngữ KHÔNG gọi LLM → (mã ISO-639-1, độ tin cậy 0..1).
+    (None, 0.0) nếu không đoán được (câu quá ngắn, chỉ có số, ngôn ngữ ngoài danh sách...).
+    """
+    text = (text or "").strip()
+    if not text:
+        return None, 0.0
+
+    lang = _script_language(text)
+    if lang:
+        return lang, 1.0
+    return _ngram_language(text)
+
+
+def _ngram_language(text: str) -> Tuple[Optional[str], float]:
+    """langdetect (n-gram ký tự), chỉ chọn trong các ngôn ngữ hỗ trợ"""
+    factory = load_language_profiles()
+    if factory is None:
+        return None, 0.0
+    detector = factory.create()
+    detector.set_prior_map({code: 1.0 for code in _LANGDETECT_CODES})
+    detector.append(text)
+    try:
+        best = detector.get_probabilities()[0]
+    except (LangDetectException, IndexError):
+        return None, 0.0
+
+    lang = _LANGDETECT_CODES.get(best.lang)
+    confidence = best.prob
+    letters = [ch for ch in text if ch.isalpha()]
+    if all(ch.isascii() for ch in letters):
+        confidence *= min(1.0, len(letters) / _ASCII_FULL_CONFIDENCE_LETTERS)
+    return lang, confidence
+
+
+# ======================================================
+# GHI NHỚ NGÔN NGỮ THEO SESSION
+# ======================================================
+class SessionLanguageMemo:
+    """
+    session_id → ngôn ngữ đã nhận diện (LRU + TTL).
+    Các lượt sau của cùng session không cần langdetect / LLM nữa.
+    Session dùng chung (default_session...) không được ghi nhớ.
+    """
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Optional[str]) -> Optional[str]:
+        if session_id in SHARED_SESSIONS:
+            return None
+        with self._lock:
+            item = self._items.get(session_id)
+            if item is None:
+                return None
+            lang, saved_at = item
+            if time.time() - saved_at > self.ttl_seconds:
+                del self._items[session_id]
+                return None
+            self._items.move_to_end(session_id)
+            return lang
+
+    def set(self, session_id: Optional[str], lang: str):
+        if session_id in SHARED_SESSIONS or not lang:
+            return
+        with self._lock:
+            self._items[session_id] = (lang, time.time())
+            self._items.move_to_end(session_id)
+            while len(self._items) > self.max_sessions:
+                self._items.popitem(last=False)
+
+
+SESSION_LANGUAGES = SessionLanguageMemo(
+    max_sessions=int(os.getenv("LANG_MEMO_MAX_SESSIONS", "10000")),
+    ttl_seconds=float(os.getenv("LANG_MEMO_TTL_SECONDS", "3600")),
+)
+
+
+def resolve_language_locally(text: str, session_id: Optional[str] = None) -> Tuple[Optional[str], str]:
+    """
+    Các bước KHÔNG gọi LLM của adetect_language → (ngôn ngữ | None, nguồn).
+    1. Bảng chữ cái (tiếng Việt có dấu / CJK / Thái) — vài µs, luôn chạy để bắt
+       trường hợp người dùng đổi ngôn ngữ giữa chừng
+    2. Ngôn ngữ đã ghi nhớ của session
+    3. langdetect (n-gram ký tự) nếu đủ tin cậy
+    """
+    lang = _script_language(text or "")
+    if lang:
+        return lang, "script"
+
+    lang = SESSION_LANGUAGES.get(session_id)
+    if lang:
+        return lang, "memo"
+
+    lang, confidence = _ngram_language((text or "").strip())
+    if lang and confidence >= LANG_DETECT_MIN_CONFIDENCE:
+        return lang, "langdetect"
+    return None, "llm"
+
+
+def record_language(session_id: Optional[str], lang: str, source: str):
+    metrics.counter("language_detect_total").inc(label=source)
+    SESSION_LANGUAGES.set(session_id, lang)
+
+
+async def adetect_language(text: str, lang_llm, session_id: Optional[str] = None) -> str:
+    """Nhận diện cục bộ (resolve_language_locally), chỉ hỏi LLM khi không chắc"""
+    lang, source = resolve_language_locally(text, session_id)
+    if lang is None:
+        lang = await adetect_language_openai(text, lang_llm)
+    record_language(session_id, lang, source)
+    return lang
+
+
+# Số ký tự đầu câu trả lời dùng để kiểm tra ngôn ngữ trước khi dịch
+LANG_PROBE_CHARS = 300
+
+
+def translate_needed(text: str, target_lang: str) -> bool:
+    """
+    Câu trả lời do LLM sinh đã được yêu cầu viết bằng target_lang → thường KHÔNG cần
+    dịch lại. Chỉ dịch khi nhận diện cục bộ không chắc chắn nó đã đúng ngôn ngữ.
+    """
+    lang, confidence = detect_language_local((text or "")[:LANG_PROBE_CHARS])
+    return not (lang == target_lang and confidence >= LANG_DETECT_MIN_CONFIDENCE)
+
+
 def convert_language(text: str, target_lang: str, lang_llm) -> str:
-    lang_mapping = {
-        "vi": "Tiếng Việt",
-        "en": "English",
-        "ko": "Korean",
-        "ja": "Japanese",
-        "zh": "Chinese",
-        "fr": "French",
-        "de": "German",
-        "es": "Spanish",
-        "th": "Thai"
-    }
+    try:
+        return lang_llm.invoke(_convert_messages(text, target_lang)).content.strip()
+    except Exception:
+        return text
 
-    target_lang_name = lang_mapping.get(target_lang, target_lang)
 
+async def aconvert_language(text: str, target_lang: str, lang_llm) -> str:
     try:
-        return lang_llm.invoke([
-            SystemMessage(
-                content="Bạn là một phiên dịch chuyên nghiệp. Chỉ trả về bản dịch."
-            ),
-            HumanMessage(
-                content=f"Dịch nội dung sau sang {target_lang_name}:\n\n{text}"
-            )
-        ]).content.strip()
+        return (await lang_llm.ainvoke(_convert_messages(text, target_lang))).content.strip()
     except Exception:
         return text
+
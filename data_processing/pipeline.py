@@ -1,13 +1,38 @@
 # data_processing/pipeline.py
 
-from typing import Dict, Any, List
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, AsyncIterator
 from langchain_core.messages import SystemMessage, HumanMessage, BaseMessage
+from langchain_core.documents import Document
 import json
+import os
 from data_processing.cleaning import clean_question_remove_uris
-from data_processing.language import detect_language_openai, convert_language
+from data_processing.language import LANG_PROBE_CHARS, translate_needed
+from data_processing.translation import (
+    TranslationFailed, atranslate, astream_translate, canned_translation, localized
+)
+from data_processing.async_utils import run_sync
 from data_processing.context_builder import build_context_from_hits
+from data_processing.retrieval_filters import alaw_filter, vsic_filter
+from data_processing.answer_cache import get_answer_cache, number_signature
+from data_processing.deadline import within, expired
+from monitoring import metrics
 from system_prompts.pdf_reader_system import PDF_READER_SYS
-from data_processing.intent import is_vsic_code_query, is_flowchart_intent, is_greeting_question
+from data_processing.intent import classify, PIPELINE_ROUTE_PRIORITY
+from data_processing.vsic_index import (
+    DOCUMENT_2018,
+    DOCUMENT_2025,
+    compare_code,
+    extract_codes,
+    render_comparison
+)
+from data_processing.preclassify import (  # noqa: F401
+    apreclassify,
+    classify_locally,
+    llm_is_followup,
+    allm_is_followup
+)
 
 
 # ======================================================
@@ -26,21 +51,6 @@ GREETING_VI = (
 )
 
 
-# ======================================================
-# NHẬN DIỆN LAO ĐỘNG / VIỆC LÀM / BHXH / DN
-# ======================================================
-def is_labor_related_question(question: str) -> bool:
-    keywords = [
-        "lao động", "việc làm", "người lao động", "người sử dụng lao động",
-        "hợp đồng lao động", "thử việc", "thời gian thử việc",
-        "tiền lương", "lương", "tiền công", "trả lương",
-        "bảo hiểm xã hội", "bhxh", "bảo hiểm y tế", "bhyt",
-        "bảo hiểm thất nghiệp", "bhtn",
-        "doanh nghiệp", "công ty"
-    ]
-    q = question.lower()
-    return any(k in q for k in keywords)
-
 # NHẬN DIỆN INTENT VẼ FLOWCHART / SƠ ĐỒ LUỒNG / QUY TRÌNH
 
 
@@ -75,61 +85,208 @@ FOLLOWUP_ANCHOR_SYS = (
 )
 
 
-# Phân loại lịch sử hội thoại: 
-def llm_is_followup(
-    clean_question: str,
-    history: List[BaseMessage],
-    lang_llm
-) -> bool:
+# ======================================================
+# CÂU TRẢ LỜI CỐ ĐỊNH
+# ======================================================
+OUT_OF_SCOPE_VI = (
+    "Tôi là chatbot chuyên tư vấn và tra cứu thông tin trong các lĩnh vực: "
+    "pháp luật (luật, nghị định, thông tư, quyết định), "
+    "ngành nghề kinh doanh, mã số thuế và thông tin doanh nghiệp, "
+    "kế toán – thuế, lao động – việc làm, "
+    "cũng như bất động sản công nghiệp "
+    "(khu công nghiệp, cụm công nghiệp, nhà xưởng cho thuê/bán "
+    "và các thủ tục pháp lý liên quan). "
+    "Tôi chỉ hỗ trợ các câu hỏi thuộc những lĩnh vực nêu trên; "
+    "bạn vui lòng đặt câu hỏi phù hợp để tôi có thể hỗ trợ chính xác."
+)
+
+
+# Thời gian tối đa cho các bước phân loại (ngôn ngữ, follow-up) khi có deadline
+CLASSIFY_STAGE_MAX_SECONDS = float(os.getenv("CLASSIFY_STAGE_MAX_SECONDS", "5"))
+
+# Chạy embed + retrieval song song với LLM phân loại follow-up (0 = tắt, tiết kiệm
+# 1 truy vấn Qdrant với câu follow-up nhưng chậm hơn với câu hỏi mới)
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "1") != "0"
+
+# Câu hỏi VSIC có mã cụ thể → tra bảng mã trong bộ nhớ (data_processing/vsic_index.py)
+# thay cho vector search 2 collection; 0 = luôn vector search
+VSIC_INDEX_ENABLED = os.getenv("VSIC_INDEX_ENABLED", "1") != "0"
+# Số mã tối đa tra trong 1 câu hỏi (nhiều hơn → vector search như cũ)
+VSIC_INDEX_MAX_CODES = int(os.getenv("VSIC_INDEX_MAX_CODES", "5"))
+
+# Hết ngân sách thời gian mà chưa có gì để trả lời
+TIMEOUT_VI = (
+    "Xin lỗi, hệ thống đang phản hồi chậm hơn bình thường nên chưa thể trả lời kịp. "
+    "Bạn vui lòng thử lại sau ít phút."
+)
+
+# Tiền tố khi trả nguyên văn tài liệu thay cho câu trả lời của LLM
+RAW_CONTEXT_PREFIX_VI = (
+    "Hệ thống đang phản hồi chậm nên chưa thể tổng hợp câu trả lời. "
+    "Dưới đây là nội dung nguyên văn trong tài liệu liên quan:\n\n"
+)
+
+
+# ======================================================
+# KẾT QUẢ CHUẨN BỊ (TRƯỚC LẦN GỌI LLM CUỐI)
+# ======================================================
+@dataclass
+class PreparedAnswer:
     """
-    Trả về:
-    - True  → câu hỏi hiện tại là follow-up của hội thoại trước
-    - False → câu hỏi mới / đổi chủ đề
+    Mọi thứ đã xác định xong TRƯỚC lần gọi LLM cuối cùng của một nhánh.
+    - messages : prompt cho lần gọi LLM cuối (None nếu đã có sẵn text)
+    - text     : câu trả lời có sẵn (chào hỏi, out-of-scope, flowchart, điều luật DB)
+    - translate: cần dịch sang user_lang sau khi có câu trả lời
+    - fallback_text: trả về nếu lần gọi LLM cuối hết ngân sách thời gian
+    - degraded_text: astream_answer đặt khi dịch lỗi → câu trả lời tiếng Việt đầy đủ, nơi gọi
+      lưu vào lịch sử thay cho phần đã stream và báo client (degraded)
+    Tách ra để /chat (trả 1 lần) và /chat/stream (stream token) dùng chung logic.
     """
+    route: str
+    user_lang: str = "vi"
+    messages: Optional[List[BaseMessage]] = None
+    text: Optional[str] = None
+    translate: bool = False
+    sources: List[Dict[str, Any]] = field(default_factory=list)
+    # Có giá trị → lưu câu trả lời cuối vào cache ngữ nghĩa sau khi sinh xong
+    cache_vector: Optional[List[float]] = None
+    cache_signature: str = ""
+    fallback_text: Optional[str] = None
+    degraded_text: Optional[str] = None
+
+
+def _canned_answer(route: str, user_lang: str, text_vi: str) -> PreparedAnswer:
+    """Câu trả lời cố định: có bản dịch sẵn → dùng luôn, không tốn lần gọi LLM dịch"""
+    translated = canned_translation(text_vi, user_lang) if user_lang != "vi" else None
+    return PreparedAnswer(
+        route=route,
+        user_lang=user_lang,
+        text=translated or text_vi,
+        translate=translated is None and user_lang != "vi"
+    )
 
-    if not history:
-        return False
 
-    # chỉ lấy vài lượt gần nhất để tiết kiệm token
-    recent = history[-6:]
+def _timeout_answer(user_lang: str) -> PreparedAnswer:
+    return _canned_answer("timeout", user_lang, TIMEOUT_VI)
 
-    history_text = "\n".join(
-        f"{m.type.upper()}: {m.content}"
-        for m in recent
-        if getattr(m, "content", None)
-    )
 
-    prompt = f"""
-Bạn là bộ phân loại ngữ cảnh hội thoại.
+def sources_from_hits(hits) -> List[Dict[str, Any]]:
+    seen = set()
+    sources = []
+    for h in hits or []:
+        key = (h.metadata.get("source", "unknown"), h.metadata.get("page", "?"))
+        if key in seen:
+            continue
+        seen.add(key)
+        sources.append({"source": key[0], "page": key[1]})
+    return sources
 
-NHIỆM VỤ:
-- Xác định câu hỏi hiện tại có đang hỏi tiếp nội dung trong hội thoại trước hay không.
 
-HỘI THOẠI TRƯỚC:
-{history_text}
+async def _aretrieve(retriever, question: str, vector=None, query_filter=None) -> List[Document]:
+    """
+    Tìm theo vector có sẵn nếu retriever hỗ trợ, ngược lại embed + tìm như thường.
+    query_filter: lọc payload (data_processing/retrieval_filters.py), chỉ QdrantRetriever hỗ trợ
+    """
+    if retriever is None:
+        return []
+    if not hasattr(retriever, "asearch_by_vector"):
+        return await retriever.ainvoke(question)
+    if vector is not None:
+        return await retriever.asearch_by_vector(vector, query_text=question, query_filter=query_filter)
+    return await retriever.ainvoke(question, query_filter=query_filter)
+
+
+async def _aembed_for_cache(retriever, question: str, vector=None):
+    """Vector câu hỏi cho cache ngữ nghĩa (None nếu không dùng cache / hết giờ)"""
+    embedding = getattr(retriever, "embedding", None)
+    if vector is not None or get_answer_cache() is None or embedding is None:
+        return vector
+    with metrics.timer("pipeline_stage_seconds", label="embed"):
+        return await within(embedding.aembed_query(question), "embed", fallback=None)
 
-CÂU HỎI HIỆN TẠI:
-{clean_question}
 
-QUY TẮC:
-- Trả về FOLLOW_UP nếu câu hỏi đang tiếp tục, làm rõ, mở rộng nội dung trước đó.
-- Trả về NEW_TOPIC nếu câu hỏi chuyển sang chủ đề hoặc văn bản pháp luật khác.
+async def _ascoped_retrieve(retriever, question: str, vector=None) -> List[Document]:
+    """Câu hỏi nêu đích danh 1 văn bản luật → chỉ tìm trong văn bản đó"""
+    query_filter = await alaw_filter(getattr(retriever, "collection_name", None), question)
+    return await _aretrieve(retriever, question, vector, query_filter)
 
-CHỈ TRẢ VỀ MỘT TỪ DUY NHẤT:
-FOLLOW_UP hoặc NEW_TOPIC
-""".strip()
 
+async def _asearch(retriever, question: str, vector=None):
+    """Embed + retrieval của nhánh RAG → (vector, hits | None nếu hết giờ)"""
+    vector = await _aembed_for_cache(retriever, question, vector)
+    with metrics.timer("pipeline_stage_seconds", label="retrieval"):
+        hits = await within(_ascoped_retrieve(retriever, question, vector), "retrieval", fallback=None)
+    return vector, hits
+
+
+def _discard(task: Optional[asyncio.Task]):
+    if task is None:
+        return
+    task.cancel()
+    metrics.counter("speculative_retrieval_total").inc(label="discarded")
+
+
+def _consume_exception(task: asyncio.Task):
+    # Task bị bỏ đi mà lỗi → không cảnh báo "exception was never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+def _vsic_index_answer(question: str, history: List[BaseMessage], user_lang: str) -> Optional[PreparedAnswer]:
+    """None → không có mã / mã thuộc phần dữ liệu 2025 chưa có → vector search như cũ"""
+    codes = extract_codes(question) if VSIC_INDEX_ENABLED else []
+    if not codes or len(codes) > VSIC_INDEX_MAX_CODES:
+        return None
     try:
-        result = lang_llm.invoke(
-            [HumanMessage(content=prompt)]
-        ).content.strip().upper()
-        return result == "FOLLOW_UP"
-    except Exception:
-        return True
+        comparisons = [compare_code(code) for code in codes]
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Không nạp được bảng mã VSIC: {e}")
+        metrics.counter("vsic_index_total").inc(label="error")
+        return None
+    if not all(c.resolved for c in comparisons):
+        metrics.counter("vsic_index_total").inc(label="miss")
+        return None
+    metrics.counter("vsic_index_total").inc(label="hit")
+
+    context = "\n\n".join(render_comparison(c) for c in comparisons)
+    system_prompt = PDF_READER_SYS + f"\n\nNgười dùng đang dùng ngôn ngữ: '{user_lang}'."
+    messages = [SystemMessage(content=system_prompt)]
+    if history:
+        messages.extend(history[-10:])
+
+    messages.append(HumanMessage(
+        content=f"""
+Câu hỏi: {question}
+
+Kết quả tra cứu chính xác trong bảng mã ngành kinh tế (đã đối chiếu sẵn 2018 ↔ 2025):
+{context}
+
+YÊU CẦU:
+- Chỉ dùng kết quả tra cứu ở trên, KHÔNG tự thêm mã hoặc tên ngành khác.
+- Trình bày có cấu trúc so sánh rõ ràng giữa Quyết định số 36/2025/QĐ-TTg và Quyết định số 27/2018/QĐ-TTg.
+Trả lời bằng ngôn ngữ: {user_lang}.
+"""
+    ))
+
+    sources = []
+    if any(c.entry_2025 for c in comparisons):
+        sources.append({"source": DOCUMENT_2025, "page": "?"})
+    if any(c.entry_2018 for c in comparisons):
+        sources.append({"source": DOCUMENT_2018, "page": "?"})
+    return PreparedAnswer(
+        route="vsic",
+        user_lang=user_lang,
+        messages=messages,
+        translate=user_lang != "vi",
+        sources=sources,
+        fallback_text=localized(RAW_CONTEXT_PREFIX_VI, user_lang) + context
+    )
+
+
 # ======================================================
 # PIPELINE TRUNG TÂM
 # ======================================================
-def process_pdf_question(
+async def aprepare_answer(
     i: Dict[str, Any],
     *,
     llm,
@@ -137,7 +294,7 @@ def process_pdf_question(
     retriever,
     retriever_vsic_2018=None,
     excel_handler=None
-) -> str:
+) -> PreparedAnswer:
 
     # ============================
     # 0️⃣ INPUT
@@ -145,22 +302,53 @@ def process_pdf_question(
     message = i["message"]
     history: List[BaseMessage] = i.get("history", [])
     law_count = i.get("law_count")
+    # Vector của clean_question đã embed sẵn (vd: /chat/batch embed cả lô 1 lần)
+    precomputed_vector = i.get("query_vector")
 
     clean_question = clean_question_remove_uris(message)
-    user_lang = detect_language_openai(clean_question, lang_llm)
+    # Quét intent 1 lần (chào hỏi / flowchart / VSIC)
+    intents = classify(clean_question)
+    # Ngôn ngữ + follow-up: heuristic cục bộ trước, thiếu gì mới gọi LLM (tối đa 1 lần).
+    # Follow-up chỉ dùng ở nhánh RAG thường (không chào hỏi / flowchart / đếm luật / VSIC)
+    session_id = i.get("session_id")
+    local = classify_locally(
+        clean_question,
+        history,
+        session_id=session_id,
+        need_followup=law_count is None and intents.first(PIPELINE_ROUTE_PRIORITY) is None
+    )
+
+    # Phải chờ LLM phân loại follow-up → chạy trước embed + retrieval cho trường hợp
+    # NEW_TOPIC; là FOLLOW_UP thì bỏ kết quả
+    speculative = None
+    if local.followup is None and SPECULATIVE_RETRIEVAL:
+        speculative = asyncio.ensure_future(_asearch(retriever, clean_question, precomputed_vector))
+        speculative.add_done_callback(_consume_exception)
+
+    try:
+        pre = await apreclassify(
+            clean_question,
+            history,
+            lang_llm,
+            session_id=session_id,
+            cap=CLASSIFY_STAGE_MAX_SECONDS,
+            local=local
+        )
+    except BaseException:
+        _discard(speculative)
+        raise
+    user_lang = pre.language
 
     # ============================
     # 0️⃣.1 CHÀO HỎI
     # ============================
-    if is_greeting_question(clean_question):
-        if user_lang == "vi":
-            return GREETING_VI
-        return convert_language(GREETING_VI, user_lang, lang_llm)
+    if intents.has("greeting"):
+        return _canned_answer("greeting", user_lang, GREETING_VI)
 
     # ============================
     # 0️⃣.2 FLOWCHART (MERMAID + GIẢI THÍCH)
     # ============================
-    if is_flowchart_intent(clean_question):
+    if intents.has("flowchart"):
         # 1) Sinh Mermaid code
         system_prompt = FLOWCHART_SYS + f"\nNgười dùng đang dùng ngôn ngữ: '{user_lang}'."
         messages = [SystemMessage(content=system_prompt)]
@@ -175,7 +363,10 @@ Hãy xuất Mermaid flowchart theo đúng ngôn ngữ: {user_lang}.
 """
         ))
 
-        mermaid_code = llm.invoke(messages).content.strip()
+        mermaid_result = await within(llm.ainvoke(messages), "generate", fallback=None)
+        if mermaid_result is None:
+            return _timeout_answer(user_lang)
+        mermaid_code = mermaid_result.content.strip()
 
         # Fallback nếu model trả sai format
         if not mermaid_code.lower().startswith("flowchart"):
@@ -206,17 +397,23 @@ Hãy giải thích "từng phần mục" của flowchart:
 """
         ))
 
-        explanation = llm.invoke(explain_messages).content.strip()
-
-        # 3) Trả về JSON string
-        return json.dumps(
-            {
-                "type": "flowchart",
-                "format": "mermaid",
-                "code": mermaid_code,
-                "explanation": explanation
-            },
-            ensure_ascii=False
+        # Hết giờ → vẫn trả flowchart, bỏ phần giải thích
+        explain_result = await within(llm.ainvoke(explain_messages), "generate", fallback=None)
+        explanation = explain_result.content.strip() if explain_result is not None else ""
+
+        # 3) Trả về JSON string (không stream để giữ nguyên định dạng JSON)
+        return PreparedAnswer(
+            route="flowchart",
+            user_lang=user_lang,
+            text=json.dumps(
+                {
+                    "type": "flowchart",
+                    "format": "mermaid",
+                    "code": mermaid_code,
+                    "explanation": explanation
+                },
+                ensure_ascii=False
+            )
         )
     # ============================
     # 1️⃣ ƯU TIÊN EXCEL
@@ -224,10 +421,12 @@ Hãy giải thích "từng phần mục" của flowchart:
     if excel_handler:
         handled, excel_response = excel_handler.process_query(clean_question)
         if handled and excel_response:
-            return (
-                excel_response
-                if user_lang == "vi"
-                else convert_language(excel_response, user_lang, lang_llm)
+            _discard(speculative)
+            return PreparedAnswer(
+                route="excel",
+                user_lang=user_lang,
+                text=excel_response,
+                translate=user_lang != "vi"
             )
 
     # ============================
@@ -253,26 +452,36 @@ Trả lời bằng ngôn ngữ: {user_lang}.
 """
         ))
 
-        response = llm.invoke(messages).content
-        return response if user_lang == "vi" else convert_language(response, user_lang, lang_llm)
+        return PreparedAnswer(
+            route="law_count",
+            user_lang=user_lang,
+            messages=messages,
+            translate=user_lang != "vi",
+            fallback_text=f"Hệ thống hiện có {law_count} văn bản luật trong cơ sở dữ liệu."
+        )
 
     # ============================
     # 3️⃣ NHẬN DIỆN VSIC
     # ============================
-    is_vsic_query = is_vsic_code_query(clean_question)
+    is_vsic_query = intents.has("vsic")
 
     # ============================
 # 4️⃣ RAG THƯỜNG (LLM quyết định dùng history hay không)
 # ============================
     if not is_vsic_query:
 
-        # ---- BƯỚC 1: DÙNG LLM PHÂN LOẠI NGỮ CẢNH ----
-        use_history = llm_is_followup(clean_question, history, lang_llm)
+        # ---- BƯỚC 1: PHÂN LOẠI NGỮ CẢNH (đã làm ở apreclassify) ----
+        use_history = pre.followup
 
         # ==================================================
         # CASE A: FOLLOW-UP → TRẢ LỜI THEO HISTORY
         # ==================================================
         if use_history:
+            _discard(speculative)
+            # Follow-up phụ thuộc lịch sử → không dùng cache ngữ nghĩa
+            if get_answer_cache() is not None:
+                metrics.counter("answer_cache_total").inc(label="bypass_followup")
+
             system_prompt = PDF_READER_SYS + f"\n\nNgười dùng đang dùng ngôn ngữ: '{user_lang}'."
             messages = [SystemMessage(content=system_prompt)]
 
@@ -298,13 +507,42 @@ Trả lời bằng ngôn ngữ: {user_lang}.
                 )
             )
 
-            response = llm.invoke(messages).content
-            return response if user_lang == "vi" else convert_language(response, user_lang, lang_llm)
+            return PreparedAnswer(
+                route="followup",
+                user_lang=user_lang,
+                messages=messages,
+                translate=user_lang != "vi"
+            )
 
         # ==================================================
         # CASE B: NEW_TOPIC → COI NHƯ CÂU HỎI MỚI, CHẠY RAG
         # ==================================================
-        hits = retriever.invoke(clean_question) if retriever else []
+        # ---- BƯỚC 2: CACHE NGỮ NGHĨA (embedding + route + ngôn ngữ) ----
+        answer_cache = get_answer_cache()
+        signature = number_signature(clean_question)
+
+        if speculative is not None:
+            # Embed + retrieval đã chạy song song với bước phân loại follow-up
+            query_vector, hits = await speculative
+            metrics.counter("speculative_retrieval_total").inc(label="used")
+        else:
+            query_vector = await _aembed_for_cache(retriever, clean_question, precomputed_vector)
+
+        if answer_cache is not None and query_vector is not None:
+            cached = answer_cache.lookup(query_vector, "rag", user_lang, signature)
+            if cached:
+                return PreparedAnswer(
+                    route="rag",
+                    user_lang=user_lang,
+                    text=cached["answer"],
+                    sources=cached["sources"]
+                )
+
+        if speculative is None:
+            # Dùng lại vector đã embed ở trên (không embed lần 2)
+            _, hits = await _asearch(retriever, clean_question, query_vector)
+        if hits is None:
+            return _timeout_answer(user_lang)
         has_context = bool(hits)
         context = build_context_from_hits(hits) if has_context else ""
 
@@ -326,38 +564,50 @@ YÊU CẦU BẮT BUỘC:
 - Trả lời bằng ngôn ngữ: {user_lang}.
 """
             messages.append(HumanMessage(content=human))
-            response = llm.invoke(messages).content
-            return response if user_lang == "vi" else convert_language(response, user_lang, lang_llm)
+            return PreparedAnswer(
+                route="rag",
+                user_lang=user_lang,
+                messages=messages,
+                translate=user_lang != "vi",
+                sources=sources_from_hits(hits),
+                cache_vector=query_vector,
+                cache_signature=signature,
+                fallback_text=localized(RAW_CONTEXT_PREFIX_VI, user_lang) + context
+            )
 
         # ==================================================
         # CASE C: KHÔNG CÓ CONTEXT → OUT OF SCOPE
         # ==================================================
-        out_of_scope_vi = (
-            "Tôi là chatbot chuyên tư vấn và tra cứu thông tin trong các lĩnh vực: "
-            "pháp luật (luật, nghị định, thông tư, quyết định), "
-            "ngành nghề kinh doanh, mã số thuế và thông tin doanh nghiệp, "
-            "kế toán – thuế, lao động – việc làm, "
-            "cũng như bất động sản công nghiệp "
-            "(khu công nghiệp, cụm công nghiệp, nhà xưởng cho thuê/bán "
-            "và các thủ tục pháp lý liên quan). "
-            "Tôi chỉ hỗ trợ các câu hỏi thuộc những lĩnh vực nêu trên; "
-            "bạn vui lòng đặt câu hỏi phù hợp để tôi có thể hỗ trợ chính xác."
-        )
-
-        return out_of_scope_vi if user_lang == "vi" else convert_language(out_of_scope_vi, user_lang, lang_llm)
+        return _canned_answer("out_of_scope", user_lang, OUT_OF_SCOPE_VI)
 
 
     # ============================
     # 5️⃣ VSIC 2025 ↔ 2018
     # ============================
-    hits_2025 = retriever.invoke(clean_question) if retriever else []
+    # Có mã cụ thể → tra thẳng bảng mã, LLM chỉ diễn đạt kết quả
+    vsic_answer = _vsic_index_answer(clean_question, history, user_lang)
+    if vsic_answer is not None:
+        return vsic_answer
+
+    # 2 bộ mã độc lập → truy vấn song song. Hết giờ ở VSIC 2018 → vẫn trả lời theo 2025.
+    # Collection luật chỉ tìm trong các chunk của Quyết định 36/2025
+    with metrics.timer("pipeline_stage_seconds", label="retrieval"):
+        hits_2025, hits_2018 = await asyncio.gather(
+            within(
+                _aretrieve(retriever, clean_question, precomputed_vector, vsic_filter(clean_question)),
+                "retrieval",
+                fallback=None
+            ),
+            within(_aretrieve(retriever_vsic_2018, clean_question, precomputed_vector), "retrieval", fallback=[])
+        )
+    if hits_2025 is None:
+        return _timeout_answer(user_lang)
     context_2025 = build_context_from_hits(hits_2025) if hits_2025 else (
         "Mã ngành này không được quy định theo Quyết định số 36/2025/QĐ-TTg."
     )
 
     context_2018 = ""
     if retriever_vsic_2018:
-        hits_2018 = retriever_vsic_2018.invoke(clean_question)
         context_2018 = build_context_from_hits(hits_2018) if hits_2018 else (
             "Mã ngành này không được quy định theo Quyết định số 27/2018/QĐ-TTg."
         )
@@ -382,5 +632,192 @@ Trả lời bằng ngôn ngữ: {user_lang}.
 """
     ))
 
-    response = llm.invoke(messages).content
-    return response if user_lang == "vi" else convert_language(response, user_lang, lang_llm)
+    return PreparedAnswer(
+        route="vsic",
+        user_lang=user_lang,
+        messages=messages,
+        translate=user_lang != "vi",
+        sources=sources_from_hits(list(hits_2025) + list(hits_2018)),
+        fallback_text=(
+            localized(RAW_CONTEXT_PREFIX_VI, user_lang)
+            + f"Theo Quyết định số 36/2025/QĐ-TTg:\n{context_2025}"
+            + (f"\n\nTheo Quyết định số 27/2018/QĐ-TTg:\n{context_2018}" if context_2018 else "")
+        )
+    )
+
+
+# ======================================================
+# LẦN GỌI LLM CUỐI: TRẢ 1 LẦN / STREAM
+# ======================================================
+def _store_in_cache(prepared: PreparedAnswer, answer: str):
+    answer_cache = get_answer_cache()
+    if answer_cache is None or prepared.cache_vector is None or not answer:
+        return
+    answer_cache.put(
+        prepared.cache_vector,
+        prepared.route,
+        prepared.user_lang,
+        prepared.cache_signature,
+        answer,
+        prepared.sources
+    )
+
+
+def _should_translate(prepared: PreparedAnswer, response: str) -> bool:
+    """
+    Prompt của các nhánh LLM đã yêu cầu "Trả lời bằng ngôn ngữ: {user_lang}" → câu trả lời
+    thường đã đúng ngôn ngữ, dịch lại là thừa 1 round trip. Chỉ dịch câu trả lời có sẵn
+    (tiếng Việt) hoặc khi LLM vẫn trả lời sai ngôn ngữ.
+    """
+    if not prepared.translate:
+        return False
+    if translate_needed(response, prepared.user_lang):
+        return True
+    metrics.counter("translation_skipped_total").inc(label=prepared.route)
+    return False
+
+
+async def _agenerate(prepared: PreparedAnswer, llm):
+    """Lần gọi LLM cuối trong ngân sách còn lại → (câu trả lời, có bị xuống cấp không)"""
+    if prepared.messages is None:
+        return prepared.text or "", False
+    with metrics.timer("pipeline_stage_seconds", label="generate"):
+        result = await within(llm.ainvoke(prepared.messages), "generate", fallback=None)
+    if result is None:
+        return prepared.fallback_text or TIMEOUT_VI, True
+    return result.content, False
+
+
+async def agenerate_answer(prepared: PreparedAnswer, *, llm, lang_llm) -> str:
+    response, degraded = await _agenerate(prepared, llm)
+
+    if _should_translate(prepared, response):
+        with metrics.timer("pipeline_stage_seconds", label="translate"):
+            translated = await within(
+                atranslate(response, prepared.user_lang, lang_llm), "translate", fallback=None
+            )
+        # Hết giờ / dịch lỗi (atranslate trả lại câu gốc) → trả bản tiếng Việt nhưng
+        # KHÔNG lưu cache: key cache là user_lang, lần sau phải dịch lại
+        if translated is None or translated == response:
+            metrics.counter("translation_failed_total").inc(label=prepared.route)
+            degraded = True
+        else:
+            response = translated
+
+    if not degraded:
+        _store_in_cache(prepared, response)
+    return response
+
+
+async def astream_answer(prepared: PreparedAnswer, *, llm, lang_llm) -> AsyncIterator[str]:
+    """
+    Stream token của lần gọi LLM CUỐI cùng:
+    - nhánh LLM            → stream lần sinh câu trả lời (prompt đã yêu cầu đúng user_lang).
+                             Cần dịch: giữ ~LANG_PROBE_CHARS ký tự đầu để kiểm tra ngôn ngữ;
+                             LLM trả lời sai ngôn ngữ → sinh nốt rồi stream lần dịch
+    - câu trả lời có sẵn   → trả 1 lần (ngôn ngữ khác → stream bản dịch)
+    """
+    if prepared.messages is None:
+        text = prepared.text or ""
+        if not expired() and _should_translate(prepared, text):
+            async for piece in _astream_translation(prepared, text, lang_llm):
+                yield piece
+        else:
+            yield text
+        return
+
+    # Ngân sách thời gian áp cho token ĐẦU TIÊN; đã bắt đầu stream thì stream tới hết
+    stream = llm.astream(prepared.messages)
+    first = await within(_anext_or_none(stream), "generate", fallback=_TIMED_OUT)
+    if first is _TIMED_OUT:
+        await stream.aclose()
+        yield prepared.fallback_text or TIMEOUT_VI
+        return
+
+    chunks = _prepend(first, stream) if first is not None else stream
+    parts = []
+    if prepared.translate:
+        async for chunk in chunks:
+            if chunk.content:
+                parts.append(chunk.content)
+            if sum(map(len, parts)) >= LANG_PROBE_CHARS:
+                break
+        head = "".join(parts)
+        if _should_translate(prepared, head):
+            async for chunk in chunks:
+                if chunk.content:
+                    parts.append(chunk.content)
+            response = "".join(parts)
+            if expired():
+                # Không còn thời gian dịch → trả bản đã sinh
+                yield response
+                return
+            async for piece in _astream_translation(prepared, response, lang_llm):
+                yield piece
+            return
+        if head:
+            yield head
+
+    async for chunk in chunks:
+        if chunk.content:
+            parts.append(chunk.content)
+            yield chunk.content
+    _store_in_cache(prepared, "".join(parts))
+
+
+async def _astream_translation(prepared: PreparedAnswer, response: str, lang_llm) -> AsyncIterator[str]:
+    parts = []
+    try:
+        async for piece in astream_translate(response, prepared.user_lang, lang_llm):
+            parts.append(piece)
+            yield piece
+    except TranslationFailed as e:
+        # Lỗi trước token đầu → trả bản tiếng Việt; lỗi giữa chừng → gửi nốt bản tiếng Việt
+        # đầy đủ sau phần dịch dở. Không lưu cache (key là user_lang)
+        metrics.counter("translation_failed_total").inc(label=prepared.route)
+        print(f"⚠️ Dịch (stream) lỗi, không lưu cache: {e}")
+        prepared.degraded_text = response
+        yield f"\n\n{response}" if parts else response
+        return
+    _store_in_cache(prepared, "".join(parts))
+
+
+_TIMED_OUT = object()
+
+
+async def _anext_or_none(stream):
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def _prepend(first, stream):
+    yield first
+    async for item in stream:
+        yield item
+
+
+async def aprocess_pdf_question(
+    i: Dict[str, Any],
+    *,
+    llm,
+    lang_llm,
+    retriever,
+    retriever_vsic_2018=None,
+    excel_handler=None
+) -> str:
+    prepared = await aprepare_answer(
+        i,
+        llm=llm,
+        lang_llm=lang_llm,
+        retriever=retriever,
+        retriever_vsic_2018=retriever_vsic_2018,
+        excel_handler=excel_handler
+    )
+    return await agenerate_answer(prepared, llm=llm, lang_llm=lang_llm)
+
+
+def process_pdf_question(i: Dict[str, Any], **kwargs) -> str:
+    """Bản sync (CLI app.py): chạy aprocess_pdf_question trên event loop nền."""
+    return run_sync(aprocess_pdf_question(i, **kwargs))
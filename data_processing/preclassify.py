@@ -0,0 +1,281 @@
+# data_processing/preclassify.py
+"""
+Phân loại TRƯỚC khi retrieval / sinh câu trả lời: ngôn ngữ + follow-up + intent thô.
+
+Trước đây pipeline gọi LLM tuần tự: nhận diện ngôn ngữ → phân loại follow-up
+(→ sau khi sinh xong còn 1 lần dịch). Giờ:
+1. Heuristic cục bộ trước (không tốn round trip):
+   - ngôn ngữ: bảng chữ cái / nhớ theo session / langdetect (data_processing/language.py)
+   - follow-up: không có lịch sử → câu mới; có từ tham chiếu ("vừa nêu", "ở trên"...) → follow-up
+2. Còn thiếu gì → MỘT lần gọi LLM structured output trả về cả 3 trường
+   (chỉ thiếu ngôn ngữ → dùng prompt nhận diện ngôn ngữ ngắn như cũ)
+→ tối đa 1 round trip LLM trước retrieval.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import List, Literal, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from pydantic import BaseModel, Field
+
+from data_processing.deadline import within
+from data_processing.intent import classify
+from data_processing.language import (
+    adetect_language_openai,
+    lang_mapping,
+    record_language,
+    resolve_language_locally,
+)
+from monitoring import metrics
+
+@dataclass
+class PreClassification:
+    """
+    - language: mã ISO-639-1 của câu hỏi
+    - followup: câu hỏi hỏi tiếp nội dung hội thoại trước
+    - intent  : intent thô do LLM gợi ý (None khi không gọi LLM); routing vẫn theo
+                data_processing/intent.py, trường này để quan sát / thống kê
+    - round_trips: số round trip LLM nối tiếp đã dùng (0 hoặc 1)
+    """
+    language: str
+    followup: bool
+    intent: Optional[str] = None
+    round_trips: int = 0
+
+
+class _FusedOutput(BaseModel):
+    language: str = Field(description="Mã ISO-639-1 của CÂU HỎI HIỆN TẠI: vi, en, ja, ko, zh, fr, es...")
+    followup: bool = Field(
+        description="true nếu câu hỏi hiện tại tiếp tục / làm rõ / mở rộng nội dung hội thoại trước; "
+                    "false nếu chuyển sang chủ đề hoặc văn bản pháp luật khác"
+    )
+    intent: Literal["law", "vsic", "tax_code", "industrial_zone", "labor", "greeting", "other"] = Field(
+        description="law: pháp luật; vsic: mã ngành kinh tế; tax_code: mã số thuế / doanh nghiệp; "
+                    "industrial_zone: khu / cụm công nghiệp; labor: lao động - việc làm - BHXH; "
+                    "greeting: chào hỏi; other: khác"
+    )
+
+
+# Phân loại lịch sử hội thoại (prompt riêng, dùng khi model không hỗ trợ structured output)
+def _followup_prompt(clean_question: str, history: List[BaseMessage]) -> str:
+    # chỉ lấy vài lượt gần nhất để tiết kiệm token
+    recent = history[-6:]
+
+    history_text = "\n".join(
+        f"{m.type.upper()}: {m.content}"
+        for m in recent
+        if getattr(m, "content", None)
+    )
+
+    return f"""
+Bạn là bộ phân loại ngữ cảnh hội thoại.
+
+NHIỆM VỤ:
+- Xác định câu hỏi hiện tại có đang hỏi tiếp nội dung trong hội thoại trước hay không.
+
+HỘI THOẠI TRƯỚC:
+{history_text}
+
+CÂU HỎI HIỆN TẠI:
+{clean_question}
+
+QUY TẮC:
+- Trả về FOLLOW_UP nếu câu hỏi đang tiếp tục, làm rõ, mở rộng nội dung trước đó.
+- Trả về NEW_TOPIC nếu câu hỏi chuyển sang chủ đề hoặc văn bản pháp luật khác.
+
+CHỈ TRẢ VỀ MỘT TỪ DUY NHẤT:
+FOLLOW_UP hoặc NEW_TOPIC
+""".strip()
+
+
+def llm_is_followup(
+    clean_question: str,
+    history: List[BaseMessage],
+    lang_llm
+) -> bool:
+    """
+    Trả về:
+    - True  → câu hỏi hiện tại là follow-up của hội thoại trước
+    - False → câu hỏi mới / đổi chủ đề
+    """
+
+    if not history:
+        return False
+
+    prompt = _followup_prompt(clean_question, history)
+
+    try:
+        result = lang_llm.invoke(
+            [HumanMessage(content=prompt)]
+        ).content.strip().upper()
+        return result == "FOLLOW_UP"
+    except Exception:
+        return True
+
+
+async def allm_is_followup(
+    clean_question: str,
+    history: List[BaseMessage],
+    lang_llm
+) -> bool:
+    """Bản async của llm_is_followup (dùng cho /chat)."""
+
+    if not history:
+        return False
+
+    prompt = _followup_prompt(clean_question, history)
+
+    try:
+        result = (await lang_llm.ainvoke(
+            [HumanMessage(content=prompt)]
+        )).content.strip().upper()
+        return result == "FOLLOW_UP"
+    except Exception:
+        return True
+
+
+def _fused_prompt(clean_question: str, history: List[BaseMessage]) -> str:
+    # chỉ lấy vài lượt gần nhất để tiết kiệm token (giống _followup_prompt)
+    history_text = "\n".join(
+        f"{m.type.upper()}: {m.content}"
+        for m in history[-6:]
+        if getattr(m, "content", None)
+    ) or "(không có)"
+
+    return f"""
+Bạn là bộ phân loại câu hỏi của chatbot pháp luật / doanh nghiệp / khu công nghiệp.
+
+HỘI THOẠI TRƯỚC:
+{history_text}
+
+CÂU HỎI HIỆN TẠI:
+{clean_question}
+
+Xác định: ngôn ngữ của câu hỏi hiện tại, câu hỏi có hỏi tiếp hội thoại trước không, và intent.
+""".strip()
+
+
+def local_followup(clean_question: str, history: List[BaseMessage]) -> Optional[bool]:
+    """True / False nếu chắc chắn; None → cần LLM"""
+    if not history:
+        return False
+    if classify(clean_question).keywords("_followup_ref"):
+        return True
+    return None
+
+
+_UNSUPPORTED = object()
+
+
+async def _afused_classify(clean_question: str, history: List[BaseMessage], lang_llm):
+    """_FusedOutput | None (lỗi) | _UNSUPPORTED (model không hỗ trợ structured output)"""
+    try:
+        structured = lang_llm.with_structured_output(_FusedOutput)
+    except (NotImplementedError, AttributeError):
+        return _UNSUPPORTED
+    try:
+        return await structured.ainvoke([HumanMessage(content=_fused_prompt(clean_question, history))])
+    except Exception as e:
+        print(f"⚠️ Lỗi phân loại gộp: {e}")
+        return None
+
+
+@dataclass
+class LocalClassification:
+    """Kết quả heuristic cục bộ; None = chưa quyết định được, cần LLM"""
+    language: Optional[str]
+    lang_source: str
+    followup: Optional[bool]
+
+    @property
+    def needs_llm(self) -> bool:
+        return self.language is None or self.followup is None
+
+
+def classify_locally(
+    clean_question: str,
+    history: List[BaseMessage],
+    *,
+    session_id: Optional[str] = None,
+    need_followup: bool = True
+) -> LocalClassification:
+    """need_followup=False: nhánh không dùng tới follow-up (chào hỏi, flowchart, VSIC...)"""
+    with metrics.timer("pipeline_stage_seconds", label="classify_local"):
+        language, lang_source = resolve_language_locally(clean_question, session_id)
+        followup = local_followup(clean_question, history) if need_followup else False
+    return LocalClassification(language=language, lang_source=lang_source, followup=followup)
+
+
+async def apreclassify(
+    clean_question: str,
+    history: List[BaseMessage],
+    lang_llm,
+    *,
+    session_id: Optional[str] = None,
+    need_followup: bool = True,
+    cap: Optional[float] = None,
+    local: Optional[LocalClassification] = None
+) -> PreClassification:
+    """
+    local: kết quả classify_locally đã tính trước (pipeline cần biết sớm có phải chờ LLM không)
+    cap: thời gian tối đa của bước gọi LLM (khi có deadline, xem deadline.within)
+    Hết giờ / lỗi → giống trước đây: ngôn ngữ "vi", có lịch sử thì coi là follow-up.
+    """
+    if local is None:
+        local = classify_locally(clean_question, history, session_id=session_id, need_followup=need_followup)
+    language, followup = local.language, local.followup
+
+    result = PreClassification(language=language or "vi", followup=bool(followup))
+    timed_out = PreClassification(language=language or "vi", followup=bool(history), round_trips=1)
+    if local.needs_llm:
+        with metrics.timer("pipeline_stage_seconds", label="classify_llm"):
+            result = await within(
+                _allm_classify(clean_question, history, lang_llm, language, followup),
+                "preclassify", fallback=timed_out, cap=cap
+            )
+
+    # Hết giờ khi chưa biết ngôn ngữ → "vi" chỉ là tạm, không ghi nhớ cho session
+    if result is not timed_out or language is not None:
+        record_language(session_id, result.language, local.lang_source)
+    metrics.summary("pre_generation_llm_round_trips").observe(result.round_trips)
+    return result
+
+
+async def _allm_classify(
+    clean_question: str,
+    history: List[BaseMessage],
+    lang_llm,
+    language: Optional[str],
+    followup: Optional[bool]
+) -> PreClassification:
+    if followup is not None:
+        # Chỉ thiếu ngôn ngữ → prompt nhận diện ngôn ngữ ngắn như cũ
+        language = await adetect_language_openai(clean_question, lang_llm)
+        return PreClassification(language=language, followup=followup, round_trips=1)
+
+    fused = await _afused_classify(clean_question, history, lang_llm)
+
+    if fused is _UNSUPPORTED:
+        # Gọi riêng từng bước (song song, vẫn chỉ 1 round trip nối tiếp)
+        if language is None:
+            language, followup = await asyncio.gather(
+                adetect_language_openai(clean_question, lang_llm),
+                allm_is_followup(clean_question, history, lang_llm)
+            )
+            return PreClassification(language=language, followup=followup, round_trips=1)
+        followup = await allm_is_followup(clean_question, history, lang_llm)
+        return PreClassification(language=language, followup=followup, round_trips=1)
+
+    if fused is None:
+        # Lỗi → giống allm_is_followup / adetect_language_openai khi lỗi
+        return PreClassification(language=language or "vi", followup=True, round_trips=1)
+
+    metrics.counter("preclassify_intent_total").inc(label=fused.intent)
+    fused_lang = (fused.language or "").strip().lower()
+    return PreClassification(
+        # Heuristic cục bộ chắc chắn hơn LLM về ngôn ngữ
+        language=language or (fused_lang if fused_lang in lang_mapping else "vi"),
+        followup=fused.followup,
+        intent=fused.intent,
+        round_trips=1
+    )
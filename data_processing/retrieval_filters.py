@@ -0,0 +1,132 @@
+# data_processing/retrieval_filters.py
+"""
+Lọc payload khi tìm trong collection luật, theo ý định câu hỏi:
+- Câu hỏi VSIC → chỉ các chunk của Quyết định 36/2025 (metadata.content_type); có mã ngành
+  → thêm metadata.section_code = ngành cấp 1 (2 chữ số đầu của mã)
+- Câu hỏi nêu đích danh văn bản ("Nghị định 145/2020/NĐ-CP", "Bộ luật Lao động") → chỉ các
+  chunk của văn bản đó (metadata.source / metadata.document khớp)
+
+Danh sách văn bản lấy từ chính collection (facet, vectordb/registry.py) → ingest văn bản mới
+không phải sửa code. Không nhận ra văn bản nào → không lọc; lọc mà không còn kết quả →
+retriever tìm lại không lọc. Các trường lọc cần payload index: processing/create_payload_indexes.py
+"""
+import os
+import re
+import unicodedata
+from typing import List, Optional, Sequence, Tuple
+
+from qdrant_client import models
+
+from data_processing.vsic_index import extract_codes
+from monitoring import metrics
+from vectordb.registry import get_registry
+from vectordb.retriever import METADATA_KEY
+
+RETRIEVAL_FILTERS_ENABLED = os.getenv("RETRIEVAL_FILTERS_ENABLED", "1") == "1"
+# content_type của json/quyet_dinh_36_by_sections_01_99.json lúc ingest
+VSIC_CONTENT_TYPE = os.getenv("VSIC_CONTENT_TYPE", "economic_system_sections_01_99")
+
+# Trường metadata dùng để lọc (payload index tạo cho đúng các trường này)
+FILTER_FIELDS = ("section_code", "document", "content_type", "source")
+
+_DOC_TYPES = ("nghi dinh", "quyet dinh", "thong tu", "nghi quyet", "chi thi", "luat")
+# 145/2020/NĐ-CP, 59/2020/QH14 (trên câu hỏi gốc)
+_NUMBER_YEAR_RE = re.compile(r"(?<!\d)(\d{1,4})\s*/\s*((?:19|20)\d{2})(?!\d)")
+# "nghị định 145", "quyết định số 36 năm 2025" (trên câu hỏi đã bỏ dấu)
+_TYPE_NUMBER_RE = re.compile(rf"\b({'|'.join(_DOC_TYPES)}) (?:so )?(\d{{1,4}})\b(?: nam ((?:19|20)\d{{2}}))?")
+_YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+# Hết tên luật trong tên file / tên văn bản: "luat doanh nghiep so 59 2020 qh14"
+_NAME_STOP_RE = re.compile(r"^(?:\d+|so|nam|ngay|qh\d*|pdf|json|docx?)$")
+
+
+def _field(name: str) -> str:
+    return f"{METADATA_KEY}.{name}"
+
+
+def fold(text: str) -> str:
+    """Bỏ dấu + chữ thường + ký tự khác chữ / số → khoảng trắng ("Quyết định-36-2025-QĐ-TTg.pdf"
+    → "quyet dinh 36 2025 qd ttg pdf"), để so câu hỏi với tên file"""
+    t = unicodedata.normalize("NFD", (text or "").replace("Đ", "D").replace("đ", "d"))
+    t = "".join(c for c in t if unicodedata.category(c) != "Mn").lower()
+    return re.sub(r"[^a-z0-9]+", " ", t).strip()
+
+
+# ===================== NHẬN DIỆN VĂN BẢN =====================
+def document_refs(question: str) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """(số, năm | None, loại văn bản đã bỏ dấu | None) của các văn bản nêu trong câu hỏi"""
+    refs = [(number, year, None) for number, year in _NUMBER_YEAR_RE.findall(question or "")]
+    for doc_type, number, year in _TYPE_NUMBER_RE.findall(fold(question)):
+        refs.append((number, year or None, doc_type))
+    return refs
+
+
+def law_name(folded: str) -> Optional[str]:
+    """Tên luật trong tên file / văn bản đã bỏ dấu: "bo luat lao dong 2019" → "lao dong" """
+    tokens = folded.split()
+    if "luat" not in tokens:
+        return None
+    name = []
+    for token in tokens[tokens.index("luat") + 1:]:
+        if _NAME_STOP_RE.match(token):
+            break
+        name.append(token)
+    return " ".join(name) or None
+
+
+def match_documents(question: str, values: Sequence[str]) -> List[str]:
+    """Các giá trị source / document (tên file, tên văn bản) mà câu hỏi nêu đích danh"""
+    q = fold(question)
+    refs = document_refs(question)
+    matched = []
+    for value in values:
+        v = fold(value)
+        tokens = set(v.split())
+        by_number = any(
+            number in tokens
+            and (year is None or year in tokens)
+            # Chỉ có số (không có năm) → phải cùng loại văn bản
+            and (year is not None or (doc_type is not None and doc_type in v))
+            for number, year, doc_type in refs
+        )
+        name = law_name(v)
+        if by_number or (name and f" luat {name} " in f" {q} "):
+            matched.append(value)
+
+    # Nhiều bản của cùng 1 luật (2014, 2020) mà câu hỏi nêu năm → giữ bản đúng năm
+    years = set(_YEAR_RE.findall(q))
+    with_year = [value for value in matched if years & set(fold(value).split())]
+    return with_year or matched
+
+
+# ===================== FILTER =====================
+def vsic_filter(question: str) -> Optional[models.Filter]:
+    if not RETRIEVAL_FILTERS_ENABLED:
+        return None
+    must = [models.FieldCondition(key=_field("content_type"), match=models.MatchValue(value=VSIC_CONTENT_TYPE))]
+    sections = sorted({code[:2] for code in extract_codes(question)})
+    if sections:
+        must.append(models.FieldCondition(key=_field("section_code"), match=models.MatchAny(any=sections)))
+    metrics.counter("retrieval_scope_total").inc(label="vsic")
+    return models.Filter(must=must)
+
+
+async def alaw_filter(collection_name: Optional[str], question: str) -> Optional[models.Filter]:
+    """Câu hỏi nêu đích danh văn bản có trong collection → chỉ tìm trong văn bản đó"""
+    if not RETRIEVAL_FILTERS_ENABLED or not collection_name:
+        return None
+    if not document_refs(question) and "luat " not in fold(question):
+        return None
+    registry = get_registry()
+    if registry is None:
+        return None
+
+    conditions = []
+    for name in ("source", "document"):
+        values = await registry.apayload_values(collection_name, _field(name))
+        matched = match_documents(question, values)
+        if matched:
+            conditions.append(models.FieldCondition(key=_field(name), match=models.MatchAny(any=matched)))
+    if not conditions:
+        return None
+    metrics.counter("retrieval_scope_total").inc(label="law")
+    return models.Filter(should=conditions)
@@ -0,0 +1,9 @@
+# data_processing/sessions.py
+"""
+Hằng số về session_id dùng chung giữa tầng xử lý (language.py) và tầng HTTP
+(serving/admission.py) — đặt riêng để data_processing không phụ thuộc serving.
+"""
+
+# session_id mặc định của model Question → nhiều client dùng chung:
+# không giới hạn theo session, không ghi nhớ ngôn ngữ theo session
+SHARED_SESSIONS = frozenset({None, "", "default_session"})
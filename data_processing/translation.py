@@ -0,0 +1,159 @@
+# data_processing/translation.py
+"""
+Dịch câu trả lời sang ngôn ngữ người dùng, có cache:
+
+1. Câu cố định (GREETING_VI, OUT_OF_SCOPE_VI, TIMEOUT_VI...) → bản dịch sẵn trong
+   canned_translations.json (sinh bằng processing/build_canned_translations.py).
+   Khóa theo hash của câu gốc: sửa câu tiếng Việt mà chưa build lại → tự bỏ qua bản cũ.
+2. Câu trả lời sinh ra (lặp lại giống hệt) → LRU + TTL theo (hash câu gốc, ngôn ngữ đích)
+3. Còn lại → LLM (data_processing/language.py), kết quả thành công được lưu vào (2)
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+from data_processing.language import _convert_messages, aconvert_language
+from monitoring import metrics
+
+CANNED_TRANSLATIONS_PATH = Path(
+    os.getenv("CANNED_TRANSLATIONS_PATH", Path(__file__).resolve().parent / "canned_translations.json")
+)
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1((text or "").strip().encode("utf-8")).hexdigest()
+
+
+# ===================== BẢN DỊCH SẴN =====================
+def load_canned_translations(path: Path = CANNED_TRANSLATIONS_PATH) -> Dict[str, Dict[str, str]]:
+    """{hash câu gốc: {mã ngôn ngữ: bản dịch}}"""
+    try:
+        entries = json.loads(path.read_text(encoding="utf-8")).get("entries", {})
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Không đọc được bản dịch sẵn ({path}): {e}")
+        return {}
+    return {
+        entry["sha1"]: entry.get("translations", {})
+        for entry in entries.values()
+        if entry.get("sha1")
+    }
+
+
+_CANNED = load_canned_translations()
+
+
+def canned_translation(text: str, target_lang: str) -> Optional[str]:
+    return _CANNED.get(text_key(text), {}).get(target_lang)
+
+
+def localized(text: str, target_lang: str) -> str:
+    """Bản dịch sẵn nếu có, không thì giữ nguyên câu gốc (không gọi LLM)"""
+    if target_lang == "vi":
+        return text
+    return canned_translation(text, target_lang) or text
+
+
+# ===================== CACHE BẢN DỊCH =====================
+class TranslationCache:
+    """(hash câu gốc, ngôn ngữ đích) → bản dịch; LRU giới hạn số mục + TTL"""
+
+    def __init__(self, max_entries: int = 2000, ttl_seconds: float = 86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._items: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._lookups = 0
+
+    def get(self, text: str, target_lang: str) -> Optional[str]:
+        key = (text_key(text), target_lang)
+        now = time.time()
+        with self._lock:
+            self._lookups += 1
+            item = self._items.get(key)
+            if item is not None and now - item[1] > self.ttl_seconds:
+                del self._items[key]
+                item = None
+            if item is not None:
+                self._items.move_to_end(key)
+                self._hits += 1
+            hit_ratio = self._hits / self._lookups
+
+        metrics.counter("translation_cache_total").inc(label="hit" if item else "miss")
+        metrics.gauge("translation_cache_hit_ratio").set(hit_ratio)
+        return item[0] if item else None
+
+    def put(self, text: str, target_lang: str, translated: str):
+        with self._lock:
+            key = (text_key(text), target_lang)
+            self._items[key] = (translated, time.time())
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+            size = len(self._items)
+        metrics.gauge("translation_cache_entries").set(size)
+
+    def __len__(self):
+        return len(self._items)
+
+
+TRANSLATION_CACHE = TranslationCache(
+    max_entries=int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "2000")),
+    ttl_seconds=float(os.getenv("TRANSLATION_CACHE_TTL_SECONDS", "86400")),
+)
+
+
+def _cached(text: str, target_lang: str) -> Optional[str]:
+    translated = canned_translation(text, target_lang)
+    if translated is not None:
+        metrics.counter("translation_cache_total").inc(label="canned")
+        return translated
+    return TRANSLATION_CACHE.get(text, target_lang)
+
+
+async def atranslate(text: str, target_lang: str, lang_llm) -> str:
+    """Giống aconvert_language nhưng dùng bản dịch sẵn / cache trước khi gọi LLM"""
+    translated = _cached(text, target_lang)
+    if translated is not None:
+        return translated
+
+    translated = await aconvert_language(text, target_lang, lang_llm)
+    # aconvert_language trả lại câu gốc khi lỗi → không lưu
+    if translated and translated != text:
+        TRANSLATION_CACHE.put(text, target_lang, translated)
+    return translated
+
+
+class TranslationFailed(Exception):
+    """Stream dịch lỗi / rỗng: phần đã stream (nếu có) không phải bản dịch trọn vẹn"""
+
+
+async def astream_translate(text: str, target_lang: str, lang_llm) -> AsyncIterator[str]:
+    """
+    Bản stream của atranslate: có sẵn → trả 1 lần; không thì stream LLM rồi lưu cache.
+    Lỗi (trước token đầu hoặc giữa chừng) → raise TranslationFailed sau các phần đã stream;
+    nơi gọi tự quyết định trả câu gốc và KHÔNG lưu phần dịch dở vào cache nào.
+    """
+    translated = _cached(text, target_lang)
+    if translated is not None:
+        yield translated
+        return
+
+    parts = []
+    try:
+        async for chunk in lang_llm.astream(_convert_messages(text, target_lang)):
+            if chunk.content:
+                parts.append(chunk.content)
+                yield chunk.content
+    except Exception as e:
+        raise TranslationFailed(f"{type(e).__name__}: {e}") from e
+
+    translated = "".join(parts).strip()
+    if not translated:
+        raise TranslationFailed("bản dịch rỗng")
+    TRANSLATION_CACHE.put(text, target_lang, translated)
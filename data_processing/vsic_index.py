@@ -0,0 +1,361 @@
+# data_processing/vsic_index.py
+"""
+Tra cứu mã ngành kinh tế (VSIC) ngay trong process, không qua vector search.
+
+- VSIC 2018 (Quyết định 27/2018/QĐ-TTg): data_msn_2018/ma_nganh_27.json
+  {mã: tên}, theo thứ tự ngành cấp 1 (chữ cái) → cấp 2 → ... → cấp 5
+- VSIC 2025 (Quyết định 36/2025/QĐ-TTg): json/quyet_dinh_36_by_sections_01_99.json
+  văn bản từng ngành cấp 2; tách theo các dòng tiêu đề "011: ...", "0111 - 01110: ..."
+
+Mỗi bộ mã nạp 1 lần vào dict → tra mã + chuỗi cấp cha (section → division → group →
+class → subclass, xem msn_2018.utils.detect_vsic_level) và so sánh 2018 ↔ 2025 trực tiếp.
+LLM chỉ còn diễn đạt câu trả lời từ kết quả tra cứu.
+"""
+import json
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from msn_2018.utils import detect_vsic_level
+
+_ROOT = Path(__file__).resolve().parent.parent
+VSIC_2018_PATH = Path(os.getenv("VSIC_2018_PATH", _ROOT / "data_msn_2018" / "ma_nganh_27.json"))
+VSIC_2025_PATH = Path(os.getenv("VSIC_2025_PATH", _ROOT / "json" / "quyet_dinh_36_by_sections_01_99.json"))
+
+# Độ dài tối đa phần mô tả (Nhóm này gồm / Loại trừ) đưa vào prompt cho mỗi mã
+VSIC_DESCRIPTION_MAX_CHARS = int(os.getenv("VSIC_DESCRIPTION_MAX_CHARS", "1500"))
+
+DOCUMENT_2018 = "Quyết định số 27/2018/QĐ-TTg"
+DOCUMENT_2025 = "Quyết định số 36/2025/QĐ-TTg"
+
+LEVEL_LABELS = {
+    "section": "ngành cấp 1",
+    "division": "ngành cấp 2",
+    "group": "ngành cấp 3",
+    "class": "ngành cấp 4",
+    "subclass": "ngành cấp 5",
+}
+
+# "011: Trồng cây hàng năm" | "0111 - 01110: Trồng lúa" | "37. THOÁT NƯỚC VÀ XỬ LÝ NƯỚC THẢI"
+_HEADER_RE = re.compile(r"^\s*(\d{2,5})(?:\s*-\s*(\d{2,5}))?\s*:\s*(\S.*)$")
+_DIVISION_DOT_RE = re.compile(r"^\s*(\d{2})\.\s+([^\sa-zđ][^a-zđ]*)$")
+
+# Mã trong câu hỏi: 5 chữ số luôn là mã; 2-4 chữ số phải đứng sau "mã / ngành / nhóm"
+# (tránh nhầm năm, số hiệu văn bản)
+_CODE_5_RE = re.compile(r"(?<![\d/])\d{5}(?![\d/])")
+_CODE_SHORT_RE = re.compile(
+    r"(?:mã|ngành|nhóm|code)\s*(?:kinh tế\s*)?(?:số\s*)?(?:cấp\s*\d\s*)?(\d{2,4})(?![\d/])",
+    re.IGNORECASE
+)
+
+# Kiểu bỏ dấu cũ ↔ mới (thuỷ/thủy, hoà/hòa) để so tên giữa 2 văn bản
+_TONE_STYLE = {
+    "oà": "òa", "oá": "óa", "oả": "ỏa", "oã": "õa", "oạ": "ọa",
+    "oè": "òe", "oé": "óe", "oẻ": "ỏe", "oẽ": "õe", "oẹ": "ọe",
+    "uỳ": "ùy", "uý": "úy", "uỷ": "ủy", "uỹ": "ũy", "uỵ": "ụy",
+}
+_TONE_RE = re.compile("|".join(_TONE_STYLE))
+
+
+def _clean_title(title: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", title or "")).strip()
+
+
+def title_key(title: str) -> str:
+    """Khóa so sánh tên ngành (không phân biệt hoa thường / xuống dòng / kiểu bỏ dấu)"""
+    t = _clean_title(title).lower()
+    return _TONE_RE.sub(lambda m: _TONE_STYLE[m.group(0)], t)
+
+
+@dataclass
+class VsicEntry:
+    code: str
+    title: str
+    level: str
+    section: Optional[str] = None
+    description: str = ""
+    children: List[str] = field(default_factory=list)
+    # Không có dòng riêng trong dữ liệu, suy ra từ mã cấp dưới (title "" = chưa rõ tên)
+    implied: bool = False
+
+
+class VsicIndex:
+    """1 bộ mã VSIC (1 văn bản) trong bộ nhớ"""
+
+    def __init__(self, document: str, entries: Dict[str, VsicEntry], divisions: Optional[Set[str]] = None):
+        self.document = document
+        self.entries = entries
+        self._add_implied_parents()
+        # Ngành cấp 2 có trong dữ liệu (dữ liệu 2025 chưa đủ 99 ngành) → phân biệt
+        # "mã không tồn tại" với "chưa có dữ liệu"
+        self.divisions = divisions if divisions is not None else {
+            c for c, e in entries.items() if e.level == "division"
+        }
+        for code, entry in entries.items():
+            parent = self._parent_code(code)
+            if parent and parent in entries:
+                entries[parent].children.append(code)
+
+    def _add_implied_parents(self):
+        """
+        Mã cha thiếu trong dữ liệu: bảng VSIC gộp "0111 - 01110" (1 mã con duy nhất, cùng tên)
+        hoặc dòng tiêu đề bị mất khi trích PDF → tạo mã cha từ các mã con
+        """
+        missing: Dict[str, List[str]] = {}
+        for code in self.entries:
+            if not code.isdigit():
+                continue
+            for n in range(len(code) - 1, 1, -1):
+                parent = code[:n]
+                if parent in self.entries:
+                    break
+                missing.setdefault(parent, []).append(code)
+
+        for parent, descendants in sorted(missing.items(), key=lambda kv: -len(kv[0])):
+            direct = [c for c in descendants if len(c) == len(parent) + 1]
+            child = self.entries.get(direct[0]) if len(direct) == 1 else None
+            self.entries[parent] = VsicEntry(
+                code=parent,
+                title=child.title if child else "",
+                level=detect_vsic_level(parent),
+                section=self.entries[descendants[0]].section,
+                implied=True
+            )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, code: str) -> Optional[VsicEntry]:
+        return self.entries.get(code)
+
+    def covers(self, code: str) -> bool:
+        """Dữ liệu có đủ ngành cấp 2 chứa mã này để kết luận mã có / không tồn tại"""
+        return code.isdigit() and code[:2] in self.divisions
+
+    def _parent_code(self, code: str) -> Optional[str]:
+        if code.isdigit() and len(code) > 2:
+            return code[:-1]
+        if code.isdigit() and len(code) == 2:
+            return self.entries[code].section if code in self.entries else None
+        return None
+
+    def hierarchy(self, code: str) -> List[VsicEntry]:
+        """Chuỗi cấp cha → mã: section → division → group → class → subclass"""
+        chain = []
+        current = code if code in self.entries else None
+        while current:
+            chain.append(self.entries[current])
+            current = self._parent_code(current)
+            if current not in self.entries:
+                break
+        return chain[::-1]
+
+
+# ===================== NẠP DỮ LIỆU =====================
+def load_vsic_2018(path: Path = VSIC_2018_PATH) -> VsicIndex:
+    raw = json.loads(Path(path).read_text(encoding="utf-8"))
+    entries: Dict[str, VsicEntry] = {}
+    section = None
+    for code, title in raw.items():
+        level = detect_vsic_level(code)
+        if level == "unknown":
+            continue
+        if level == "section":
+            section = code
+        entries[code] = VsicEntry(
+            code=code,
+            title=_clean_title(title),
+            level=level,
+            section=section if level != "section" else None
+        )
+    return VsicIndex(DOCUMENT_2018, entries)
+
+
+def _parse_2025_text(text: str, entries: Dict[str, VsicEntry]):
+    lines = text.split("\n")
+    current: Optional[List[VsicEntry]] = None
+    title_open = False
+    description: List[str] = []
+    division = None
+
+    def flush():
+        if current:
+            desc = "\n".join(description).strip()
+            for e in current:
+                e.description = desc
+
+    for line in lines:
+        m = _HEADER_RE.match(line)
+        codes, title = None, None
+        if m:
+            codes = [c for c in (m.group(1), m.group(2)) if c]
+            title = m.group(3)
+        else:
+            m = _DIVISION_DOT_RE.match(line)
+            if m:
+                codes, title = [m.group(1)], m.group(2)
+
+        # Tiêu đề hợp lệ: mã sau là con trực tiếp của mã trước, thuộc ngành cấp 2 đang đọc
+        # (dòng "01 (Nông nghiệp...)" trong phần Loại trừ không khớp vì thiếu dấu ":")
+        if codes and (
+            (len(codes) == 2 and not (codes[1].startswith(codes[0]) and len(codes[1]) == len(codes[0]) + 1))
+            or (len(codes[0]) > 2 and codes[0][:2] != division)
+            or any(c in entries for c in codes)
+        ):
+            codes = None
+
+        if codes:
+            flush()
+            if len(codes[0]) == 2:
+                division = codes[0]
+            current = [
+                VsicEntry(code=c, title=_clean_title(title), level=detect_vsic_level(c))
+                for c in codes
+            ]
+            for e in current:
+                entries[e.code] = e
+            description = []
+            title_open = True
+            continue
+
+        if title_open and line.strip():
+            # Tên ngành dài xuống dòng
+            for e in current:
+                e.title = _clean_title(f"{e.title} {line}")
+            continue
+        title_open = False
+        if current:
+            description.append(line.rstrip())
+    flush()
+
+
+def load_vsic_2025(path: Path = VSIC_2025_PATH) -> VsicIndex:
+    raw = json.loads(Path(path).read_text(encoding="utf-8"))
+    entries: Dict[str, VsicEntry] = {}
+    for section in raw.get("sections", {}).values():
+        _parse_2025_text(section.get("text", ""), entries)
+    return VsicIndex(DOCUMENT_2025, entries)
+
+
+@lru_cache(maxsize=1)
+def vsic_2018() -> VsicIndex:
+    index = load_vsic_2018()
+    print(f"📚 VSIC 2018: {len(index)} mã")
+    return index
+
+
+@lru_cache(maxsize=1)
+def vsic_2025() -> VsicIndex:
+    index = load_vsic_2025()
+    print(f"📚 VSIC 2025: {len(index)} mã ({len(index.divisions)} ngành cấp 2)")
+    return index
+
+
+# ===================== SO SÁNH 2018 ↔ 2025 =====================
+@dataclass
+class VsicComparison:
+    code: str
+    # unchanged | renamed | both (có ở cả 2, thiếu tên để so) | added (chỉ có ở 2025) | removed (chỉ có ở 2018)
+    # | unknown_2025 (dữ liệu 2025 chưa có ngành cấp 2 này) | not_found
+    status: str
+    entry_2018: Optional[VsicEntry] = None
+    entry_2025: Optional[VsicEntry] = None
+    hierarchy_2018: List[VsicEntry] = field(default_factory=list)
+    hierarchy_2025: List[VsicEntry] = field(default_factory=list)
+    children_added: List[str] = field(default_factory=list)
+    children_removed: List[str] = field(default_factory=list)
+
+    @property
+    def resolved(self) -> bool:
+        """Đủ dữ liệu cả 2 văn bản để trả lời không cần vector search"""
+        return self.status != "unknown_2025"
+
+
+def compare_code(code: str) -> VsicComparison:
+    old, new = vsic_2018(), vsic_2025()
+    e18, e25 = old.get(code), new.get(code)
+
+    if e18 and e25:
+        if not (e18.title and e25.title):
+            status = "both"
+        else:
+            status = "unchanged" if title_key(e18.title) == title_key(e25.title) else "renamed"
+    elif e25:
+        status = "added"
+    elif e18:
+        status = "removed" if new.covers(code) else "unknown_2025"
+    else:
+        status = "not_found" if new.covers(code) else "unknown_2025"
+
+    children_18 = set(e18.children) if e18 else set()
+    children_25 = set(e25.children) if e25 else set()
+    return VsicComparison(
+        code=code,
+        status=status,
+        entry_2018=e18,
+        entry_2025=e25,
+        hierarchy_2018=old.hierarchy(code),
+        hierarchy_2025=new.hierarchy(code),
+        children_added=sorted(children_25 - children_18) if e18 and e25 else [],
+        children_removed=sorted(children_18 - children_25) if e18 and e25 else [],
+    )
+
+
+def extract_codes(text: str) -> List[str]:
+    """Mã ngành trong câu hỏi (giữ thứ tự, bỏ trùng)"""
+    found = _CODE_5_RE.findall(text or "") + _CODE_SHORT_RE.findall(text or "")
+    return list(dict.fromkeys(found))
+
+
+# ===================== CONTEXT CHO LLM =====================
+_STATUS_VI = {
+    "unchanged": "giữ nguyên tên ngành giữa 2018 và 2025",
+    "renamed": "có ở cả 2 văn bản nhưng tên ngành thay đổi",
+    "both": "có ở cả 2 văn bản",
+    "added": "mã mới, chỉ có theo Quyết định 36/2025/QĐ-TTg",
+    "removed": "chỉ có theo Quyết định 27/2018/QĐ-TTg, không tìm thấy trong dữ liệu Quyết định 36/2025/QĐ-TTg",
+    "unknown_2025": "chưa có dữ liệu Quyết định 36/2025/QĐ-TTg cho ngành cấp 2 này",
+    "not_found": "không có trong cả 2 văn bản",
+}
+
+
+def _render_entry(entry: Optional[VsicEntry], chain: List[VsicEntry], document: str, missing: str) -> str:
+    if entry is None:
+        return f"Theo {document}: {missing}"
+    lines = [
+        f"Theo {document}:",
+        f"- Mã {entry.code} ({LEVEL_LABELS.get(entry.level, entry.level)}): {entry.title or '(chưa rõ tên)'}",
+    ]
+    if len(chain) > 1:
+        lines.append("- Thuộc: " + " › ".join(f"{e.code} {e.title}".rstrip() for e in chain[:-1]))
+    if entry.description:
+        desc = entry.description
+        if len(desc) > VSIC_DESCRIPTION_MAX_CHARS:
+            desc = desc[:VSIC_DESCRIPTION_MAX_CHARS].rstrip() + " ..."
+        lines.append(f"- Mô tả:\n{desc}")
+    return "\n".join(lines)
+
+
+def render_comparison(c: VsicComparison) -> str:
+    missing_2025 = (
+        "chưa có dữ liệu cho ngành cấp 2 này" if c.status == "unknown_2025"
+        else "không tìm thấy mã này"
+    )
+    parts = [
+        f"MÃ NGÀNH {c.code} — {_STATUS_VI[c.status]}",
+        _render_entry(c.entry_2025, c.hierarchy_2025, DOCUMENT_2025, missing_2025),
+        _render_entry(c.entry_2018, c.hierarchy_2018, DOCUMENT_2018, "mã này không được quy định"),
+    ]
+    if c.children_added:
+        parts.append("Mã cấp dưới mới ở 2025: " + ", ".join(
+            f"{code} {vsic_2025().get(code).title}".rstrip() for code in c.children_added
+        ))
+    if c.children_removed:
+        parts.append("Mã cấp dưới không còn ở 2025: " + ", ".join(
+            f"{code} {vsic_2018().get(code).title}".rstrip() for code in c.children_removed
+        ))
+    return "\n".join(parts)
@@ -0,0 +1,33 @@
+# gunicorn.conf.py
+# Chế độ production (nhiều worker):
+#   gunicorn -c gunicorn.conf.py main:app_fastapi
+# Dev (1 process, auto reload): python main.py
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count()))))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Câu trả lời RAG dài có thể mất > 60s
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+# KHÔNG preload_app: main.py tạo client mạng (OpenAI/Qdrant/asyncpg) lúc import,
+# không an toàn khi fork. Thay vào đó master chỉ nạp dữ liệu chỉ đọc (on_starting).
+preload_app = False
+
+
+def on_starting(server):
+    if os.getenv("PRELOAD_DATASETS", "1") != "1":
+        server.log.info("⏭️ PRELOAD_DATASETS=0 → mỗi worker tự nạp dữ liệu")
+        return
+
+    from serving.preload import preload_shared_data
+    stats = preload_shared_data()
+    server.log.info(f"📦 Đã nạp dữ liệu dùng chung trước fork: {stats}")
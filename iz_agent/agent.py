@@ -8,11 +8,9 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 # Import module
 try:
-    from .backend import IIPMapBackend
-    from .tools import search_flexible_tool, search_single_zone_tool, EXCEL_PATH, GEOJSON_PATH
+    from .tools import search_flexible_tool, search_single_zone_tool, backend
 except ImportError:
-    from backend import IIPMapBackend
-    from tools import search_flexible_tool, search_single_zone_tool, EXCEL_PATH, GEOJSON_PATH
+    from tools import search_flexible_tool, search_single_zone_tool, backend
 
 load_dotenv()
 MY_API_KEY = os.getenv("OPENAI__API_KEY")
@@ -22,9 +20,9 @@ if not MY_API_KEY:
     sys.exit(1)
 
 # Load danh sách cột (Hiển thị toàn bộ cột)
+# Dùng lại backend của tools (không đọc Excel lần 2)
 try:
-    temp_backend = IIPMapBackend(EXCEL_PATH, GEOJSON_PATH)
-    full_cols = temp_backend.get_all_columns()
+    full_cols = backend.get_all_columns()
     # Hiển thị toàn bộ cột
     ALL_COLUMNS = ", ".join(full_cols)
 except Exception as e:
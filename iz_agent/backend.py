@@ -86,6 +86,13 @@ class IIPMapBackend:
             # Tự động tạo các cột số cho tất cả cột có thể chứa số
             self._create_numeric_columns()
 
+        # Danh sách chỉ đọc, tính 1 lần (dùng chung giữa các worker khi preload trước fork)
+        self.provinces = (
+            sorted(self.df[prov_col].dropna().astype(str).str.strip().unique().tolist())
+            if not self.df.empty and prov_col else []
+        )
+        self.geojson_names = list(self.geojson_map.keys())
+
     def _map_columns_dynamic(self):
         """Tìm tên cột gần đúng trong file Excel nếu tên cứng không khớp"""
         for key, val in self.cols.items():
@@ -286,7 +293,7 @@ class IIPMapBackend:
         norm = self._normalize(name)
         if norm in self.geojson_map: return self.geojson_map[norm]
         if process and self.geojson_map:
-            match = process.extractOne(norm, list(self.geojson_map.keys()), scorer=fuzz.WRatio)
+            match = process.extractOne(norm, self.geojson_names, scorer=fuzz.WRatio)
             if match and match[1] > 85: return self.geojson_map[match[0]]
         return None
 
@@ -338,6 +345,11 @@ class IIPMapBackend:
         return df_res
 
     def generate_chart_base64(self, df: pd.DataFrame, title: str, metric_col: str = "dual", limit: int = None):
+        png = self.generate_chart_png(df, title, metric_col, limit)
+        return base64.b64encode(png).decode('utf-8') if png else None
+
+    def generate_chart_png(self, df: pd.DataFrame, title: str, metric_col: str = "dual", limit: int = None):
+        """Vẽ biểu đồ, trả về bytes PNG (None nếu không vẽ được)"""
         if df.empty: return None
         df_plot = df.copy()
         
@@ -459,8 +471,6 @@ class IIPMapBackend:
         plt.tight_layout()
         buf = io.BytesIO()
         plt.savefig(buf, format='png')
-        buf.seek(0)
-        b64 = base64.b64encode(buf.read()).decode('utf-8')
         plt.close()
-        return b64
+        return buf.getvalue()
 
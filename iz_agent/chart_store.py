@@ -0,0 +1,151 @@
+# iz_agent/chart_store.py
+"""
+Kho ảnh biểu đồ (PNG) có giới hạn, thay cho dict CHART_STORE toàn cục cũ
+(lớn dần theo mỗi biểu đồ, không bao giờ xóa).
+
+- Bộ nhớ: LRU giới hạn theo TỔNG số byte + TTL
+- Đĩa (tùy chọn): ghi mỗi ảnh ra thư mục → ảnh bị đẩy khỏi RAM vẫn đọc lại được,
+  và các worker gunicorn khác cũng phục vụ được GET /charts/{id}
+- Ảnh quá TTL bị xóa ở cả RAM lẫn đĩa
+"""
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from monitoring import metrics
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def is_valid_chart_id(chart_id: str) -> bool:
+    """Chỉ nhận id do kho sinh ra (chặn path traversal khi đọc từ đĩa)"""
+    return bool(_ID_RE.match(chart_id or ""))
+
+
+class ChartStore:
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 3600,
+        spill_dir: Optional[str] = None
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+
+        # chart_id -> (png bytes, created_at); thứ tự = LRU
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+        if self.spill_dir:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+    # ---------------- API ----------------
+    def put(self, png: bytes) -> str:
+        chart_id = uuid.uuid4().hex
+        now = time.time()
+
+        if self.spill_dir:
+            # Ghi file tạm rồi rename → worker khác không đọc phải file ghi dở
+            tmp = self.spill_dir / f".{chart_id}.tmp"
+            tmp.write_bytes(png)
+            os.replace(tmp, self._path(chart_id))
+
+        with self._lock:
+            self._items[chart_id] = (png, now)
+            self._bytes += len(png)
+            self._evict(now)
+
+        metrics.counter("chart_store_put_total").inc()
+        self._sweep_disk(now)
+        return chart_id
+
+    def get(self, chart_id: str) -> Optional[bytes]:
+        if not is_valid_chart_id(chart_id):
+            return None
+        now = time.time()
+
+        with self._lock:
+            item = self._items.get(chart_id)
+            if item is not None:
+                png, created_at = item
+                if now - created_at <= self.ttl_seconds:
+                    self._items.move_to_end(chart_id)
+                    metrics.counter("chart_store_get_total").inc(label="memory")
+                    return png
+                self._drop(chart_id)
+
+        # Không có trong RAM (đã bị đẩy ra / worker khác tạo) → đọc từ đĩa
+        if self.spill_dir:
+            path = self._path(chart_id)
+            try:
+                if now - path.stat().st_mtime <= self.ttl_seconds:
+                    metrics.counter("chart_store_get_total").inc(label="disk")
+                    return path.read_bytes()
+                path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+        metrics.counter("chart_store_get_total").inc(label="miss")
+        return None
+
+    def __contains__(self, chart_id: str) -> bool:
+        return self.get(chart_id) is not None
+
+    def __len__(self):
+        return len(self._items)
+
+    # ---------------- NỘI BỘ ----------------
+    def _path(self, chart_id: str) -> Path:
+        return self.spill_dir / f"{chart_id}.png"
+
+    def _drop(self, chart_id: str):
+        png, _ = self._items.pop(chart_id)
+        self._bytes -= len(png)
+
+    def _evict(self, now: float):
+        # Hết hạn trước, sau đó LRU cho tới khi dưới giới hạn byte
+        expired = [k for k, (_, t) in self._items.items() if now - t > self.ttl_seconds]
+        for k in expired:
+            self._drop(k)
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+            k = next(iter(self._items))
+            self._drop(k)
+            metrics.counter("chart_store_evictions_total").inc()
+        metrics.gauge("chart_store_bytes").set(self._bytes)
+
+    def _sweep_disk(self, now: float):
+        """Xóa file quá TTL trên đĩa (tối đa 1 lần / phút)"""
+        if not self.spill_dir or now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        for path in self.spill_dir.glob("*.png"):
+            try:
+                if now - path.stat().st_mtime > self.ttl_seconds:
+                    path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+
+# ===================== SINGLETON (cấu hình qua ENV) =====================
+_store: Optional[ChartStore] = None
+_store_lock = threading.Lock()
+
+
+def get_chart_store() -> ChartStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ChartStore(
+                max_bytes=int(os.getenv("CHART_STORE_MAX_MB", "64")) * 1024 * 1024,
+                ttl_seconds=float(os.getenv("CHART_STORE_TTL_SECONDS", "3600")),
+                spill_dir=os.getenv("CHART_STORE_DIR", ".cache/charts") or None,
+            )
+    return _store
@@ -1,7 +1,7 @@
 from langchain_core.tools import tool
 from .backend import IIPMapBackend
+from .chart_store import get_chart_store
 import json
-import uuid
 import os
 import math
 from dotenv import load_dotenv
@@ -14,9 +14,9 @@ EXCEL_PATH = os.getenv("EXCEL_FILE_PATH", "./data/IIPMap_FULL_63_COMPLETE.xlsx")
 GEOJSON_PATH = os.getenv("GEOJSON_FILE_PATH", "./map_ui/industrial_zones.geojson")
 backend = IIPMapBackend(EXCEL_PATH, GEOJSON_PATH)
 
-# ✅ KHO CHỨA ẢNH TẠM THỜI (Global Variable)
+# ✅ KHO CHỨA ẢNH (giới hạn dung lượng + TTL, xem chart_store.py)
 # Đây là nơi lưu ảnh thật để AI không phải "vác" theo
-CHART_STORE = {}
+CHART_STORE = get_chart_store()
 
 def _clean_value_for_json(value):
     """Clean a single value for JSON serialization"""
@@ -107,7 +107,7 @@ def search_single_zone_tool(zone_name: str):
 def search_flexible_tool(filter_json: str, view_option: str = "list"):
     """
     Tìm kiếm và vẽ biểu đồ. 
-    Lưu ý: Ảnh Base64 sẽ được lưu vào CHART_STORE, chỉ trả về chart_id cho AI.
+    Lưu ý: Ảnh PNG sẽ được lưu vào CHART_STORE, chỉ trả về chart_id cho AI.
     """
     try:
         filters = json.loads(filter_json)
@@ -200,16 +200,15 @@ def search_flexible_tool(filter_json: str, view_option: str = "list"):
         title = f"BIỂU ĐỒ {metric.upper()} - {prov_str}"
         
         # Vẽ ảnh với tất cả dữ liệu (KHÔNG GIỚI HẠN cho biểu đồ)
-        base64_str = backend.generate_chart_base64(df_res, title, metric, limit=-1)  # -1 = unlimited
+        png = backend.generate_chart_png(df_res, title, metric, limit=-1)  # -1 = unlimited
         
-        print(f"🎨 Chart generated: {bool(base64_str)}, length: {len(base64_str) if base64_str else 0}")
+        print(f"🎨 Chart generated: {bool(png)}, size: {len(png) if png else 0} bytes")
         
-        if base64_str:
+        if png:
             # ✅ BƯỚC QUAN TRỌNG: 
-            # - Tạo ID ngẫu nhiên
-            # - Cất ảnh vào kho CHART_STORE
-            chart_id = str(uuid.uuid4())
-            CHART_STORE[chart_id] = base64_str
+            # - Cất ảnh vào kho CHART_STORE (kho tự sinh ID)
+            # - Client tải ảnh qua GET /charts/{chart_id}
+            chart_id = CHART_STORE.put(png)
             print(f"✅ Chart stored with ID: {chart_id}")
         else:
             print(f"⚠️ Chart generation returned None!")
@@ -1,7 +1,13 @@
 import psycopg2
+import asyncio
 import os
 from dotenv import load_dotenv
 
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
 load_dotenv(override=True)
 DATABASE_URL = os.getenv("DATABASE_URL")
 
@@ -54,3 +60,72 @@ def count_distinct_laws_from_db() -> int:
     conn.close()
 
     return result[0] if result else 0
+
+
+# ===================== ASYNC (asyncpg pool) =====================
+# Dùng cho /chat (FastAPI): không chiếm thread pool, tái sử dụng kết nối
+# thay vì mở/đóng psycopg2.connect cho mỗi câu hỏi.
+_pool = None
+_pool_lock = None
+
+
+def _asyncpg_dsn(url: str) -> str:
+    # DATABASE_URL có thể ở dạng SQLAlchemy (postgresql+psycopg2://...)
+    return url.replace("+psycopg2", "").replace("+asyncpg", "")
+
+
+async def get_pool():
+    global _pool, _pool_lock
+    if asyncpg is None:
+        raise RuntimeError("Thiếu thư viện asyncpg")
+    if _pool is not None:
+        return _pool
+
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                _asyncpg_dsn(DATABASE_URL),
+                min_size=1,
+                max_size=int(os.getenv("LAW_DB_POOL_SIZE", "10")),
+            )
+    return _pool
+
+
+async def aquery_article_from_db(law_names, article):
+    pool = await get_pool()
+
+    sql = """
+    SELECT law_name, law_year, chapter, section, article, text
+    FROM law_articles
+    WHERE law_name = $1 AND article = $2
+    ORDER BY law_year DESC
+    LIMIT 1;
+    """
+
+    async with pool.acquire() as conn:
+        for ln in law_names:
+            row = await conn.fetchrow(sql, ln, article)
+            if row:
+                return tuple(row)
+
+    return None
+
+
+async def acount_distinct_laws_from_db() -> int:
+    pool = await get_pool()
+
+    sql = """
+    SELECT COUNT(*)
+    FROM (
+        SELECT DISTINCT law_name, law_year
+        FROM law_articles
+    ) AS t;
+    """
+
+    async with pool.acquire() as conn:
+        result = await conn.fetchval(sql)
+
+    return result or 0
@@ -5,7 +5,9 @@ from law_db_query.intent import (
 from law_db_query.parser import parse_law_query
 from law_db_query.db import (
     query_article_from_db,
-    count_distinct_laws_from_db
+    count_distinct_laws_from_db,
+    aquery_article_from_db,
+    acount_distinct_laws_from_db
 )
 
 
@@ -21,7 +23,20 @@ def handle_law_article_query(message: str) -> str | None:
 
     law_names, article = parse_law_query(message)
     result = query_article_from_db(law_names, article)
+    return _format_article(result)
 
+
+async def ahandle_law_article_query(message: str) -> str | None:
+    """Bản async của handle_law_article_query (asyncpg)."""
+    if not is_law_article_query(message):
+        return None
+
+    law_names, article = parse_law_query(message)
+    result = await aquery_article_from_db(law_names, article)
+    return _format_article(result)
+
+
+def _format_article(result) -> str:
     if not result:
         return "Không tìm thấy điều luật bạn yêu cầu."
 
@@ -54,3 +69,16 @@ def handle_law_count_query(message: str) -> dict | None:
         "intent": "law_count",
         "total_laws": total
     }
+
+
+async def ahandle_law_count_query(message: str) -> dict | None:
+    """Bản async của handle_law_count_query (asyncpg)."""
+    if not is_law_count_query(message):
+        return None
+
+    total = await acount_distinct_laws_from_db()
+
+    return {
+        "intent": "law_count",
+        "total_laws": total
+    }
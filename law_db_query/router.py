@@ -1,5 +1,11 @@
-from law_db_query.handler import handle_law_article_query
-from data_processing.pipeline import process_pdf_question
+from law_db_query.handler import handle_law_article_query, ahandle_law_article_query
+from data_processing.deadline import within
+from data_processing.pipeline import (
+    process_pdf_question,
+    aprocess_pdf_question,
+    aprepare_answer,
+    PreparedAnswer
+)
 
 
 def route_message(
@@ -7,7 +13,7 @@ def route_message(
     llm,
     lang_llm,
     retriever,
-    retriever_vsic_2018=None,   
+    retriever_vsic_2018=None,
     excel_handler=None
 ):
     message = input_dict["message"]
@@ -26,7 +32,59 @@ def route_message(
         input_dict,
         llm=llm,
         lang_llm=lang_llm,
-        retriever=retriever,                     
-        retriever_vsic_2018=retriever_vsic_2018, 
+        retriever=retriever,
+        retriever_vsic_2018=retriever_vsic_2018,
+        excel_handler=excel_handler
+    )
+
+
+async def aroute_message(
+    input_dict,
+    llm,
+    lang_llm,
+    retriever,
+    retriever_vsic_2018=None,
+    excel_handler=None
+):
+    """Bản async của route_message (dùng cho /chat)."""
+    message = input_dict["message"]
+
+    # Hết ngân sách thời gian → bỏ qua tra DB, chạy tiếp RAG
+    law_response = await within(ahandle_law_article_query(message), "law_article_db", fallback=None)
+    if law_response:
+        return law_response
+
+    return await aprocess_pdf_question(
+        input_dict,
+        llm=llm,
+        lang_llm=lang_llm,
+        retriever=retriever,
+        retriever_vsic_2018=retriever_vsic_2018,
+        excel_handler=excel_handler
+    )
+
+
+async def aprepare_route(
+    input_dict,
+    llm,
+    lang_llm,
+    retriever,
+    retriever_vsic_2018=None,
+    excel_handler=None
+) -> PreparedAnswer:
+    """Giống aroute_message nhưng dừng trước lần gọi LLM cuối (cho /chat/stream)."""
+    message = input_dict["message"]
+
+    # Hết ngân sách thời gian → bỏ qua tra DB, chạy tiếp RAG
+    law_response = await within(ahandle_law_article_query(message), "law_article_db", fallback=None)
+    if law_response:
+        return PreparedAnswer(route="law_article", text=law_response)
+
+    return await aprepare_answer(
+        input_dict,
+        llm=llm,
+        lang_llm=lang_llm,
+        retriever=retriever,
+        retriever_vsic_2018=retriever_vsic_2018,
         excel_handler=excel_handler
     )
@@ -7,27 +7,44 @@ import uvicorn
 from typing import Optional, Any, Dict, List
 from pathlib import Path
 import json
-import inspect
+import time
+import base64
 
+from fastapi.responses import StreamingResponse, Response
 from starlette.concurrency import run_in_threadpool
 
+from monitoring import metrics
+from data_processing.pipeline import astream_answer, TIMEOUT_VI
+from data_processing.deadline import deadline_scope, within
+
 # --- IMPORT MODULES CŨ ---
-from mst.router import is_mst_query
-from mst.handler import handle_mst_query
-from law_db_query.handler import handle_law_count_query
+from mst.handler import ahandle_mst_query
+from law_db_query.handler import ahandle_law_count_query, ahandle_law_article_query
+from serving.singleflight import SingleFlight, coalesce_key
+from serving.batch import run_bounded
+from serving.responses import FastJSONResponse, dumps as json_dumps
+from serving.compression import CompressionMiddleware
+from serving.admission import AdmissionController, AdmissionRejected
+from starlette.background import BackgroundTask
+from data_processing.cleaning import clean_question_remove_uris
+from data_processing.intent import classify, API_ROUTE_PRIORITY
+from data_processing.language import SESSION_LANGUAGES
 
 try:
-    # ⚠️ Import cả biến CHART_STORE từ file tools
     from iz_agent.agent import agent_executor as iz_executor
-    from iz_agent.tools import CHART_STORE 
     
     iz_executor.return_intermediate_steps = True 
     IZ_AGENT_AVAILABLE = True
 except ImportError:
     iz_executor = None
-    CHART_STORE = {}
     IZ_AGENT_AVAILABLE = False
 
+# Kho ảnh biểu đồ (dùng chung với iz_agent.tools) — phục vụ qua GET /charts/{id}
+from iz_agent.chart_store import get_chart_store, is_valid_chart_id
+CHART_STORE = get_chart_store()
+# Trả thêm ảnh base64 trong JSON /chat (client cũ) — mặc định chỉ trả chart_url
+CHART_INLINE_BASE64 = os.getenv("CHART_INLINE_BASE64", "0") == "1"
+
 # ===============================
 # Import Chatbot từ app.py
 # ===============================
@@ -41,21 +58,6 @@ except ImportError as e:
     print(f"⚠️ Could not import 'app' module. Error: {e}")
 
 
-# ===============================
-# Helper: Router nhận diện câu hỏi KCN
-# ===============================
-def is_iz_agent_query(message: str) -> bool:
-    """Kiểm tra xem câu hỏi có liên quan đến BĐS Công Nghiệp (KCN/CCN) không"""
-    keywords = [
-        "kcn", "ccn", "khu công nghiệp", "cụm công nghiệp",
-        "giá thuê", "giá đất", "diện tích", "biểu đồ", "so sánh", 
-        "mật độ", "tỷ lệ lấp đầy", "chủ đầu tư", "vẽ biểu đồ",
-        "danh sách", "liệt kê", "bao nhiêu", "ở đâu"
-    ]
-    msg = message.lower()
-    return any(k in msg for k in keywords)
-
-
 # ===============================
 # Helper: parse JSON string từ pipeline
 # ===============================
@@ -73,6 +75,84 @@ def try_parse_json_string(s: Any):
     return None
 
 
+# ===============================
+# Helper: chạy IZ Agent + gom payload của tool
+# ===============================
+async def run_iz_agent(question: str) -> Dict[str, Any]:
+    try:
+        # GỌI AGENT (không cần lịch sử chat)
+        # ainvoke: LLM gọi async, tool pandas được LangChain đẩy sang executor
+        iz_result = await iz_executor.ainvoke(
+            {"input": question, "chat_history": []}
+        )
+
+        final_output = iz_result.get("output", "")
+        
+        # Duyệt qua các bước chạy của Tool
+        for action, output in iz_result.get("intermediate_steps", []):
+            if isinstance(output, dict):
+                output_type = output.get("type")
+                
+                # Xử lý flexible search tool (có biểu đồ)
+                if output_type == "excel_visualize_with_data":
+                    chart_id = output.get("chart_id")
+                    chart_url = None
+                    chart_base64 = None
+
+                    if chart_id:
+                        chart_url = f"/charts/{chart_id}"
+                        # LLM đôi khi nhắc tới chart_id trong câu trả lời → đổi thành URL
+                        if chart_id in final_output:
+                            final_output = final_output.replace(chart_id, chart_url)
+                        if CHART_INLINE_BASE64:
+                            png = CHART_STORE.get(chart_id)
+                            chart_base64 = base64.b64encode(png).decode("utf-8") if png else None
+
+                    # Trả về answer + chart URL + data
+                    return {
+                        "answer": final_output,
+                        "chart_url": chart_url,
+                        "chart_base64": chart_base64,
+                        "data": output.get("data", []),
+                        "province": output.get("province"),
+                        "count": output.get("count"),
+                        "total_found": output.get("total_found")
+                    }
+                
+                # Xử lý single zone tool (có coordinates)
+                elif output_type == "single_zone_info":
+                    return {
+                        "answer": final_output,
+                        "zone_data": output.get("data", {}),
+                        "coordinates": output.get("coordinates")
+                    }
+                
+                # Xử lý multiple choices
+                elif output_type == "multiple_choices":
+                    return {
+                        "answer": output.get("message", final_output),
+                        "choices": output.get("choices", []),
+                        "total_found": output.get("total_found")
+                    }
+                
+                # Xử lý error
+                elif output_type == "error":
+                    return {
+                        "answer": output.get("message", "Đã xảy ra lỗi"),
+                        "error": True
+                    }
+        
+        # Không có tool payload - trả về text thuần
+        return {"answer": final_output}
+
+    except Exception as e:
+        print(f"❌ IZ Agent Error: {e}")
+        return {
+            "answer": "Đã xảy ra lỗi khi xử lý câu hỏi. Vui lòng thử lại.",
+            "error": True
+        }
+
+
 # ===============================
 # Lấy các hằng số từ app.py
 # ===============================
@@ -105,6 +185,11 @@ class Question(BaseModel):
     session_id: Optional[str] = "default_session"  # Đã thêm session_id
 
 
+class BatchQuestions(BaseModel):
+    questions: List[str]
+    concurrency: Optional[int] = None  # số câu xử lý đồng thời (mặc định BATCH_CONCURRENCY)
+
+
 class ContactInfo(BaseModel):
     original_question: str
     phone: str
@@ -117,7 +202,8 @@ class ContactInfo(BaseModel):
 app_fastapi = FastAPI(
     title="Chatbot Luật Lao động API",
     description="API cho mô hình chatbot",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=FastJSONResponse
 )
 
 app_fastapi.add_middleware(
@@ -128,6 +214,12 @@ app_fastapi.add_middleware(
     allow_headers=["*"],
 )
 
+# Nén gzip / brotli cho response lớn (bỏ qua stream + ảnh)
+app_fastapi.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_BYTES", "1024")),
+)
+
 # ---------------------------------------
 # 2️⃣ Route kiểm tra hoạt động (GET /)
 # ---------------------------------------
@@ -136,7 +228,7 @@ async def home():
     vectordb_status = "Unknown"
     if CHATBOT_AVAILABLE:
         try:
-            stats = app.get_vectordb_stats()
+            stats = await app.aget_vectordb_stats()
             vectordb_status = f"Ready ({stats.get('total_documents', 0)} docs)" if stats.get("exists") else "Empty"
         except Exception as e:
             vectordb_status = f"Error: {str(e)}"
@@ -152,171 +244,439 @@ async def home():
 # ---------------------------------------
 # 3️⃣ Route chính: /chat (POST)
 # ---------------------------------------
-@app_fastapi.post("/chat", summary="Trả lời câu hỏi từ Chatbot")
-async def predict(data: Question, request: Request):
-    question = (data.question or "").strip()
-    if not question:
-        return {"answer": "Câu hỏi bị rỗng.", "error": True}
+# Các route có lần gọi chatbot (RAG) → cần lịch sử hội thoại của session
+CHATBOT_ROUTES = {"law_count", "rag"}
+
+# Gom các request /chat trùng nhau đang chạy đồng thời
+chat_singleflight = SingleFlight()
+
+# Giới hạn tải cho /chat + /chat/stream (dùng chung 1 bộ đếm)
+chat_admission = AdmissionController(
+    max_in_flight=int(os.getenv("CHAT_MAX_IN_FLIGHT", "32")),
+    max_queue=int(os.getenv("CHAT_MAX_QUEUE", "64")),
+    queue_timeout=float(os.getenv("CHAT_QUEUE_TIMEOUT_SECONDS", "30")),
+    per_session=int(os.getenv("CHAT_MAX_PER_SESSION", "1")),
+)
 
+
+async def admit_chat(session_id: Optional[str]):
+    """Xin slot xử lý; hết chỗ → 429 + Retry-After."""
     try:
+        return await chat_admission.acquire(session_id)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Hệ thống đang quá tải, vui lòng thử lại sau ({e.reason}).",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+# Ngân sách thời gian cho 1 câu hỏi (mọi bước: ngôn ngữ, follow-up, retrieval, LLM, dịch)
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "45"))
+TIMEOUT_RESULT = {"answer": TIMEOUT_VI, "error": True, "timeout": True}
 
-        # ===============================
-        # 0️⃣ LAW COUNT – SQL FIRST
-        # ===============================
-        payload = handle_law_count_query(question)
-        if isinstance(payload, dict) and payload.get("intent") == "law_count":
-            if not CHATBOT_AVAILABLE:
-                return {"answer": "Backend chưa sẵn sàng.", "error": True}
-
-            response = await run_in_threadpool(
-                app.chatbot.invoke,
-                {"message": question, "law_count": payload["total_laws"]},
-                config={"configurable": {"session_id": data.session_id}} # Truyền config ở đây
+
+def resolve_route(question: str) -> str:
+    """Thứ tự ưu tiên: LAW COUNT → MST → IZ AGENT → RAG (1 lần quét, xem data_processing/intent.py)"""
+    priority = API_ROUTE_PRIORITY if IZ_AGENT_AVAILABLE else tuple(
+        r for r in API_ROUTE_PRIORITY if r != "iz_agent"
+    )
+    return classify(question).first(priority) or "rag"
+
+
+async def compute_answer(
+    route: str,
+    question: str,
+    history_messages: List,
+    query_vector: Optional[List[float]] = None,
+    session_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Tính câu trả lời cho 1 route. KHÔNG ghi lịch sử hội thoại (phần đó làm riêng
+    cho từng request trong predict) để kết quả có thể dùng chung khi gom request.
+    Field "_record_history" cho biết câu trả lời có cần lưu vào lịch sử không.
+    query_vector: embedding câu hỏi (đã bỏ URL) tính sẵn — /chat/batch embed cả lô 1 lần.
+    session_id: để pipeline dùng / ghi nhớ ngôn ngữ của session (không đọc lịch sử).
+    """
+    # ===============================
+    # 0️⃣ LAW COUNT – SQL FIRST
+    # ===============================
+    if route == "law_count":
+        if not CHATBOT_AVAILABLE:
+            return {"answer": "Backend chưa sẵn sàng.", "error": True}
+
+        payload = await ahandle_law_count_query(question)
+        response = await app.pdf_chain.ainvoke(
+            {"message": question, "law_count": payload["total_laws"], "history": history_messages,
+             "session_id": session_id}
+        )
+        return {"answer": response, "_record_history": True}
+
+    # ===============================
+    # 1️⃣ MST INTENT (Tra cứu Mã số thuế)
+    # ===============================
+    if route == "mst":
+        if not CHATBOT_AVAILABLE:
+            return {"answer": "Backend chưa sẵn sàng.", "error": True}
+
+        mst_answer = await within(ahandle_mst_query(
+            message=question,
+            llm=app.llm,
+            embedding=app.emb,
+            # MST embed câu gốc → chỉ dùng lại vector khi câu hỏi không có URL
+            query_vector=query_vector if clean_question_remove_uris(question) == question else None
+        ), "mst", fallback=None)
+        if mst_answer is None:
+            return dict(TIMEOUT_RESULT)
+        return {"answer": mst_answer}
+
+    # ===============================
+    # 2️⃣ IZ AGENT (XỬ LÝ ẢNH THÔNG MINH)
+    # ===============================
+    if route == "iz_agent":
+        return await within(run_iz_agent(question), "iz_agent", fallback=dict(TIMEOUT_RESULT))
+
+    # ===============================
+    # 3️⃣ FALLBACK: CHATBOT THƯỜNG (RAG PDF)
+    # ===============================
+    if CHATBOT_AVAILABLE and hasattr(app, "pdf_chain"):
+        try:
+            # Kiểm tra điều luật cụ thể trước (hết giờ → bỏ qua, chạy RAG)
+            law_article_response = await within(
+                ahandle_law_article_query(question), "law_article_db", fallback=None
             )
-            
-            return {"answer": response}
-
-        # ===============================
-        # 1️⃣ MST INTENT (Tra cứu Mã số thuế)
-        # ===============================
-        if is_mst_query(question):
-            if not CHATBOT_AVAILABLE:
-                return {"answer": "Backend chưa sẵn sàng.", "error": True}
-
-            mst_answer = await run_in_threadpool(
-                handle_mst_query,
-                message=question,
-                llm=app.llm,
-                embedding=app.emb
+            if law_article_response:
+                return {"answer": law_article_response}
+
+            # ainvoke → app.apdf_dispatch (LLM/Qdrant/Postgres async end-to-end)
+            response = await app.pdf_chain.ainvoke(
+                {"message": question, "history": history_messages, "query_vector": query_vector,
+                 "session_id": session_id}
             )
-            return {"answer": mst_answer}
-            
-        # ===============================
-        # 2️⃣ IZ AGENT (XỬ LÝ ẢNH THÔNG MINH)
-        # ===============================
-        if IZ_AGENT_AVAILABLE and is_iz_agent_query(question):
-            try:
-                # GỌI AGENT (không cần lịch sử chat)
-                iz_result = await run_in_threadpool(
-                    iz_executor.invoke,
-                    {"input": question, "chat_history": []}
-                )
 
-                final_output = iz_result.get("output", "")
-                
-                # Duyệt qua các bước chạy của Tool
-                for action, output in iz_result.get("intermediate_steps", []):
-                    if isinstance(output, dict):
-                        output_type = output.get("type")
-                        
-                        # Xử lý flexible search tool (có biểu đồ)
-                        if output_type == "excel_visualize_with_data":
-                            chart_id = output.get("chart_id")
-                            
-                            if chart_id and chart_id in CHART_STORE:
-                                real_base64 = CHART_STORE[chart_id]
-                                output["chart_base64"] = real_base64
-
-                                if chart_id in final_output:
-                                    final_output = final_output.replace(chart_id, real_base64)
-                            # Trả về answer + chart base64 + data
-                            return {
-                                "answer": final_output,
-                                "chart_base64": output.get("chart_base64"),
-                                "data": output.get("data", []),
-                                "province": output.get("province"),
-                                "count": output.get("count"),
-                                "total_found": output.get("total_found")
-                            }
-                        
-                        # Xử lý single zone tool (có coordinates)
-                        elif output_type == "single_zone_info":
-                            return {
-                                "answer": final_output,
-                                "zone_data": output.get("data", {}),
-                                "coordinates": output.get("coordinates")
-                            }
-                        
-                        # Xử lý multiple choices
-                        elif output_type == "multiple_choices":
-                            return {
-                                "answer": output.get("message", final_output),
-                                "choices": output.get("choices", []),
-                                "total_found": output.get("total_found")
-                            }
-                        
-                        # Xử lý error
-                        elif output_type == "error":
-                            return {
-                                "answer": output.get("message", "Đã xảy ra lỗi"),
-                                "error": True
-                            }
-                
-                # Không có tool payload - trả về text thuần
-                return {"answer": final_output}
-
-            except Exception as e:
-                print(f"❌ IZ Agent Error: {e}")
-                return {
-                    "answer": "Đã xảy ra lỗi khi xử lý câu hỏi. Vui lòng thử lại.",
-                    "error": True
-                }
-
-        # ===============================
-        # 3️⃣ FALLBACK: CHATBOT THƯỜNG (RAG PDF)
-        # ===============================
-        if CHATBOT_AVAILABLE and hasattr(app, "chatbot"):
-            try:
-                # Kiểm tra điều luật cụ thể trước
-                from law_db_query.handler import handle_law_article_query
-                law_article_response = handle_law_article_query(question)
-                if law_article_response:
-                    return {"answer": law_article_response}
-                
-                config_data = {"configurable": {"session_id": data.session_id}}
-                
-                if inspect.iscoroutinefunction(app.chatbot.invoke):
-                    response = await app.chatbot.invoke({"message": question}, config=config_data)
-                else:
-                    response = await run_in_threadpool(
-                        app.chatbot.invoke,
-                        {"message": question},
-                        config=config_data # Truyền config ở đây
-                    )
-
-                # Xử lý kết quả trả về
-                if isinstance(response, dict) and "output" in response:
-                    answer = response["output"]
-                elif isinstance(response, str):
-                    answer = response
-                else:
-                    answer = str(response)
-
-                # Kiểm tra nếu cần liên hệ
-                requires_contact = False
-                if answer and answer.strip() == CONTACT_TRIGGER_RESPONSE.strip():
-                    requires_contact = True
-                
-                return {
-                    "answer": answer,
-                    "requires_contact": requires_contact
-                }
-
-            except Exception as e:
-                print(f"❌ Chatbot Invoke Error: {e}")
-                return {
-                    "answer": "Xin lỗi, hệ thống đang gặp sự cố gián đoạn.",
-                    "error": True
-                }
-        else:
+            # Xử lý kết quả trả về
+            if isinstance(response, dict) and "output" in response:
+                answer = response["output"]
+            elif isinstance(response, str):
+                answer = response
+            else:
+                answer = str(response)
+
+            # Kiểm tra nếu cần liên hệ
+            requires_contact = False
+            if answer and answer.strip() == CONTACT_TRIGGER_RESPONSE.strip():
+                requires_contact = True
+
+            return {
+                "answer": answer,
+                "requires_contact": requires_contact,
+                "_record_history": True
+            }
+
+        except Exception as e:
+            print(f"❌ Chatbot Invoke Error: {e}")
             return {
-                "answer": "Hệ thống đang bảo trì (Backend unavailable).",
+                "answer": "Xin lỗi, hệ thống đang gặp sự cố gián đoạn.",
                 "error": True
             }
+    else:
+        return {
+            "answer": "Hệ thống đang bảo trì (Backend unavailable).",
+            "error": True
+        }
+
+
+@app_fastapi.post("/chat", summary="Trả lời câu hỏi từ Chatbot")
+async def predict(data: Question, request: Request):
+    question = (data.question or "").strip()
+    if not question:
+        return {"answer": "Câu hỏi bị rỗng.", "error": True}
+
+    ticket = await admit_chat(data.session_id)
+    try:
+        route = resolve_route(question)
+
+        history = None
+        history_messages = []
+        if CHATBOT_AVAILABLE and route in CHATBOT_ROUTES:
+            history = app.get_history(data.session_id)
+            history_messages = history.messages
+
+        # Câu trả lời chỉ dùng chung được khi không phụ thuộc lịch sử của session.
+        # Ngôn ngữ đã nhớ của session quyết định ngôn ngữ trả lời → nằm trong key
+        key = coalesce_key(
+            question,
+            route,
+            lang=SESSION_LANGUAGES.get(data.session_id) or "auto",
+            history_owner=data.session_id if history_messages else None
+        )
+        # Task của singleflight được tạo trong scope → mang theo deadline
+        with deadline_scope(CHAT_DEADLINE_SECONDS):
+            result, shared = await chat_singleflight.do(
+                key,
+                lambda: compute_answer(route, question, history_messages, session_id=data.session_id)
+            )
+        if shared:
+            metrics.counter("chat_coalesced_total").inc(label=route)
+
+        # Ghi lịch sử: luôn riêng cho từng request / session
+        if history is not None and result.get("_record_history"):
+            history.add_user_message(question)
+            history.add_ai_message(str(result.get("answer", "")))
+
+        # Trả thẳng response: bỏ qua jsonable_encoder của FastAPI (chậm với payload lớn)
+        return FastJSONResponse({k: v for k, v in result.items() if not k.startswith("_")})
 
     except Exception as e:
         print(f"❌ Lỗi API: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        ticket.release()
+
+
+# ---------------------------------------
+# 3️⃣.1 Route: /chat/stream (Server-Sent Events)
+# ---------------------------------------
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json_dumps(data).decode('utf-8')}\n\n"
+
+
+async def _stream_chat(data: Question):
+    """
+    Thứ tự event:
+    - meta  : route + sources (gửi ngay khi xác định xong, trước khi LLM sinh chữ)
+    - delta : từng đoạn token của lần gọi LLM cuối
+    - done  : câu trả lời đầy đủ + các field phụ (giống /chat); degraded=true khi bước dịch lỗi
+              (answer = bản tiếng Việt đầy đủ, client hiển thị thay cho các delta đã nhận)
+    - error : lỗi
+    """
+    question = (data.question or "").strip()
+    t_start = time.perf_counter()
+
+    if not question:
+        yield _sse("done", {"answer": "Câu hỏi bị rỗng.", "error": True})
+        return
+
+    if not CHATBOT_AVAILABLE:
+        yield _sse("done", {"answer": "Backend chưa sẵn sàng.", "error": True})
+        return
+
+    route = "unknown"
+    try:
+        with deadline_scope(CHAT_DEADLINE_SECONDS):
+            # ---- 0️⃣ LAW COUNT / 1️⃣ MST / 2️⃣ IZ AGENT: giống thứ tự của /chat ----
+            route = resolve_route(question)
+
+            if route == "mst":
+                yield _sse("meta", {"route": route, "sources": []})
+                answer = await within(
+                    ahandle_mst_query(message=question, llm=app.llm, embedding=app.emb), "mst", fallback=TIMEOUT_VI
+                )
+                _observe_ttft(route, t_start)
+                yield _sse("delta", {"text": answer})
+                yield _sse("done", {"answer": answer})
+                return
+
+            if route == "iz_agent":
+                yield _sse("meta", {"route": route, "sources": []})
+                result = await within(run_iz_agent(question), "iz_agent", fallback=dict(TIMEOUT_RESULT))
+                _observe_ttft(route, t_start)
+                yield _sse("delta", {"text": result.get("answer", "")})
+                yield _sse("done", result)
+                return
+
+            # ---- 3️⃣ RAG / VSIC / LAW COUNT / FOLLOW-UP: stream lần gọi LLM cuối ----
+            history = app.get_history(data.session_id)
+            i = {"message": question, "history": history.messages, "session_id": data.session_id}
+            if route == "law_count":
+                payload = await ahandle_law_count_query(question)
+                i["law_count"] = payload["total_laws"]
+
+            prepared = await app.apdf_prepare(i)
+            route = prepared.route
+            yield _sse("meta", {"route": route, "sources": prepared.sources})
+
+            parts = []
+            async for piece in astream_answer(prepared, llm=app.llm, lang_llm=app.lang_llm):
+                if not parts:
+                    _observe_ttft(route, t_start)
+                parts.append(piece)
+                yield _sse("delta", {"text": piece})
+
+            # Dịch lỗi giữa chừng → lịch sử + done lưu bản tiếng Việt đầy đủ, không phải phần dịch dở
+            answer = prepared.degraded_text or "".join(parts)
+            history.add_user_message(question)
+            history.add_ai_message(answer)
+
+            requires_contact = bool(answer) and answer.strip() == CONTACT_TRIGGER_RESPONSE.strip()
+            done = {"answer": answer, "route": route, "requires_contact": requires_contact}
+            if prepared.degraded_text is not None:
+                done["degraded"] = True
+            yield _sse("done", done)
+
+    except Exception as e:
+        print(f"❌ Stream Error ({route}): {e}")
+        yield _sse("error", {"answer": "Xin lỗi, hệ thống đang gặp sự cố gián đoạn.", "error": True})
+
+
+def _observe_ttft(route: str, t_start: float):
+    metrics.summary("chat_stream_ttft_seconds").observe(time.perf_counter() - t_start, label=route)
+
+
+async def _release_after(stream, ticket):
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        ticket.release()
+
+
+@app_fastapi.post("/chat/stream", summary="Trả lời câu hỏi dạng stream (SSE)")
+async def predict_stream(data: Question):
+    # Giữ slot tới khi stream kết thúc; background là lưới an toàn nếu stream
+    # chưa kịp chạy mà client đã ngắt (release gọi 2 lần vẫn an toàn)
+    ticket = await admit_chat(data.session_id)
+    return StreamingResponse(
+        _release_after(_stream_chat(data), ticket),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # tắt buffer của nginx
+        },
+        background=BackgroundTask(ticket.release),
+    )
+
+
+# ---------------------------------------
+# 3️⃣.2 Route: /chat/batch (NDJSON)
+# ---------------------------------------
+# Back office gửi lô 50–500 câu
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+
+
+async def _embed_batch(questions: List[str]) -> List[Optional[List[float]]]:
+    """1 lần gọi embeddings API cho cả lô (thay vì N lần aembed_query)."""
+    try:
+        texts = [clean_question_remove_uris(q) for q in questions]
+        return await app.emb.aembed_documents(texts)
+    except Exception as e:
+        # Không chặn cả lô: từng câu tự embed như /chat
+        print(f"⚠️ Batch embedding lỗi, fallback embed từng câu: {e}")
+        return [None] * len(questions)
+
+
+async def _stream_batch(questions: List[str], concurrency: int, ticket=None):
+    """
+    Mỗi dòng NDJSON = kết quả 1 câu, gửi ngay khi câu đó xong (thứ tự hoàn thành).
+    "index" là vị trí câu hỏi trong request để client ghép lại.
+    Các câu hỏi độc lập: không dùng / không ghi lịch sử hội thoại.
+
+    Mỗi câu giữ 1 slot của chat_admission khi đang xử lý (dùng chung giới hạn với /chat).
+    ticket: slot đã xin trước khi trả 200 (dùng cho câu đầu tiên). Câu không xin được slot
+    → dòng lỗi có "retry_after", các câu khác vẫn chạy.
+    """
+    t_start = time.perf_counter()
+    todo = [(idx, q.strip()) for idx, q in enumerate(questions) if (q or "").strip()]
+
+    # Câu rỗng trả lời ngay, không chiếm slot
+    for idx, q in enumerate(questions):
+        if not (q or "").strip():
+            yield _ndjson({"index": idx, "question": q, "answer": "Câu hỏi bị rỗng.", "error": True})
+
+    vectors = await _embed_batch([q for _, q in todo]) if todo else []
+
+    spare = [ticket] if ticket is not None else []
+
+    async def _answer(pos: int, item):
+        idx, question = item
+        try:
+            slot = spare.pop() if spare else await chat_admission.acquire(None)
+        except AdmissionRejected as e:
+            metrics.counter("chat_batch_questions_total").inc(label="rejected")
+            return {
+                "index": idx,
+                "question": question,
+                "answer": f"Hệ thống đang quá tải, vui lòng thử lại sau ({e.reason}).",
+                "error": True,
+                "retry_after": e.retry_after,
+            }
+
+        route = "unknown"
+        try:
+            route = resolve_route(question)
+            # Mỗi câu có ngân sách riêng, tính từ lúc được xử lý (không tính thời gian chờ slot)
+            with deadline_scope(CHAT_DEADLINE_SECONDS):
+                result = await compute_answer(route, question, [], query_vector=vectors[pos])
+        except Exception as e:
+            print(f"❌ Batch Error ({route}): {e}")
+            result = {"answer": "Xin lỗi, hệ thống đang gặp sự cố gián đoạn.", "error": True}
+        finally:
+            slot.release()
+        metrics.counter("chat_batch_questions_total").inc(label=route)
+        body = {k: v for k, v in result.items() if not k.startswith("_")}
+        return {"index": idx, "question": question, "route": route, **body}
+
+    try:
+        async for _, line in run_bounded(todo, _answer, concurrency):
+            yield _ndjson(line)
+    finally:
+        # Lô toàn câu rỗng / client ngắt trước khi câu đầu chạy
+        for slot in spare:
+            slot.release()
+
+    metrics.summary("chat_batch_seconds").observe(time.perf_counter() - t_start)
+
+
+def _ndjson(data: Dict[str, Any]) -> str:
+    return json_dumps(data).decode("utf-8") + "\n"
+
+
+@app_fastapi.post("/chat/batch", summary="Trả lời nhiều câu hỏi (NDJSON, xong câu nào gửi câu đó)")
+async def predict_batch(data: BatchQuestions):
+    if not CHATBOT_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Backend chưa sẵn sàng.")
+    if not data.questions:
+        raise HTTPException(status_code=400, detail="Danh sách câu hỏi bị rỗng.")
+    if len(data.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Tối đa {BATCH_MAX_QUESTIONS} câu hỏi mỗi request."
+        )
+
+    concurrency = min(data.concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    # Quá tải → 429 + Retry-After ngay, trước khi bắt đầu stream
+    ticket = await admit_chat(None)
+    return StreamingResponse(
+        _stream_batch(data.questions, concurrency, ticket),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"},
+        # Stream chưa kịp chạy mà client đã ngắt (release gọi 2 lần vẫn an toàn)
+        background=BackgroundTask(ticket.release),
+    )
+
+
+# ---------------------------------------
+# 3️⃣.3 Route: /charts/{chart_id} (ảnh PNG của biểu đồ)
+# ---------------------------------------
+@app_fastapi.get("/charts/{chart_id}", summary="Ảnh biểu đồ (image/png)")
+async def get_chart(chart_id: str, request: Request):
+    if not is_valid_chart_id(chart_id):
+        raise HTTPException(status_code=404, detail="Không tìm thấy biểu đồ.")
+
+    # Ảnh theo id không bao giờ thay đổi → ETag = id, cache được tới hết TTL
+    headers = {
+        "ETag": f'"{chart_id}"',
+        "Cache-Control": f"private, max-age={int(CHART_STORE.ttl_seconds)}, immutable",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    png = await run_in_threadpool(CHART_STORE.get, chart_id)
+    if png is None:
+        raise HTTPException(status_code=404, detail="Biểu đồ không tồn tại hoặc đã hết hạn.")
+    return Response(content=png, media_type="image/png", headers=headers)
 
 
 # ---------------------------------------
@@ -339,9 +699,19 @@ async def submit_contact(data: ContactInfo):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ---------------------------------------
+# 5️⃣ Route: /metrics
+# ---------------------------------------
+@app_fastapi.get("/metrics", summary="Số liệu vận hành (TTFT, cache, hàng đợi...)")
+async def get_metrics():
+    return metrics.snapshot()
+
+
 # ---------------------------------------
 # Run server
+# Dev: python main.py (1 process, auto reload)
+# Production: gunicorn -c gunicorn.conf.py main:app_fastapi
 # ---------------------------------------
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("main:app_fastapi", host="0.0.0.0", port=port, log_level="info", reload=True)
\ No newline at end of file
+    uvicorn.run("main:app_fastapi", host="0.0.0.0", port=port, log_level="info", reload=True)
@@ -0,0 +1,129 @@
+# monitoring/metrics.py
+"""
+Metrics in-process đơn giản (không phụ thuộc Prometheus).
+Mỗi metric có thể tách theo 1 nhãn (vd: route, collection, stage).
+Xem toàn bộ qua GET /metrics của main.py.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict
+
+_lock = threading.Lock()
+
+
+class Counter:
+    def __init__(self, name: str):
+        self.name = name
+        self._values = defaultdict(float)
+
+    def inc(self, label: str = "", amount: float = 1):
+        with _lock:
+            self._values[label] += amount
+
+    def get(self, label: str = "") -> float:
+        return self._values.get(label, 0)
+
+    def snapshot(self) -> Dict:
+        return dict(self._values)
+
+
+class Gauge:
+    def __init__(self, name: str):
+        self.name = name
+        self._values = defaultdict(float)
+
+    def set(self, value: float, label: str = ""):
+        with _lock:
+            self._values[label] = value
+
+    def inc(self, label: str = "", amount: float = 1):
+        with _lock:
+            self._values[label] += amount
+
+    def dec(self, label: str = "", amount: float = 1):
+        self.inc(label, -amount)
+
+    def get(self, label: str = "") -> float:
+        return self._values.get(label, 0)
+
+    def snapshot(self) -> Dict:
+        return dict(self._values)
+
+
+class Summary:
+    """Lưu N quan sát gần nhất để tính p50/p95/p99 (đơn vị tùy metric, thường là giây)."""
+
+    def __init__(self, name: str, window: int = 1000):
+        self.name = name
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._count = defaultdict(int)
+        self._sum = defaultdict(float)
+
+    def observe(self, value: float, label: str = ""):
+        with _lock:
+            self._samples[label].append(value)
+            self._count[label] += 1
+            self._sum[label] += value
+
+    def snapshot(self) -> Dict:
+        out = {}
+        with _lock:
+            for label, samples in self._samples.items():
+                ordered = sorted(samples)
+                if not ordered:
+                    continue
+                out[label] = {
+                    "count": self._count[label],
+                    "avg": self._sum[label] / self._count[label],
+                    "p50": _percentile(ordered, 0.50),
+                    "p95": _percentile(ordered, 0.95),
+                    "p99": _percentile(ordered, 0.99),
+                }
+        return out
+
+
+def _percentile(ordered, q: float) -> float:
+    idx = min(len(ordered) - 1, int(len(ordered) * q))
+    return ordered[idx]
+
+
+# ===================== REGISTRY =====================
+_registry: Dict[str, object] = {}
+
+
+def _get_or_create(name: str, cls):
+    with _lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = cls(name)
+            _registry[name] = metric
+    return metric
+
+
+def counter(name: str) -> Counter:
+    return _get_or_create(name, Counter)
+
+
+def gauge(name: str) -> Gauge:
+    return _get_or_create(name, Gauge)
+
+
+def summary(name: str) -> Summary:
+    return _get_or_create(name, Summary)
+
+
+@contextmanager
+def timer(name: str, label: str = ""):
+    """Đo thời gian (giây) của đoạn code bên trong vào summary `name`"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        summary(name).observe(time.perf_counter() - t0, label=label)
+
+
+def snapshot() -> Dict:
+    return {name: m.snapshot() for name, m in sorted(_registry.items())}
@@ -4,50 +4,34 @@ import os
 # from langchain_pinecone import Pinecone
 
 # QDRANT (MỚI)
-from qdrant_client import QdrantClient
-from langchain_qdrant import QdrantVectorStore
 from langchain_openai import OpenAIEmbeddings
+from vectordb.registry import get_registry
 
 
 def load_vsic_2018_retriever(embedding: OpenAIEmbeddings):
     """
-    Load Qdrant retriever cho VSIC 2018 (Mã ngành 2018)
+    Load Qdrant retriever cho VSIC 2018 (Mã ngành 2018), dùng client chung của registry
     """
     # ===== QDRANT (MỚI) =====
-    qdrant_url = os.getenv("QDRANT_URL")
     index_name = os.getenv("QDRANT_COLLECTION_NAME_MSN_2018", "masonganh")
 
-    if not qdrant_url:
+    registry = get_registry()
+    if registry is None:
         raise RuntimeError("Thiếu cấu hình QDRANT_URL cho VSIC 2018")
 
-    try:
-        client = QdrantClient(
-            url=qdrant_url,
-            api_key=None,
-            timeout=60
-        )
-    except Exception as e:
-        raise RuntimeError(f"Lỗi kết nối Qdrant VSIC 2018: {e}")
-
-    if not client.collection_exists(index_name):
+    collection_info = registry.collection_info(index_name, refresh=True)
+    if collection_info.error:
+        raise RuntimeError(f"Lỗi kết nối Qdrant VSIC 2018: {collection_info.error}")
+    if not collection_info.exists:
         raise RuntimeError(f"Qdrant collection VSIC 2018 '{index_name}' không tồn tại")
 
-    collection_info = client.get_collection(index_name)
-    
     if collection_info.points_count == 0:
         print(f"⚠️ Qdrant collection VSIC 2018 '{index_name}' đang rỗng (0 documents)")
         # Vẫn trả về retriever để có thể test
     else:
         print(f"✅ Qdrant collection VSIC 2018 '{index_name}' có {collection_info.points_count} documents")
 
-    vectordb = QdrantVectorStore(
-        client=client,
-        collection_name=index_name,
-        embedding=embedding,
-    )
-
-    retriever = vectordb.as_retriever(search_kwargs={"k": 10})
-    return retriever
+    return registry.live_retriever(index_name, embedding, k=10)
 
     # ===== PINECONE (COMMENTED) =====
     # pinecone_api_key = os.getenv("PINECONE_API_KEY")
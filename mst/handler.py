@@ -1,23 +1,48 @@
 from langchain_core.messages import SystemMessage, HumanMessage
-from mst.retriever import get_mst_retriever
+from mst.retriever import get_mst_retriever, aget_mst_retriever
 from system_prompts.mst_system import MST_SYSTEM_PROMPT
 
-def handle_mst_query(message: str, llm, embedding):
-    retriever = get_mst_retriever(embedding)
-    if retriever is None:
-        return "Hệ thống tra cứu mã số thuế chưa sẵn sàng."
+NOT_READY_MSG = "Hệ thống tra cứu mã số thuế chưa sẵn sàng."
+NOT_FOUND_MSG = "Hệ thống hiện không có thông tin mã số thuế phù hợp với yêu cầu."
 
-    docs = retriever.get_relevant_documents(message)
-    if not docs:
-        return "Hệ thống hiện không có thông tin mã số thuế phù hợp với yêu cầu."
 
+def _build_messages(message: str, docs):
     context = "\n\n".join(d.page_content for d in docs)
 
-    messages = [
+    return [
         SystemMessage(content=MST_SYSTEM_PROMPT),
         HumanMessage(
             content=f"Dữ liệu:\n{context}\n\nCâu hỏi: {message}"
         )
     ]
 
-    return llm.invoke(messages).content
+
+def handle_mst_query(message: str, llm, embedding):
+    retriever = get_mst_retriever(embedding)
+    if retriever is None:
+        return NOT_READY_MSG
+
+    docs = retriever.invoke(message)
+    if not docs:
+        return NOT_FOUND_MSG
+
+    return llm.invoke(_build_messages(message, docs)).content
+
+
+async def ahandle_mst_query(message: str, llm, embedding, query_vector=None):
+    """
+    Bản async của handle_mst_query (dùng cho /chat).
+    query_vector: embedding của message đã tính sẵn (vd: /chat/batch) → bỏ qua bước embed.
+    """
+    retriever = await aget_mst_retriever(embedding)
+    if retriever is None:
+        return NOT_READY_MSG
+
+    if query_vector is not None:
+        docs = await retriever.asearch_by_vector(query_vector, query_text=message)
+    else:
+        docs = await retriever.ainvoke(message)
+    if not docs:
+        return NOT_FOUND_MSG
+
+    return (await llm.ainvoke(_build_messages(message, docs))).content
@@ -4,50 +4,66 @@ import os
 # from langchain_pinecone import Pinecone
 
 # QDRANT (MỚI)
-from qdrant_client import QdrantClient
-from langchain_qdrant import QdrantVectorStore
+from vectordb.registry import get_registry
+
 
 def get_mst_retriever(embedding):
     """
-    Khởi tạo Retriever cho dữ liệu MST bằng Qdrant
+    Retriever cho dữ liệu MST bằng Qdrant (client + retriever dùng chung,
+    xem vectordb/registry.py)
     """
     # ===== QDRANT (MỚI) =====
-    QDRANT_URL = os.getenv("QDRANT_URL")
     COLLECTION_NAME = os.getenv("QDRANT_COLLECTION_NAME_MST", "masothue")
 
-    if not QDRANT_URL:
+    registry = get_registry()
+    if registry is None:
         print("⚠️ Thiếu QDRANT_URL trong biến môi trường")
         return None
 
-    try:
-        client = QdrantClient(
-            url=QDRANT_URL,
-            api_key=None,
-            timeout=60
-        )
-    except Exception as e:
-        print(f"❌ Lỗi kết nối Qdrant MST: {e}")
+    return _retriever_if_ready(registry, registry.collection_info(COLLECTION_NAME), embedding)
+
+
+async def aget_mst_retriever(embedding):
+    """
+    Bản async của get_mst_retriever: thông tin collection lấy từ cache của registry
+    (chỉ lần đầu mới gọi Qdrant, sau đó làm mới ở nền)
+    """
+    COLLECTION_NAME = os.getenv("QDRANT_COLLECTION_NAME_MST", "masothue")
+
+    registry = get_registry()
+    if registry is None:
+        print("⚠️ Thiếu QDRANT_URL trong biến môi trường")
         return None
 
-    if not client.collection_exists(COLLECTION_NAME):
-        print(f"⚠️ Collection MST '{COLLECTION_NAME}' chưa tồn tại trên Qdrant.")
+    return _retriever_if_ready(registry, await registry.acollection_info(COLLECTION_NAME), embedding)
+
+
+_logged_check_at = None
+
+
+def _retriever_if_ready(registry, info, embedding):
+    global _logged_check_at
+    if info.error:
+        print(f"❌ Lỗi kết nối Qdrant MST: {info.error}")
+        return None
+    if not info.exists:
+        print(f"⚠️ Collection MST '{info.name}' chưa tồn tại trên Qdrant.")
         return None
 
-    # Kiểm tra số lượng points (cho phép rỗng để test)
-    collection_info = client.get_collection(COLLECTION_NAME)
-    if collection_info.points_count == 0:
-        print(f"⚠️ Collection MST '{COLLECTION_NAME}' đang rỗng (0 documents)")
-        # Vẫn trả về retriever để có thể test, nhưng sẽ không tìm thấy gì
-    else:
-        print(f"✅ Collection MST '{COLLECTION_NAME}' có {collection_info.points_count} documents")
+    # Log số points sau mỗi lần kiểm tra collection (không phải mỗi câu hỏi)
+    if info.checked_at != _logged_check_at:
+        _logged_check_at = info.checked_at
+        _log_points_count(info.name, info.points_count)
+
+    return registry.retriever(info.name, embedding, k=5)
 
-    vectordb = QdrantVectorStore(
-        client=client,
-        collection_name=COLLECTION_NAME,
-        embedding=embedding,
-    )
 
-    return vectordb.as_retriever(search_kwargs={"k": 5})
+def _log_points_count(collection_name: str, points_count: int):
+    if points_count == 0:
+        print(f"⚠️ Collection MST '{collection_name}' đang rỗng (0 documents)")
+        # Vẫn trả về retriever để có thể test, nhưng sẽ không tìm thấy gì
+    else:
+        print(f"✅ Collection MST '{collection_name}' có {points_count} documents")
 
     # ===== PINECONE (COMMENTED) =====
     # QDRANT_URL = os.getenv("QDRANT_URL")
@@ -1,10 +1,5 @@
+from data_processing.intent import classify
+
+
 def is_mst_query(message: str) -> bool:
-    msg = message.lower()
-    keywords = [
-        "mã số thuế",
-        "mst",
-        "tra cứu mst",
-        "mã số doanh nghiệp",
-        "tax code"
-    ]
-    return any(k in msg for k in keywords)
+    return classify(message).has("mst")
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Thêm sparse vector BM25 (vectordb/sparse.py) cho các collection đã ingest sẵn
+(luật + VSIC 2018) để bật hybrid search — không cần embed lại.
+
+1. Khai báo sparse vector SPARSE_VECTOR_NAME (modifier IDF) cho collection.
+   Qdrant không cho thêm vector mới vào collection có sẵn → --recreate: tạo collection
+   {tên}{--suffix} cùng cấu hình (HNSW, quantization, on_disk, payload index...) có thêm
+   sparse vector, chép từng lô points sang (giống processing/migrate_embeddings.py).
+   Collection cũ giữ nguyên, app vẫn chạy trong lúc chép
+2. Scroll toàn bộ points, tính độ dài tài liệu trung bình
+3. update_vectors theo lô: chỉ ghi sparse vector, dense vector + payload giữ nguyên
+4. (--recreate) Đặt QDRANT_COLLECTION_NAME_* sang collection mới, hoặc --swap: XÓA
+   collection cũ và tạo alias tên cũ → collection mới
+
+Sau khi chạy, app đang chạy tự chuyển sang hybrid (tắt: HYBRID_SEARCH=0), không cần restart:
+retriever luật / VSIC 2018 (registry.live_retriever) và MST lấy cấu hình theo thông tin
+collection mà registry (vectordb/registry.py) làm mới mỗi COLLECTION_INFO_TTL_SECONDS.
+--swap: tên cũ thành alias → cũng có hiệu lực sau ≤ TTL (truy vấn lỗi trong lúc đó → registry
+kiểm tra lại collection ngay). Đổi QDRANT_COLLECTION_NAME_* sang collection mới → phải restart.
+Chạy lại sau mỗi lần ingest thêm dữ liệu.
+
+Run:
+    python processing/backfill_sparse_vectors.py [--collections legal_documents masonganh] [--batch 256]
+    python processing/backfill_sparse_vectors.py --recreate [--suffix _sparse] [--swap]
+"""
+# ===================== IMPORTS =====================
+import argparse
+import os
+import sys
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(override=True)
+
+from qdrant_client import models
+
+from vectordb.client import create_qdrant_clients
+from vectordb.result_cache import mark_ingested
+from vectordb.retriever import CONTENT_KEY
+from vectordb.sparse import SPARSE_VECTOR_NAME, encode_document, sparse_vector_params, tokenize
+
+# ===================== CẤU HÌNH =====================
+QDRANT_URL = os.getenv("QDRANT_URL")
+DEFAULT_COLLECTIONS = [
+    os.getenv("QDRANT_COLLECTION_NAME_LAW", "legal_documents"),
+    os.getenv("QDRANT_COLLECTION_NAME_MSN_2018", "masonganh"),
+]
+
+
+def scroll_points(client, name: str, batch: int, with_payload=(CONTENT_KEY,), with_vectors: bool = False):
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=name,
+            limit=batch,
+            offset=offset,
+            with_payload=list(with_payload) if isinstance(with_payload, tuple) else with_payload,
+            with_vectors=with_vectors
+        )
+        yield from points
+        if offset is None:
+            break
+
+
+def create_sparse_target(client, source: str, target: str):
+    """
+    Collection mới cùng cấu hình với nguồn (dense vector + on_disk, HNSW, quantization,
+    optimizer, shard, metadata, payload index) và có thêm sparse vector
+    """
+    info = client.get_collection(source)
+    config = info.config
+    params = config.params
+    client.create_collection(
+        collection_name=target,
+        vectors_config=params.vectors,
+        sparse_vectors_config={**(params.sparse_vectors or {}), SPARSE_VECTOR_NAME: sparse_vector_params()},
+        shard_number=params.shard_number,
+        replication_factor=params.replication_factor,
+        write_consistency_factor=params.write_consistency_factor,
+        on_disk_payload=params.on_disk_payload,
+        hnsw_config=models.HnswConfigDiff(**config.hnsw_config.model_dump(exclude_none=True))
+        if config.hnsw_config else None,
+        optimizers_config=models.OptimizersConfigDiff(**config.optimizer_config.model_dump(exclude_none=True))
+        if config.optimizer_config else None,
+        quantization_config=config.quantization_config,
+        metadata=config.metadata
+    )
+    # Lọc theo payload lúc retrieval (data_processing/retrieval_filters.py) cần index
+    for field_name, schema in (info.payload_schema or {}).items():
+        client.create_payload_index(target, field_name=field_name, field_schema=schema.data_type, wait=True)
+
+
+def recreate_with_sparse(client, name: str, target: str, batch: int) -> bool:
+    """
+    Chép từng lô points (kèm dense vector + payload) sang collection mới có sparse vector.
+    Collection nguồn giữ nguyên (app vẫn đọc được) cho tới khi swap.
+    """
+    if client.collection_exists(target):
+        print(f"⚠️ Collection {target} đã tồn tại — bỏ qua {name} (xóa đi để chạy lại)")
+        return False
+    create_sparse_target(client, name, target)
+    print(f"📦 {name} → {target} (thêm sparse vector '{SPARSE_VECTOR_NAME}')")
+
+    pending, copied = [], 0
+    for p in scroll_points(client, name, batch, with_payload=True, with_vectors=True):
+        pending.append(models.PointStruct(id=p.id, vector=p.vector, payload=p.payload))
+        if len(pending) >= batch:
+            client.upsert(collection_name=target, points=pending, wait=True)
+            copied += len(pending)
+            pending = []
+            print(f"   ✍️ {copied} points")
+    if pending:
+        client.upsert(collection_name=target, points=pending, wait=True)
+
+    source_count = client.count(name, exact=True).count
+    target_count = client.count(target, exact=True).count
+    if source_count != target_count:
+        print(f"❌ {target}: {target_count} points, nguồn có {source_count} — giữ nguyên nguồn")
+        return False
+    return True
+
+
+def _alias_target(client, name: str) -> Optional[str]:
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == name:
+            return alias.collection_name
+    return None
+
+
+def swap(client, name: str, target: str):
+    """Tên cũ thành alias trỏ sang collection mới, xóa collection cũ"""
+    previous = _alias_target(client, name)
+    if previous is None:
+        # Tên cũ là collection thật → phải xóa trước khi tạo alias trùng tên
+        client.delete_collection(name)
+        client.update_collection_aliases(change_aliases_operations=[
+            models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=name))
+        ])
+    else:
+        # Đã là alias (vd: sau migrate_embeddings.py --swap) → đổi trỏ trong 1 thao tác, không gián đoạn
+        client.update_collection_aliases(change_aliases_operations=[
+            models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=name)),
+            models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=name)),
+        ])
+        client.delete_collection(previous)
+    print(f"🔀 Alias {name} → {target} (app chuyển sang sau ≤ COLLECTION_INFO_TTL_SECONDS)")
+
+
+def ensure_sparse_config(client, name: str, batch: int, recreate: bool, suffix: str) -> Optional[str]:
+    """Collection để ghi sparse vector: chính nó, bản chép mới (--recreate) hoặc None (bỏ qua)"""
+    info = client.get_collection(name)
+    if SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {}):
+        return name
+    try:
+        client.update_collection(
+            collection_name=name,
+            sparse_vectors_config={SPARSE_VECTOR_NAME: sparse_vector_params()}
+        )
+        if SPARSE_VECTOR_NAME in (client.get_collection(name).config.params.sparse_vectors or {}):
+            print(f"➕ Đã khai báo sparse vector '{SPARSE_VECTOR_NAME}' cho {name}")
+            return name
+    except Exception as e:
+        print(f"⚠️ Không thêm được sparse vector cho {name}: {e}")
+
+    if not recreate:
+        print(f"❌ {name} chưa có sparse vector '{SPARSE_VECTOR_NAME}' → chạy lại với --recreate")
+        return None
+    target = f"{name}{suffix}"
+    return target if recreate_with_sparse(client, name, target, batch) else None
+
+
+def backfill(client, name: str, batch: int, recreate: bool = False, suffix: str = "_sparse", do_swap: bool = False):
+    if not client.collection_exists(name):
+        print(f"⚠️ Collection {name} không tồn tại — bỏ qua")
+        return
+    target = ensure_sparse_config(client, name, batch, recreate, suffix)
+    if target is None:
+        return
+
+    texts = {p.id: (p.payload or {}).get(CONTENT_KEY) or "" for p in scroll_points(client, target, batch)}
+    if not texts:
+        print(f"⚠️ Collection {target} rỗng — bỏ qua")
+        return
+    avg_doc_tokens = sum(len(tokenize(t)) for t in texts.values()) / len(texts) or 1
+    print(f"📄 {target}: {len(texts)} points, trung bình {avg_doc_tokens:.0f} token/chunk")
+
+    ids = list(texts)
+    for start in range(0, len(ids), batch):
+        client.update_vectors(
+            collection_name=target,
+            points=[
+                models.PointVectors(
+                    id=pid,
+                    vector={SPARSE_VECTOR_NAME: encode_document(texts[pid], avg_doc_tokens)}
+                )
+                for pid in ids[start:start + batch]
+            ],
+            wait=True
+        )
+        print(f"   ✍️ {min(start + batch, len(ids))}/{len(ids)}")
+    # Kết quả hybrid đổi dù số points giữ nguyên → cache retrieval của app hết hiệu lực
+    # (--swap: alias tên cũ trỏ sang collection mới → phiên bản khác, cũng làm mới)
+    mark_ingested(client, target)
+    print(f"✅ {target}: xong")
+
+    if target != name:
+        # App chỉ chuyển sang bản chép khi sparse vector đã ghi xong
+        if do_swap:
+            swap(client, name, target)
+        else:
+            print(f"👉 Đặt QDRANT_COLLECTION_NAME_* đang là {name} thành {target} rồi restart app "
+                  f"(hoặc chạy với --swap: không cần restart)")
+
+
+def main(args):
+    if not QDRANT_URL:
+        sys.exit("❌ Thiếu QDRANT_URL")
+    client, _ = create_qdrant_clients(QDRANT_URL, timeout=120)
+    for name in args.collections:
+        backfill(client, name, args.batch, args.recreate, args.suffix, args.swap)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--collections", nargs="+", default=DEFAULT_COLLECTIONS)
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--recreate", action="store_true",
+                        help="Chép sang collection mới có sparse vector nếu Qdrant không cho thêm vào collection cũ")
+    parser.add_argument("--suffix", default="_sparse", help="Tên collection mới = tên cũ + suffix (--recreate)")
+    parser.add_argument("--swap", action="store_true",
+                        help="(--recreate) XÓA collection cũ, tạo alias tên cũ → collection mới")
+    main(parser.parse_args())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Dịch sẵn các câu trả lời cố định sang mọi ngôn ngữ trong lang_mapping
+→ data_processing/canned_translations.json (xem data_processing/translation.py).
+
+Chạy lại mỗi khi sửa GREETING_VI / OUT_OF_SCOPE_VI / TIMEOUT_VI / RAW_CONTEXT_PREFIX_VI
+hoặc thêm ngôn ngữ. Bản dịch đã có và câu gốc chưa đổi → giữ nguyên (--force để dịch lại).
+
+Run:
+    python processing/build_canned_translations.py [--force]
+"""
+# ===================== IMPORTS =====================
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(override=True)
+
+from langchain_openai import ChatOpenAI
+
+from data_processing.language import _convert_messages, lang_mapping
+from data_processing.pipeline import GREETING_VI, OUT_OF_SCOPE_VI, RAW_CONTEXT_PREFIX_VI, TIMEOUT_VI
+from data_processing.translation import CANNED_TRANSLATIONS_PATH, text_key
+
+# ===================== CẤU HÌNH =====================
+LANG_MODEL_API_KEY = os.getenv("LANG_MODEL_API_KEY")
+
+CANNED_TEXTS = {
+    "GREETING_VI": GREETING_VI,
+    "OUT_OF_SCOPE_VI": OUT_OF_SCOPE_VI,
+    "TIMEOUT_VI": TIMEOUT_VI,
+    "RAW_CONTEXT_PREFIX_VI": RAW_CONTEXT_PREFIX_VI,
+}
+
+
+def main(force: bool = False):
+    lang_llm = ChatOpenAI(api_key=LANG_MODEL_API_KEY, model="gpt-4o-mini", temperature=0)
+
+    try:
+        existing = json.loads(CANNED_TRANSLATIONS_PATH.read_text(encoding="utf-8")).get("entries", {})
+    except (OSError, ValueError):
+        existing = {}
+
+    entries = {}
+    for name, text in CANNED_TEXTS.items():
+        sha1 = text_key(text)
+        old = existing.get(name, {})
+        translations = dict(old.get("translations", {})) if old.get("sha1") == sha1 and not force else {}
+
+        for lang in lang_mapping:
+            if lang == "vi" or lang in translations:
+                continue
+            print(f"🌐 {name} → {lang}")
+            translated = lang_llm.invoke(_convert_messages(text, lang)).content
+            # Giữ khoảng trắng / xuống dòng cuối như câu gốc (RAW_CONTEXT_PREFIX_VI nối với context)
+            translations[lang] = translated.strip() + text[len(text.rstrip()):]
+
+        entries[name] = {"sha1": sha1, "source": text, "translations": translations}
+
+    CANNED_TRANSLATIONS_PATH.write_text(
+        json.dumps({"entries": entries}, ensure_ascii=False, indent=2) + "\n", encoding="utf-8"
+    )
+    print(f"✅ Đã ghi {len(entries)} câu × {len(lang_mapping) - 1} ngôn ngữ → {CANNED_TRANSLATIONS_PATH}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--force", action="store_true", help="Dịch lại cả bản đã có")
+    main(parser.parse_args().force)
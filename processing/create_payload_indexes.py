@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tạo payload index (keyword) cho các trường metadata dùng để lọc lúc retrieval
+(data_processing/retrieval_filters.py): section_code, document, content_type, source.
+
+Không có index, Qdrant vẫn lọc được nhưng phải đọc payload từng point ứng viên, và
+không lấy được danh sách văn bản (facet) → câu hỏi nêu đích danh văn bản sẽ không được lọc.
+Có index: lọc trước khi duyệt HNSW, chi phí gần như không đổi khi collection lớn lên.
+
+Chạy 1 lần sau khi ingest lần đầu (backfill_sparse_vectors.py --recreate, migrate_embeddings.py
+tự chép index sang collection mới); đã có index thì bỏ qua. Points ghi sau đó tự được index.
+
+Run:
+    python processing/create_payload_indexes.py [--collections legal_documents]
+"""
+# ===================== IMPORTS =====================
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(override=True)
+
+from qdrant_client import models
+
+from data_processing.retrieval_filters import FILTER_FIELDS
+from vectordb.client import create_qdrant_clients
+from vectordb.retriever import METADATA_KEY
+
+# ===================== CẤU HÌNH =====================
+QDRANT_URL = os.getenv("QDRANT_URL")
+DEFAULT_COLLECTIONS = [os.getenv("QDRANT_COLLECTION_NAME_LAW", "legal_documents")]
+
+
+def create_indexes(client, name: str, fields=FILTER_FIELDS):
+    if not client.collection_exists(name):
+        print(f"⚠️ Collection {name} không tồn tại — bỏ qua")
+        return
+
+    existing = client.get_collection(name).payload_schema or {}
+    for field in fields:
+        key = f"{METADATA_KEY}.{field}"
+        if key in existing:
+            print(f"   ⏭️ {name}: {key} đã có index ({existing[key].data_type})")
+            continue
+        client.create_payload_index(
+            collection_name=name,
+            field_name=key,
+            field_schema=models.PayloadSchemaType.KEYWORD,
+            wait=True
+        )
+        print(f"   ➕ {name}: index keyword cho {key}")
+
+    # Kiểm tra nhanh: số giá trị khác nhau của từng trường (facet cần index)
+    for field in fields:
+        key = f"{METADATA_KEY}.{field}"
+        hits = client.facet(name, key, limit=1000).hits
+        print(f"   📊 {key}: {len(hits)} giá trị" + (f", vd: {hits[0].value}" if hits else ""))
+    print(f"✅ {name}: xong")
+
+
+def main(args):
+    if not QDRANT_URL:
+        sys.exit("❌ Thiếu QDRANT_URL")
+    client, _ = create_qdrant_clients(QDRANT_URL, timeout=120)
+    for name in args.collections:
+        create_indexes(client, name)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--collections", nargs="+", default=DEFAULT_COLLECTIONS)
+    main(parser.parse_args())
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Chuyển các collection Qdrant (luật, masothue, masonganh) sang dense vector rút gọn
+chiều và / hoặc quantization (xem vectordb/quantization.py).
+
+Mỗi collection nguồn → collection mới {tên}{--suffix}:
+- dense vector --dimensions chiều: cắt vector 3072 chiều có sẵn + chuẩn hóa
+  (= API text-embedding-3 với dimensions=N, không tốn lời gọi API);
+  --reembed: embed lại page_content bằng API với tham số dimensions
+- vector gốc (đã rút gọn) để trên đĩa, bản quantized (--quantization) giữ trong RAM
+- payload + sparse vector (hybrid search) chép nguyên, payload index tạo lại như nguồn
+
+Collection nguồn giữ nguyên, app vẫn chạy trong lúc chuyển. Xong thì:
+- đặt QDRANT_COLLECTION_NAME_* trỏ sang collection mới (in ra cuối script), hoặc
+- --swap: XÓA collection nguồn và tạo alias tên cũ → collection mới (không phải sửa ENV)
+Retriever của app (registry.live_retriever) đọc số chiều + quantization từ thông tin collection
+→ theo cấu hình mới sau ≤ COLLECTION_INFO_TTL_SECONDS (Qdrant báo lệch số chiều → làm mới ngay),
+không cần cấu hình thêm hay restart. Đổi QDRANT_COLLECTION_NAME_* thì vẫn phải restart.
+
+Run:
+    python processing/migrate_embeddings.py --dimensions 1024 --quantization scalar
+    python processing/migrate_embeddings.py --dimensions 3072 --quantization binary --collections legal_documents
+"""
+# ===================== IMPORTS =====================
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv(override=True)
+
+from qdrant_client import models
+
+from vectordb.client import create_qdrant_clients
+from vectordb.quantization import QDRANT_QUANTIZATION, QUANTIZATION_MODES, fit_dimension, quantization_config
+from vectordb.result_cache import mark_ingested
+from vectordb.retriever import CONTENT_KEY
+
+# ===================== CẤU HÌNH =====================
+QDRANT_URL = os.getenv("QDRANT_URL")
+OPENAI__API_KEY = os.getenv("OPENAI__API_KEY")
+OPENAI__EMBEDDING_MODEL = os.getenv("OPENAI__EMBEDDING_MODEL")
+
+COLLECTION_ENVS = {
+    "QDRANT_COLLECTION_NAME_LAW": os.getenv("QDRANT_COLLECTION_NAME_LAW", "legal_documents"),
+    "QDRANT_COLLECTION_NAME_MST": os.getenv("QDRANT_COLLECTION_NAME_MST", "masothue"),
+    "QDRANT_COLLECTION_NAME_MSN_2018": os.getenv("QDRANT_COLLECTION_NAME_MSN_2018", "masonganh"),
+}
+
+
+def _dense(params):
+    """(tên, VectorParams) của dense vector nguồn"""
+    if isinstance(params.vectors, dict):
+        return next(iter(params.vectors.items()))
+    return None, params.vectors
+
+
+def create_target(client, source: str, target: str, dimensions: int, quantization: str):
+    info = client.get_collection(source)
+    params = info.config.params
+    vector_name, dense = _dense(params)
+    if dimensions > dense.size:
+        raise ValueError(f"{source}: {dense.size} chiều, không tăng lên {dimensions} được")
+
+    vector_params = models.VectorParams(
+        size=dimensions,
+        distance=dense.distance,
+        # Có quantization → vector gốc chỉ đọc lúc rescore, để trên đĩa
+        on_disk=quantization != "none"
+    )
+    client.create_collection(
+        collection_name=target,
+        vectors_config={vector_name: vector_params} if vector_name is not None else vector_params,
+        sparse_vectors_config=params.sparse_vectors,
+        quantization_config=quantization_config(quantization)
+    )
+    # Lọc theo payload lúc retrieval (data_processing/retrieval_filters.py) cần index
+    for field_name, schema in (info.payload_schema or {}).items():
+        client.create_payload_index(target, field_name=field_name, field_schema=schema.data_type, wait=True)
+    return vector_name
+
+
+def _dense_vector(point, vector_name):
+    vector = point.vector
+    if isinstance(vector, dict):
+        return vector.get(vector_name or "")
+    return vector
+
+
+def migrate(client, source: str, target: str, args, emb=None) -> bool:
+    if not client.collection_exists(source):
+        print(f"⚠️ Collection {source} không tồn tại — bỏ qua")
+        return False
+    if client.collection_exists(target):
+        print(f"⚠️ Collection {target} đã tồn tại — bỏ qua (xóa đi để chạy lại)")
+        return False
+
+    vector_name = create_target(client, source, target, args.dimensions, args.quantization)
+    print(f"📦 {source} → {target} ({args.dimensions} chiều, quantization={args.quantization})")
+
+    t0 = time.perf_counter()
+    copied = 0
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source,
+            limit=args.batch,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        if not points:
+            break
+
+        if emb is not None:
+            dense = emb.embed_documents([(p.payload or {}).get(CONTENT_KEY) or "" for p in points])
+        else:
+            dense = [fit_dimension(list(_dense_vector(p, vector_name)), args.dimensions) for p in points]
+
+        batch = []
+        for p, vector in zip(points, dense):
+            # Giữ sparse vector (hybrid search) nếu có
+            others = {k: v for k, v in p.vector.items() if k != vector_name} if isinstance(p.vector, dict) else {}
+            if vector_name is None and not others:
+                new_vector = vector
+            else:
+                new_vector = {**others, (vector_name or ""): vector}
+            batch.append(models.PointStruct(id=p.id, vector=new_vector, payload=p.payload))
+        client.upsert(collection_name=target, points=batch, wait=True)
+
+        copied += len(points)
+        print(f"   ✍️ {copied} points ({time.perf_counter() - t0:.0f}s)")
+        if offset is None:
+            break
+
+    source_count = client.count(source, exact=True).count
+    target_count = client.count(target, exact=True).count
+    if source_count != target_count:
+        print(f"❌ {target}: {target_count} points, nguồn có {source_count} — giữ nguyên nguồn")
+        return False
+    # --swap: alias tên cũ trỏ sang collection mới → phiên bản khác, cache retrieval của app làm mới
+    mark_ingested(client, target)
+    print(f"✅ {target}: {target_count} points")
+    return True
+
+
+def swap(client, source: str, target: str):
+    """Xóa collection nguồn, tên cũ thành alias trỏ sang collection mới"""
+    client.delete_collection(source)
+    client.update_collection_aliases(change_aliases_operations=[
+        models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=source))
+    ])
+    print(f"🔀 Alias {source} → {target}")
+
+
+def main(args):
+    if not QDRANT_URL:
+        sys.exit("❌ Thiếu QDRANT_URL")
+    client, _ = create_qdrant_clients(QDRANT_URL, timeout=120)
+
+    emb = None
+    if args.reembed:
+        from langchain_openai import OpenAIEmbeddings
+        emb = OpenAIEmbeddings(api_key=OPENAI__API_KEY, model=OPENAI__EMBEDDING_MODEL, dimensions=args.dimensions)
+
+    suffix = args.suffix or f"_d{args.dimensions}_{args.quantization}"
+    env_lines = []
+    for env_name, source in COLLECTION_ENVS.items():
+        if args.collections and source not in args.collections:
+            continue
+        target = f"{source}{suffix}"
+        if not migrate(client, source, target, args, emb):
+            continue
+        if args.swap:
+            swap(client, source, target)
+        else:
+            env_lines.append(f"{env_name}={target}")
+
+    if env_lines:
+        print("\n👉 Cập nhật ENV để app dùng collection mới:")
+        for line in env_lines:
+            print(f"   {line}")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--collections", nargs="+", help="Mặc định: luật + MST + VSIC 2018 (theo ENV)")
+    parser.add_argument("--dimensions", type=int, default=int(os.getenv("OPENAI__EMBEDDING_DIMENSIONS") or 1024))
+    parser.add_argument("--quantization", choices=QUANTIZATION_MODES, default=QDRANT_QUANTIZATION)
+    parser.add_argument("--suffix", help="Mặc định: _d{dimensions}_{quantization}")
+    parser.add_argument("--reembed", action="store_true", help="Embed lại bằng API thay vì cắt vector có sẵn")
+    parser.add_argument("--swap", action="store_true", help="XÓA collection nguồn, tạo alias tên cũ → collection mới")
+    parser.add_argument("--batch", type=int, default=256)
+    main(parser.parse_args())
@@ -0,0 +1,143 @@
+# serving/admission.py
+"""
+Admission control cho /chat: khi OpenAI chậm, request không được dồn vô hạn.
+
+- Giới hạn tổng số request đang xử lý (max_in_flight)
+- Mỗi session_id chỉ 1 request tại 1 thời điểm (per_session)
+- Hàng đợi có giới hạn (max_queue) + thời gian chờ tối đa (queue_timeout)
+- Đầy / chờ quá lâu → AdmissionRejected (main.py trả 429 + Retry-After)
+
+Metrics: admission_in_flight, admission_queue_depth (gauge),
+admission_wait_seconds (summary), admission_rejected_total (counter theo lý do).
+"""
+import asyncio
+import math
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from data_processing.sessions import SHARED_SESSIONS
+from monitoring import metrics
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """Giấy phép đã cấp; release() gọi nhiều lần vẫn an toàn."""
+
+    def __init__(self, controller: "AdmissionController", session_id: Optional[str]):
+        self._controller = controller
+        self.session_id = session_id
+        self.started_at = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int = 32,
+        max_queue: int = 64,
+        queue_timeout: float = 30.0,
+        per_session: int = 1,
+        name: str = "chat"
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.per_session = per_session
+        self.name = name
+
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._in_flight = 0
+        self._waiting = 0
+        self._sessions: Dict[str, int] = defaultdict(int)
+        # Thời gian xử lý trung bình (EWMA) → ước lượng Retry-After
+        self._avg_service = 1.0
+
+    # ---------------- API ----------------
+    async def acquire(self, session_id: Optional[str] = None) -> Ticket:
+        session_key = None if session_id in SHARED_SESSIONS else session_id
+
+        # 1️⃣ Mỗi session 1 request (request đang chờ trong hàng đợi cũng tính)
+        if session_key is not None and self._sessions[session_key] >= self.per_session:
+            self._reject("session_busy")
+        if session_key is not None:
+            self._sessions[session_key] += 1
+
+        try:
+            # 2️⃣ Hết slot (hoặc đã có người xếp hàng trước) → vào hàng đợi nếu còn chỗ
+            t0 = time.perf_counter()
+            if self._slots.locked() or self._waiting > 0:
+                if self._waiting >= self.max_queue:
+                    self._reject("queue_full")
+
+                self._waiting += 1
+                self._set_gauges()
+                try:
+                    await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+                except asyncio.TimeoutError:
+                    self._reject("queue_timeout")
+                finally:
+                    self._waiting -= 1
+            else:
+                await self._slots.acquire()
+
+            metrics.summary("admission_wait_seconds").observe(time.perf_counter() - t0, label=self.name)
+        except BaseException:
+            if session_key is not None:
+                self._session_done(session_key)
+            self._set_gauges()
+            raise
+
+        self._in_flight += 1
+        self._set_gauges()
+        return Ticket(self, session_key)
+
+    @asynccontextmanager
+    async def admit(self, session_id: Optional[str] = None):
+        ticket = await self.acquire(session_id)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def retry_after(self) -> int:
+        """Ước lượng số giây đến khi hàng đợi hiện tại được xử lý hết."""
+        backlog = (self._waiting + 1) / max(1, self.max_in_flight)
+        return max(1, math.ceil(self._avg_service * backlog))
+
+    # ---------------- NỘI BỘ ----------------
+    def _release(self, ticket: Ticket):
+        elapsed = time.perf_counter() - ticket.started_at
+        self._avg_service = 0.9 * self._avg_service + 0.1 * elapsed
+
+        self._in_flight -= 1
+        self._slots.release()
+        if ticket.session_id is not None:
+            self._session_done(ticket.session_id)
+        self._set_gauges()
+
+    def _session_done(self, session_key: str):
+        self._sessions[session_key] -= 1
+        if self._sessions[session_key] <= 0:
+            del self._sessions[session_key]
+
+    def _reject(self, reason: str):
+        metrics.counter("admission_rejected_total").inc(label=reason)
+        raise AdmissionRejected(reason, self.retry_after())
+
+    def _set_gauges(self):
+        metrics.gauge("admission_in_flight").set(self._in_flight, label=self.name)
+        metrics.gauge("admission_queue_depth").set(self._waiting, label=self.name)
@@ -0,0 +1,29 @@
+# serving/batch.py
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Sequence, Tuple
+
+
+async def run_bounded(
+    items: Sequence[Any],
+    worker: Callable[[int, Any], Awaitable[Any]],
+    concurrency: int
+) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Chạy worker(index, item) cho từng item, tối đa `concurrency` việc cùng lúc.
+    Yield (index, kết quả) theo thứ tự HOÀN THÀNH (không theo thứ tự đầu vào).
+    Nếu bên gọi dừng giữa chừng (client ngắt kết nối) → hủy các việc còn lại.
+    """
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(idx: int, item: Any):
+        async with sem:
+            return idx, await worker(idx, item)
+
+    tasks = [asyncio.ensure_future(_one(i, it)) for i, it in enumerate(items)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
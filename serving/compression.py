@@ -0,0 +1,57 @@
+# serving/compression.py
+"""
+Nén response lớn (JSON danh sách KCN/CCN...) cho client mạng chậm.
+
+- Client nhận "br" + có cài brotli-asgi → Brotli (nhỏ hơn gzip ~15-25% với JSON)
+- Còn lại → gzip (Starlette)
+- Bỏ qua response nhỏ (< minimum_size) và các route stream / ảnh:
+  nén buffer lại từng đoạn SSE / NDJSON → client nhận chậm; PNG đã nén sẵn.
+"""
+from typing import Iterable
+
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+DEFAULT_EXCLUDE_PREFIXES = ("/chat/stream", "/chat/batch", "/charts/")
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        exclude_prefixes: Iterable[str] = DEFAULT_EXCLUDE_PREFIXES
+    ):
+        self.app = app
+        self.exclude_prefixes = tuple(exclude_prefixes)
+        # gzip level 6 / brotli quality 4: tỉ lệ nén gần mức tối đa, tốn CPU ít hơn nhiều
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=gzip_level)
+        self.brotli = (
+            BrotliMiddleware(app, quality=brotli_quality, minimum_size=minimum_size, gzip_fallback=False)
+            if BrotliMiddleware else None
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope.get("path", "").startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        if self.brotli is not None and "br" in _accept_encoding(scope):
+            await self.brotli(scope, receive, send)
+            return
+
+        await self.gzip(scope, receive, send)
+
+
+def _accept_encoding(scope: Scope) -> str:
+    for key, value in scope.get("headers", []):
+        if key == b"accept-encoding":
+            return value.decode("latin-1").lower()
+    return ""
@@ -0,0 +1,57 @@
+# serving/preload.py
+"""
+Nạp dữ liệu CHỈ ĐỌC trong process master của gunicorn, TRƯỚC khi fork worker.
+Worker được fork dùng chung các trang bộ nhớ này (copy-on-write) thay vì mỗi
+worker tự đọc Excel / GeoJSON một lần.
+
+Chỉ nạp dữ liệu + thư viện nặng; KHÔNG tạo client mạng (OpenAI, Qdrant, asyncpg)
+hay thread ở đây — socket / event loop không dùng chung được qua fork.
+Worker import main.py như bình thường; module đã có trong sys.modules nên
+không nạp lại.
+"""
+import gc
+import time
+
+
+def preload_shared_data() -> dict:
+    t0 = time.perf_counter()
+
+    # Thư viện nặng: code + dữ liệu module dùng chung giữa các worker
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    import matplotlib.pyplot  # noqa: F401
+    import fastapi  # noqa: F401
+    import langchain_core.messages  # noqa: F401
+    import langchain_openai  # noqa: F401
+    import qdrant_client  # noqa: F401
+
+    # IIPMapBackend: DataFrame Excel + cột chuẩn hóa + GeoJSON + danh sách tỉnh
+    from iz_agent.tools import backend
+
+    # Profile n-gram của langdetect (nhận diện ngôn ngữ cục bộ)
+    from data_processing.language import load_language_profiles
+    load_language_profiles()
+
+    # Encoding tiktoken đếm token context (lần đầu tải file BPE về cache — không để
+    # lần tải này chặn event loop ở request đầu tiên)
+    from data_processing.context_builder import count_tokens
+    count_tokens("")
+
+    # Bảng mã VSIC 2018 / 2025 (tra mã ngành không qua vector search)
+    from data_processing.vsic_index import vsic_2018, vsic_2025
+    vsic_2018()
+    vsic_2025()
+
+    stats = {
+        "rows": len(backend.df),
+        "geojson_zones": len(backend.geojson_map),
+        "provinces": len(backend.provinces),
+        "vsic_codes": len(vsic_2018()) + len(vsic_2025()),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+
+    # Đưa toàn bộ object hiện có ra khỏi tầm quét của GC: GC của worker sẽ
+    # không ghi vào header các object này → trang bộ nhớ không bị copy.
+    gc.collect()
+    gc.freeze()
+    return stats
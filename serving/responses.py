@@ -0,0 +1,47 @@
+# serving/responses.py
+"""
+Response JSON dùng orjson (mặc định cho toàn app, xem main.py).
+
+- Nhanh hơn json chuẩn nhiều lần với payload lớn (danh sách KCN/CCN + tọa độ)
+- NaN / Infinity → null (json chuẩn của Starlette báo lỗi với allow_nan=False)
+- Hỗ trợ numpy / datetime / pandas Timestamp
+Không cài orjson → quay về JSONResponse của Starlette.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def _default(obj: Any):
+    """Kiểu orjson không tự xử lý được (pandas Timestamp, Decimal, set...)"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    return str(obj)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is None:
+        return JSONResponse(content).body
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return dumps(content)
@@ -0,0 +1,67 @@
+# serving/singleflight.py
+import asyncio
+import re
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+def normalize_question(text: str) -> str:
+    """
+    Chuẩn hóa câu hỏi để gom request trùng:
+    - Unicode NFC (gõ dấu kiểu tổ hợp / dựng sẵn đều về 1 dạng)
+    - lowercase, gộp khoảng trắng, bỏ dấu câu cuối câu
+    Giữ nguyên dấu tiếng Việt ("lương" ≠ "luong").
+    """
+    t = unicodedata.normalize("NFC", text or "").lower()
+    t = re.sub(r"\s+", " ", t).strip()
+    return t.rstrip(" ?!.…")
+
+
+def coalesce_key(
+    question: str,
+    route: str,
+    lang: str = "auto",
+    history_owner: Optional[str] = None
+) -> Tuple:
+    """
+    Key gom request: (route, ngôn ngữ, câu hỏi chuẩn hóa).
+    - lang="auto": ngôn ngữ do pipeline tự nhận diện từ chính câu hỏi, nên cùng
+      câu hỏi chuẩn hóa → cùng ngôn ngữ.
+    - history_owner: nếu câu trả lời phụ thuộc lịch sử hội thoại của 1 session
+      thì truyền session_id để KHÔNG gom với session khác.
+    """
+    return (route, lang, normalize_question(question), history_owner)
+
+
+class SingleFlight:
+    """
+    Gom các request đồng thời có cùng key thành 1 lần tính toán.
+    Request đến sau chờ kết quả của request đầu tiên thay vì tự gọi LLM/Qdrant.
+
+    Việc tính toán chạy trong Task riêng: nếu client đầu tiên ngắt kết nối
+    (request bị cancel) thì các request đang chờ vẫn nhận được kết quả.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Trả về (kết quả, shared) — shared=True nếu dùng lại kết quả của request khác."""
+        task = self._inflight.get(key)
+        if task is not None:
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _t: self._forget(key, _t))
+        return await asyncio.shield(task), False
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Tránh cảnh báo "Task exception was never retrieved" khi mọi request đã bị cancel
+        if not task.cancelled():
+            task.exception()
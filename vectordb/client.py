@@ -0,0 +1,67 @@
+# vectordb/client.py
+import os
+from typing import Optional
+
+import httpx
+from qdrant_client import QdrantClient, AsyncQdrantClient
+
+# Search bình thường < 1s; 60s cũ giữ request /chat quá lâu khi Qdrant có sự cố
+QDRANT_TIMEOUT_SECONDS = int(os.getenv("QDRANT_TIMEOUT_SECONDS", "10"))
+
+# Connection pool HTTP (keep-alive) của mỗi client. qdrant-client mặc định TẮT
+# keep-alive khi Qdrant chạy ở localhost → mỗi truy vấn mở lại 1 kết nối TCP
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "20"))
+QDRANT_KEEPALIVE_SECONDS = float(os.getenv("QDRANT_KEEPALIVE_SECONDS", "30"))
+
+# gRPC: vector query 3072 chiều gửi dạng protobuf thay vì JSON (encode/decode
+# JSON chiếm phần đáng kể thời gian search). Xem benchmarks/bench_qdrant_transport.py
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "0") == "1"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=QDRANT_POOL_SIZE,
+        max_keepalive_connections=QDRANT_POOL_SIZE,
+        keepalive_expiry=QDRANT_KEEPALIVE_SECONDS
+    )
+
+
+def create_qdrant_clients(
+    url: str,
+    timeout: Optional[int] = None,
+    prefer_grpc: Optional[bool] = None,
+    grpc_port: Optional[int] = None
+):
+    """
+    Tạo cặp client Qdrant (sync + async) cùng cấu hình.
+    - sync  : dùng cho CLI / script / các đoạn code chưa chuyển sang async
+    - async : dùng cho /chat (FastAPI) để không chiếm thread pool khi chờ I/O
+    timeout / prefer_grpc / grpc_port mặc định: QDRANT_TIMEOUT_SECONDS / QDRANT_PREFER_GRPC / QDRANT_GRPC_PORT
+    (prefer_grpc: các thao tác có hỗ trợ gRPC đi qua cổng grpc_port, còn lại vẫn REST)
+
+    Mỗi lần gọi tạo connection pool MỚI — code phục vụ request nên dùng client
+    dùng chung của vectordb/registry.py (get_registry()).
+    """
+    timeout = timeout or QDRANT_TIMEOUT_SECONDS
+    prefer_grpc = QDRANT_PREFER_GRPC if prefer_grpc is None else prefer_grpc
+    grpc_port = grpc_port or QDRANT_GRPC_PORT
+    client = QdrantClient(
+        url=url,
+        api_key=None,
+        timeout=timeout,
+        prefer_grpc=prefer_grpc,
+        grpc_port=grpc_port,
+        check_compatibility=False,
+        limits=_pool_limits()
+    )
+    async_client = AsyncQdrantClient(
+        url=url,
+        api_key=None,
+        timeout=timeout,
+        prefer_grpc=prefer_grpc,
+        grpc_port=grpc_port,
+        check_compatibility=False,
+        limits=_pool_limits()
+    )
+    return client, async_client
@@ -0,0 +1,44 @@
+# vectordb/mmr.py
+"""
+Maximal Marginal Relevance: chọn k kết quả từ fetch_k ứng viên, cân bằng giữa
+độ liên quan với câu hỏi và độ khác biệt với các kết quả đã chọn.
+
+Chunk ingest có overlap → top-k theo similarity hay là nhiều chunk gần trùng nhau
+của cùng 1 điều luật. MMR đổi bớt các chunk đó lấy điều khoản khác.
+
+    mmr(i) = λ · relevance(i) − (1 − λ) · max_{j đã chọn} cos(i, j)
+
+relevance = điểm Qdrant trả về (cosine hoặc RRF khi hybrid) chuẩn hóa min-max về [0, 1]
+→ giữ nguyên thứ tự liên quan của Qdrant, λ có cùng ý nghĩa cho dense lẫn hybrid.
+"""
+from typing import List, Sequence
+
+import numpy as np
+
+
+def mmr_select(scores: Sequence[float], vectors: Sequence[Sequence[float]], k: int, lambda_mult: float) -> List[int]:
+    """Chỉ số (theo thứ tự chọn) của k ứng viên; scores / vectors cùng thứ tự ứng viên"""
+    n = len(scores)
+    if n <= k:
+        return list(range(n))
+
+    rel = np.asarray(scores, dtype=np.float32)
+    spread = rel.max() - rel.min()
+    rel = (rel - rel.min()) / spread if spread > 0 else np.ones_like(rel)
+
+    v = np.asarray(vectors, dtype=np.float32)
+    v /= np.linalg.norm(v, axis=1, keepdims=True) + 1e-12
+    sim = v @ v.T
+
+    selected = [int(rel.argmax())]
+    max_sim = sim[selected[0]].copy()
+    chosen = np.zeros(n, dtype=bool)
+    chosen[selected[0]] = True
+    while len(selected) < k:
+        mmr = lambda_mult * rel - (1 - lambda_mult) * max_sim
+        mmr[chosen] = -np.inf
+        j = int(mmr.argmax())
+        selected.append(j)
+        chosen[j] = True
+        np.maximum(max_sim, sim[j], out=max_sim)
+    return selected
@@ -0,0 +1,70 @@
+# vectordb/quantization.py
+"""
+Giảm dung lượng dense vector (3072 chiều float32 = 12 KB / vector):
+
+1. Rút gọn số chiều: text-embedding-3 được train kiểu Matryoshka → cắt N chiều đầu rồi
+   chuẩn hóa lại độ dài = đúng vector API trả về với tham số dimensions=N
+   (không cần embed lại dữ liệu cũ, xem processing/migrate_embeddings.py)
+2. Quantization của Qdrant: scalar (int8, /4) hoặc binary (1 bit, /32) giữ trong RAM,
+   vector gốc để trên đĩa; lúc search lấy oversampling × k ứng viên theo vector
+   quantized rồi tính lại điểm bằng vector gốc (rescore)
+
+Query luôn embed đủ chiều (1 lần, cache chung) → mỗi retriever tự cắt theo số chiều
+collection của nó: collection đã / chưa chuyển đổi dùng chung được.
+"""
+import math
+import os
+from typing import List, Optional
+
+from qdrant_client import models
+
+# Mặc định cho processing/migrate_embeddings.py
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "scalar")
+# Lúc search (chỉ áp dụng cho collection có quantization)
+QDRANT_QUANT_RESCORE = os.getenv("QDRANT_QUANT_RESCORE", "1") == "1"
+QDRANT_QUANT_OVERSAMPLING = float(os.getenv("QDRANT_QUANT_OVERSAMPLING", "2"))
+
+QUANTIZATION_MODES = ("none", "scalar", "binary")
+
+
+def fit_dimension(vector: List[float], size: Optional[int]) -> List[float]:
+    """Cắt vector về size chiều đầu + chuẩn hóa L2 (size None / đủ chiều → giữ nguyên)"""
+    if not size or len(vector) <= size:
+        return vector
+    head = vector[:size]
+    norm = math.sqrt(sum(x * x for x in head)) or 1.0
+    return [x / norm for x in head]
+
+
+def quantization_config(mode: str) -> Optional[models.QuantizationConfig]:
+    if mode == "scalar":
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8,
+            quantile=0.99,
+            always_ram=True
+        ))
+    if mode == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    if mode == "none":
+        return None
+    raise ValueError(f"Quantization không hỗ trợ: {mode} (chọn: {', '.join(QUANTIZATION_MODES)})")
+
+
+def quantization_mode(config) -> Optional[str]:
+    """Ngược lại của quantization_config: config trong thông tin collection → tên"""
+    if config is None:
+        return None
+    for mode in ("scalar", "binary", "product"):
+        if getattr(config, mode, None) is not None:
+            return mode
+    return None
+
+
+def search_params(
+    oversampling: float = QDRANT_QUANT_OVERSAMPLING,
+    rescore: bool = QDRANT_QUANT_RESCORE
+) -> models.SearchParams:
+    return models.SearchParams(quantization=models.QuantizationSearchParams(
+        rescore=rescore,
+        oversampling=oversampling
+    ))
@@ -0,0 +1,402 @@
+# vectordb/registry.py
+"""
+Client Qdrant + retriever DÙNG CHUNG cho cả process.
+
+Trước đây mỗi câu hỏi MST tạo QdrantClient mới + gọi collection_exists +
+get_collection (GET / của API cũng vậy) → 3 round trip HTTP thừa và 1 connection
+pool mới mỗi request. Giờ:
+- 1 cặp client (sync + async, keep-alive, REST hoặc gRPC theo QDRANT_PREFER_GRPC)
+  cho mỗi process, tạo lần đầu dùng (sau khi gunicorn fork worker — xem serving/preload.py)
+- Retriever cache theo (collection, k, embedding, cấu hình collection); collection có sparse vector BM25 → hybrid search,
+  đã rút gọn chiều / quantization → cắt vector câu hỏi + rescore (vectordb/quantization.py);
+  k / fetch_k / λ của MMR (vectordb/mmr.py) chỉnh riêng từng collection qua ENV.
+  Retriever giữ lâu dùng live_retriever(): theo thông tin collection mới nhất (LiveRetriever)
+- Kết quả retrieval cache theo câu hỏi chuẩn hóa, hết hiệu lực khi số points / phiên bản ingest
+  của collection đổi (vectordb/result_cache.py)
+- Các giá trị của 1 trường payload (vd metadata.source — văn bản nào có trong collection) lấy bằng
+  facet (cần payload index, processing/create_payload_indexes.py), cache cùng TTL
+- Thông tin collection (tồn tại?, số points, số chiều) cache COLLECTION_INFO_TTL_SECONDS:
+  lần đầu mới chờ kiểm tra; hết hạn → trả bản cũ và làm mới ở nền
+"""
+import asyncio
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from monitoring import metrics
+from vectordb.client import create_qdrant_clients
+from vectordb.quantization import QDRANT_QUANT_OVERSAMPLING, quantization_mode
+from vectordb.result_cache import INGEST_VERSION_KEY, RetrievalCache
+from vectordb.retriever import QdrantRetriever
+from vectordb.sparse import SPARSE_VECTOR_NAME
+
+COLLECTION_INFO_TTL_SECONDS = float(os.getenv("COLLECTION_INFO_TTL_SECONDS", "60"))
+
+# Hybrid dense + sparse (BM25) cho collection đã có sparse vector (processing/backfill_sparse_vectors.py)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+HYBRID_PREFETCH_LIMIT = int(os.getenv("HYBRID_PREFETCH_LIMIT", "20"))
+HYBRID_IDENTIFIER_WEIGHT = float(os.getenv("HYBRID_IDENTIFIER_WEIGHT", "3"))
+
+# MMR: lấy dư RETRIEVAL_FETCH_K ứng viên (kèm vector) rồi chọn k kết quả đa dạng; fetch_k ≤ k → tắt.
+# Riêng từng collection: RETRIEVAL_K__<TÊN>, RETRIEVAL_FETCH_K__<TÊN>, RETRIEVAL_MMR_LAMBDA__<TÊN>
+# (TÊN = tên collection viết hoa, ký tự khác chữ / số → "_", vd RETRIEVAL_FETCH_K__LEGAL_DOCUMENTS=30)
+RETRIEVAL_MMR = os.getenv("RETRIEVAL_MMR", "1") == "1"
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+RETRIEVAL_MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.5"))
+
+RETRIEVAL_CACHE_ENABLED = os.getenv("RETRIEVAL_CACHE_ENABLED", "1") == "1"
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "2000"))
+
+# Số giá trị tối đa lấy về cho 1 trường payload (số văn bản trong collection luật)
+PAYLOAD_FACET_LIMIT = int(os.getenv("PAYLOAD_FACET_LIMIT", "1000"))
+
+
+@dataclass
+class CollectionInfo:
+    name: str
+    exists: bool
+    points_count: int = 0
+    dimension: Optional[int] = None
+    # None = dense vector mặc định (không đặt tên)
+    vector_name: Optional[str] = None
+    sparse_vectors: Tuple[str, ...] = ()
+    # scalar | binary | product | None
+    quantization: Optional[str] = None
+    # metadata[INGEST_VERSION_KEY] của collection (mark_ingested trong vectordb/result_cache.py)
+    ingest_version: Optional[str] = None
+    error: Optional[str] = None
+    checked_at: float = 0.0
+
+    @property
+    def version(self) -> Optional[Tuple]:
+        """Đổi khi dữ liệu collection đổi; None = chưa kiểm tra được"""
+        if self.error or not self.exists:
+            return None
+        return self.points_count, self.ingest_version
+
+    def as_stats(self) -> Dict:
+        """Định dạng cũ của app.get_vectordb_stats"""
+        if self.error:
+            return {"exists": False, "error": self.error}
+        if not self.exists:
+            return {"exists": False, "error": f"Collection '{self.name}' không tồn tại"}
+        return {"exists": True, "total_documents": self.points_count, "dimension": self.dimension}
+
+
+def _dense_vector(info) -> Tuple[Optional[str], Optional[object]]:
+    """(tên, cấu hình) của dense vector; named vectors → lấy vector đầu tiên"""
+    vectors = info.config.params.vectors
+    if isinstance(vectors, dict):
+        return next(iter(vectors.items()), (None, None))
+    return None, vectors
+
+
+def _collection_info(name: str, info) -> CollectionInfo:
+    metrics.gauge("qdrant_collection_points").set(info.points_count or 0, label=name)
+    vector_name, params = _dense_vector(info)
+    # Quantization riêng của vector ưu tiên hơn cấu hình chung của collection
+    quantization = quantization_mode(getattr(params, "quantization_config", None)) or quantization_mode(
+        info.config.quantization_config
+    )
+    return CollectionInfo(
+        name=name,
+        exists=True,
+        points_count=info.points_count or 0,
+        dimension=getattr(params, "size", None),
+        vector_name=vector_name,
+        quantization=quantization,
+        sparse_vectors=tuple(info.config.params.sparse_vectors or {}),
+        ingest_version=(getattr(info.config, "metadata", None) or {}).get(INGEST_VERSION_KEY),
+        checked_at=time.time()
+    )
+
+
+def retrieval_params(collection_name: str, k: int) -> Tuple[int, Optional[int], float]:
+    """(k, fetch_k, λ) của collection; k truyền vào là mặc định của nơi gọi"""
+    suffix = re.sub(r"[^A-Z0-9]", "_", collection_name.upper())
+    k = int(os.getenv(f"RETRIEVAL_K__{suffix}") or k)
+    fetch_k = int(os.getenv(f"RETRIEVAL_FETCH_K__{suffix}") or RETRIEVAL_FETCH_K)
+    mmr_lambda = float(os.getenv(f"RETRIEVAL_MMR_LAMBDA__{suffix}") or RETRIEVAL_MMR_LAMBDA)
+    if not RETRIEVAL_MMR or fetch_k <= k:
+        fetch_k = None
+    return k, fetch_k, mmr_lambda
+
+
+class QdrantRegistry:
+    def __init__(
+        self,
+        url: str,
+        prefer_grpc: Optional[bool] = None,
+        ttl_seconds: float = COLLECTION_INFO_TTL_SECONDS
+    ):
+        self.url = url
+        self.prefer_grpc = prefer_grpc
+        self.ttl_seconds = ttl_seconds
+
+        self._clients: Optional[Tuple] = None
+        self._retrievers: Dict[Tuple, QdrantRetriever] = {}
+        self._infos: Dict[str, CollectionInfo] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        # (collection, trường payload) → (giá trị, thời điểm lấy)
+        self._payload_values: Dict[Tuple[str, str], Tuple[Tuple[str, ...], float]] = {}
+        self._refreshing_values: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.results: Optional[RetrievalCache] = None
+        if RETRIEVAL_CACHE_ENABLED:
+            self.results = RetrievalCache(
+                self.collection_version,
+                self.acollection_version,
+                max_entries=RETRIEVAL_CACHE_MAX_ENTRIES
+            )
+
+    # ---------------- CLIENT ----------------
+    def clients(self):
+        """(QdrantClient, AsyncQdrantClient) dùng chung; prefer_grpc=None → QDRANT_PREFER_GRPC"""
+        with self._lock:
+            if self._clients is None:
+                self._clients = create_qdrant_clients(self.url, prefer_grpc=self.prefer_grpc)
+            return self._clients
+
+    def retriever(self, collection_name: str, embedding, k: int = 4) -> QdrantRetriever:
+        """Hybrid search tự bật khi thông tin collection (đã kiểm tra) có sparse vector SPARSE_VECTOR_NAME"""
+        info = self._infos.get(collection_name)
+        vector_name = info.vector_name if info else None
+        sparse_name = None
+        if HYBRID_SEARCH and info and SPARSE_VECTOR_NAME in info.sparse_vectors:
+            sparse_name = SPARSE_VECTOR_NAME
+
+        dimension = info.dimension if info else None
+        oversampling = QDRANT_QUANT_OVERSAMPLING if info and info.quantization else None
+        k, fetch_k, mmr_lambda = retrieval_params(collection_name, k)
+
+        key = (
+            collection_name, k, fetch_k, mmr_lambda, id(embedding),
+            vector_name, sparse_name, dimension, oversampling
+        )
+        retriever = self._retrievers.get(key)
+        if retriever is None:
+            # Cấu hình collection đổi (số chiều, sparse vector...) → bỏ retriever theo cấu hình cũ
+            for old in [old for old in self._retrievers if old[:5] == key[:5]]:
+                del self._retrievers[old]
+            client, async_client = self.clients()
+            retriever = QdrantRetriever(
+                client=client,
+                async_client=async_client,
+                collection_name=collection_name,
+                embedding=embedding,
+                k=k,
+                vector_name=vector_name,
+                sparse_vector_name=sparse_name,
+                prefetch_limit=HYBRID_PREFETCH_LIMIT,
+                identifier_weight=HYBRID_IDENTIFIER_WEIGHT,
+                vector_size=dimension,
+                oversampling=oversampling,
+                fetch_k=fetch_k,
+                mmr_lambda=mmr_lambda,
+                result_cache=self.results,
+            )
+            self._retrievers[key] = retriever
+        return retriever
+
+    def live_retriever(self, collection_name: str, embedding, k: int = 4) -> "LiveRetriever":
+        """Retriever giữ lâu (app, VSIC 2018): luôn theo thông tin collection mới nhất"""
+        return LiveRetriever(self, collection_name, embedding, k)
+
+    # ---------------- THÔNG TIN COLLECTION ----------------
+    def _fetch(self, name: str) -> CollectionInfo:
+        metrics.counter("qdrant_collection_refresh_total").inc(label=name)
+        client, _ = self.clients()
+        try:
+            return _collection_info(name, client.get_collection(name))
+        except Exception as e:
+            try:
+                if not client.collection_exists(name):
+                    return CollectionInfo(name=name, exists=False, checked_at=time.time())
+            except Exception:
+                pass
+            return CollectionInfo(name=name, exists=False, error=str(e), checked_at=time.time())
+
+    async def _afetch(self, name: str) -> CollectionInfo:
+        metrics.counter("qdrant_collection_refresh_total").inc(label=name)
+        _, async_client = self.clients()
+        try:
+            return _collection_info(name, await async_client.get_collection(name))
+        except Exception as e:
+            try:
+                if not await async_client.collection_exists(name):
+                    return CollectionInfo(name=name, exists=False, checked_at=time.time())
+            except Exception:
+                pass
+            return CollectionInfo(name=name, exists=False, error=str(e), checked_at=time.time())
+
+    def _stale(self, info: CollectionInfo) -> bool:
+        # Lần kiểm tra trước lỗi (Qdrant chập chờn) → thử lại ngay lần sau
+        return info.error is not None or time.time() - info.checked_at > self.ttl_seconds
+
+    def collection_info(self, name: str, refresh: bool = False) -> CollectionInfo:
+        """Bản sync (CLI / lúc khởi động): hết hạn → kiểm tra lại ngay"""
+        info = self._infos.get(name)
+        if info is None or refresh or self._stale(info):
+            info = self._infos[name] = self._fetch(name)
+        return info
+
+    async def acollection_info(self, name: str) -> CollectionInfo:
+        """
+        Bản async (đường phục vụ request): chỉ chờ ở lần kiểm tra ĐẦU TIÊN;
+        hết hạn → trả bản cũ, làm mới ở nền
+        """
+        info = self._infos.get(name)
+        if info is None:
+            info = self._infos[name] = await self._afetch(name)
+        elif self._stale(info) and name not in self._refreshing:
+            self._refreshing[name] = asyncio.ensure_future(self._arefresh(name))
+        return info
+
+    def collection_version(self, name: str) -> Optional[Tuple]:
+        return self.collection_info(name).version
+
+    async def acollection_version(self, name: str) -> Optional[Tuple]:
+        return (await self.acollection_info(name)).version
+
+    async def _arefresh(self, name: str):
+        try:
+            self._infos[name] = await self._afetch(name)
+        finally:
+            self._refreshing.pop(name, None)
+
+    async def arefresh_info(self, name: str) -> CollectionInfo:
+        """Kiểm tra lại ngay (không chờ TTL), vd khi Qdrant từ chối truy vấn"""
+        info = self._infos[name] = await self._afetch(name)
+        return info
+
+
+    # ---------------- GIÁ TRỊ PAYLOAD (FACET) ----------------
+    # Lỗi (thường do thiếu payload index) → () = không lọc theo trường này, thử lại sau TTL
+    def _fetch_values(self, name: str, key: str) -> Tuple[Tuple[str, ...], float]:
+        client, _ = self.clients()
+        try:
+            hits = client.facet(name, key, limit=PAYLOAD_FACET_LIMIT).hits
+        except Exception as e:
+            print(f"⚠️ Không lấy được giá trị '{key}' của {name}: {e}")
+            hits = []
+        return tuple(str(hit.value) for hit in hits), time.time()
+
+    async def _afetch_values(self, name: str, key: str) -> Tuple[Tuple[str, ...], float]:
+        _, async_client = self.clients()
+        try:
+            hits = (await async_client.facet(name, key, limit=PAYLOAD_FACET_LIMIT)).hits
+        except Exception as e:
+            print(f"⚠️ Không lấy được giá trị '{key}' của {name}: {e}")
+            hits = []
+        return tuple(str(hit.value) for hit in hits), time.time()
+
+    def payload_values(self, name: str, key: str) -> Tuple[str, ...]:
+        """Các giá trị khác nhau của trường payload key (vd metadata.source)"""
+        entry = self._payload_values.get((name, key))
+        if entry is None or time.time() - entry[1] > self.ttl_seconds:
+            entry = self._payload_values[(name, key)] = self._fetch_values(name, key)
+        return entry[0]
+
+    async def apayload_values(self, name: str, key: str) -> Tuple[str, ...]:
+        """Bản async: chỉ chờ lần đầu, hết hạn → trả bản cũ, làm mới ở nền"""
+        entry = self._payload_values.get((name, key))
+        if entry is None:
+            entry = self._payload_values[(name, key)] = await self._afetch_values(name, key)
+        elif time.time() - entry[1] > self.ttl_seconds and (name, key) not in self._refreshing_values:
+            self._refreshing_values[(name, key)] = asyncio.ensure_future(self._arefresh_values(name, key))
+        return entry[0]
+
+    async def _arefresh_values(self, name: str, key: str):
+        try:
+            self._payload_values[(name, key)] = await self._afetch_values(name, key)
+        finally:
+            self._refreshing_values.pop((name, key), None)
+
+
+# ===================== RETRIEVER THEO THÔNG TIN MỚI NHẤT =====================
+class LiveRetriever:
+    """
+    Retriever giữ suốt đời process (app.retriever, VSIC 2018) nhưng mỗi lần tìm lấy
+    QdrantRetriever theo thông tin collection HIỆN TẠI của registry (số chiều, sparse vector,
+    quantization), làm mới mỗi COLLECTION_INFO_TTL_SECONDS:
+    - migrate_embeddings.py --swap sang số chiều nhỏ hơn → vector câu hỏi cắt theo số chiều mới
+    - backfill_sparse_vectors.py xong → hybrid search tự bật
+    không cần restart. Qdrant từ chối truy vấn (vd: lệch số chiều, trong lúc thông tin
+    chưa làm mới) → kiểm tra lại collection ngay, cấu hình đổi thì thử lại 1 lần.
+    """
+
+    def __init__(self, registry: QdrantRegistry, collection_name: str, embedding, k: int = 4):
+        self.registry = registry
+        self.collection_name = collection_name
+        self.embedding = embedding
+        self.k = k
+
+    def _current(self) -> QdrantRetriever:
+        return self.registry.retriever(self.collection_name, self.embedding, k=self.k)
+
+    def current(self) -> QdrantRetriever:
+        self.registry.collection_info(self.collection_name)
+        return self._current()
+
+    async def acurrent(self) -> QdrantRetriever:
+        await self.registry.acollection_info(self.collection_name)
+        return self._current()
+
+    def _retry(self, retriever: QdrantRetriever, call):
+        try:
+            return call(retriever)
+        except Exception:
+            self.registry.collection_info(self.collection_name, refresh=True)
+            fresh = self._current()
+            if fresh is retriever:
+                raise
+            metrics.counter("retriever_config_refresh_total").inc(label=self.collection_name)
+            return call(fresh)
+
+    async def _aretry(self, retriever: QdrantRetriever, call):
+        try:
+            return await call(retriever)
+        except Exception:
+            await self.registry.arefresh_info(self.collection_name)
+            fresh = self._current()
+            if fresh is retriever:
+                raise
+            metrics.counter("retriever_config_refresh_total").inc(label=self.collection_name)
+            return await call(fresh)
+
+    # Cùng API với QdrantRetriever mà pipeline / CLI dùng
+    def invoke(self, query: str, config=None, **kwargs):
+        return self._retry(self.current(), lambda r: r.invoke(query, config, **kwargs))
+
+    async def ainvoke(self, query: str, config=None, **kwargs):
+        return await self._aretry(await self.acurrent(), lambda r: r.ainvoke(query, config, **kwargs))
+
+    def search_by_vector(self, vector, **kwargs):
+        return self._retry(self.current(), lambda r: r.search_by_vector(vector, **kwargs))
+
+    async def asearch_by_vector(self, vector, **kwargs):
+        return await self._aretry(await self.acurrent(), lambda r: r.asearch_by_vector(vector, **kwargs))
+
+
+# ===================== SINGLETON (cấu hình qua ENV) =====================
+_registry: Optional[QdrantRegistry] = None
+_registry_pid: Optional[int] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> Optional[QdrantRegistry]:
+    """None nếu thiếu QDRANT_URL"""
+    global _registry, _registry_pid
+    url = os.getenv("QDRANT_URL")
+    if not url:
+        return None
+
+    with _registry_lock:
+        # Process con (fork) không dùng lại socket của process cha
+        if _registry is None or _registry_pid != os.getpid() or _registry.url != url:
+            _registry = QdrantRegistry(url)
+            _registry_pid = os.getpid()
+    return _registry
@@ -0,0 +1,143 @@
+# vectordb/result_cache.py
+"""
+Cache kết quả retrieval trong process: cùng 1 câu hỏi (sau chuẩn hóa) trên cùng collection
+→ không gọi Qdrant lại (mã ngành hay hỏi, "thời gian thử việc"...).
+
+- Key: (collection, câu hỏi chuẩn hóa, k, cấu hình retriever: hybrid / MMR / số chiều...)
+- LRU giới hạn số mục (RETRIEVAL_CACHE_MAX_ENTRIES), không TTL
+- Phiên bản collection = (số points, INGEST_VERSION_KEY trong metadata collection), lấy từ
+  thông tin collection đã cache của registry (làm mới mỗi COLLECTION_INFO_TTL_SECONDS).
+  Phiên bản đổi → bỏ toàn bộ kết quả của collection đó
+- Script ghi dữ liệu vào Qdrant gọi mark_ingested() sau khi ghi: số points không đổi
+  (ghi đè, backfill sparse vector...) vẫn làm mới cache
+- Hit rate theo từng collection: retrieval_cache_hit_ratio{collection}
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from monitoring import metrics
+
+# Key trong metadata của collection Qdrant
+INGEST_VERSION_KEY = "ingest_version"
+
+_TRAILING_PUNCT_RE = re.compile(r"[\s?!.…]+$")
+
+
+def normalize_query(text: str) -> str:
+    """NFC + chữ thường + gộp khoảng trắng + bỏ dấu chấm / hỏi cuối câu"""
+    t = unicodedata.normalize("NFC", text or "").casefold()
+    t = re.sub(r"\s+", " ", t).strip()
+    return _TRAILING_PUNCT_RE.sub("", t)
+
+
+def mark_ingested(client, collection_name: str, version: Optional[str] = None) -> str:
+    """Đánh dấu collection vừa được ghi dữ liệu → cache kết quả của mọi worker hết hiệu lực"""
+    version = version or str(time.time_ns())
+    client.update_collection(collection_name=collection_name, metadata={INGEST_VERSION_KEY: version})
+    return version
+
+
+def _copy(docs: List[Document]) -> List[Document]:
+    # Nơi gọi có thể sửa metadata của Document → không đưa ra bản đang nằm trong cache
+    return [Document(page_content=d.page_content, metadata=dict(d.metadata)) for d in docs]
+
+
+class RetrievalCache:
+    """
+    version_of / aversion_of: collection → phiên bản hiện tại (None = chưa biết / lỗi → không cache)
+    """
+
+    def __init__(
+        self,
+        version_of: Callable[[str], Optional[Hashable]],
+        aversion_of: Callable[[str], Awaitable[Optional[Hashable]]],
+        max_entries: int = 2000
+    ):
+        self.version_of = version_of
+        self.aversion_of = aversion_of
+        self.max_entries = max_entries
+
+        self._items: "OrderedDict[tuple, List[Document]]" = OrderedDict()
+        self._versions: Dict[str, Hashable] = {}
+        # collection → [hit, lookup]
+        self._stats: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(collection_name: str, query: str, k: int, settings: tuple = ()) -> tuple:
+        return collection_name, normalize_query(query), k, settings
+
+    # ---------------- LOOKUP / STORE ----------------
+    def lookup(self, key: tuple) -> Tuple[Optional[List[Document]], Optional[Hashable]]:
+        """(kết quả | None, phiên bản collection — truyền lại cho store)"""
+        return self._lookup(key, self.version_of(key[0]))
+
+    async def alookup(self, key: tuple) -> Tuple[Optional[List[Document]], Optional[Hashable]]:
+        return self._lookup(key, await self.aversion_of(key[0]))
+
+    def _lookup(self, key: tuple, version: Optional[Hashable]):
+        collection = key[0]
+        if version is None:
+            return None, None
+        with self._lock:
+            self._check_version(collection, version)
+            docs = self._items.get(key)
+            if docs is not None:
+                self._items.move_to_end(key)
+            stats = self._stats.setdefault(collection, [0, 0])
+            stats[0] += docs is not None
+            stats[1] += 1
+            hit_ratio = stats[0] / stats[1]
+
+        metrics.counter("retrieval_cache_hits_total" if docs is not None else "retrieval_cache_misses_total").inc(
+            label=collection
+        )
+        metrics.gauge("retrieval_cache_hit_ratio").set(hit_ratio, label=collection)
+        return (_copy(docs) if docs is not None else None), version
+
+    def store(self, key: tuple, version: Optional[Hashable], docs: List[Document]):
+        if version is None:
+            return
+        with self._lock:
+            # Phiên bản đã đổi trong lúc đang search → kết quả có thể cũ, không lưu
+            if self._versions.get(key[0]) != version:
+                return
+            self._items[key] = _copy(docs)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+            size = len(self._items)
+        metrics.gauge("retrieval_cache_entries").set(size)
+
+    def _check_version(self, collection: str, version: Hashable):
+        """Gọi khi đang giữ _lock"""
+        previous = self._versions.get(collection)
+        if previous == version:
+            return
+        self._versions[collection] = version
+        if previous is None:
+            return
+        stale = [key for key in self._items if key[0] == collection]
+        for key in stale:
+            del self._items[key]
+        metrics.counter("retrieval_cache_invalidations_total").inc(label=collection)
+        print(f"♻️ Collection '{collection}' đổi phiên bản {previous} → {version}: bỏ {len(stale)} kết quả cache")
+
+    def invalidate(self, collection_name: Optional[str] = None):
+        with self._lock:
+            if collection_name is None:
+                self._items.clear()
+                self._versions.clear()
+                return
+            for key in [key for key in self._items if key[0] == collection_name]:
+                del self._items[key]
+            self._versions.pop(collection_name, None)
+
+    def __len__(self):
+        return len(self._items)
@@ -0,0 +1,220 @@
+# vectordb/retriever.py
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+from pydantic import ConfigDict
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from qdrant_client import models
+
+from monitoring import metrics
+from vectordb.mmr import mmr_select
+from vectordb.quantization import fit_dimension, search_params
+from vectordb.sparse import encode_query, has_legal_identifier
+
+# Cùng payload key với langchain_qdrant.QdrantVectorStore (dữ liệu đã ingest sẵn)
+CONTENT_KEY = "page_content"
+METADATA_KEY = "metadata"
+
+
+def points_to_documents(points) -> List[Document]:
+    docs = []
+    for p in points:
+        payload = p.payload or {}
+        docs.append(Document(
+            page_content=payload.get(CONTENT_KEY, "") or "",
+            metadata=payload.get(METADATA_KEY, {}) or {}
+        ))
+    return docs
+
+
+class QdrantRetriever(BaseRetriever):
+    """
+    Retriever Qdrant hỗ trợ cả sync lẫn async:
+    - invoke()  → QdrantClient + embed_query
+    - ainvoke() → AsyncQdrantClient + aembed_query (không chặn event loop)
+
+    Thay cho QdrantVectorStore.as_retriever(), vốn chỉ có client sync và
+    chạy bản async bằng run_in_executor.
+
+    sparse_vector_name: collection có sparse vector BM25 (vectordb/sparse.py) → hybrid search:
+    dense + sparse mỗi bên lấy prefetch_limit ứng viên, Qdrant gộp bằng RRF. Câu hỏi có định
+    danh chính xác ("Điều 35", "145/2020/NĐ-CP", mã ngành) → sparse có trọng số identifier_weight.
+
+    vector_size: số chiều dense vector của collection; vector câu hỏi dài hơn → cắt + chuẩn hóa
+    (collection đã rút gọn chiều, xem vectordb/quantization.py).
+    oversampling: collection có quantization → lấy oversampling × k ứng viên, rescore bằng vector gốc.
+
+    fetch_k > k: lấy fetch_k ứng viên kèm dense vector rồi chọn k kết quả bằng MMR (vectordb/mmr.py),
+    mmr_lambda = 1 → chỉ xét độ liên quan, 0 → chỉ xét độ khác biệt.
+
+    result_cache (vectordb/result_cache.py): kết quả theo câu hỏi chuẩn hóa (cần query_text).
+
+    query_filter: lọc theo payload (vd metadata.source của 1 văn bản luật); không có kết quả nào
+    → tìm lại không lọc.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    client: Any
+    async_client: Optional[Any] = None
+    collection_name: str
+    embedding: Embeddings
+    k: int = 4
+    vector_name: Optional[str] = None
+    sparse_vector_name: Optional[str] = None
+    prefetch_limit: int = 20
+    identifier_weight: float = 3.0
+    vector_size: Optional[int] = None
+    oversampling: Optional[float] = None
+    fetch_k: Optional[int] = None
+    mmr_lambda: float = 0.5
+    result_cache: Optional[Any] = None
+
+    # ---------------- SEARCH THEO VECTOR ----------------
+    def _use_mmr(self, k: int) -> bool:
+        return bool(self.fetch_k) and self.fetch_k > k
+
+    def _query_kwargs(
+        self, vector: List[float], k: Optional[int], query_text: Optional[str], query_filter=None
+    ):
+        k = k or self.k
+        kwargs = dict(collection_name=self.collection_name, limit=k, with_payload=True, query_filter=query_filter)
+        if self._use_mmr(k):
+            kwargs.update(limit=self.fetch_k, with_vectors=[self.vector_name] if self.vector_name else True)
+        vector = fit_dimension(vector, self.vector_size)
+        params = search_params(self.oversampling) if self.oversampling else None
+        if not (self.sparse_vector_name and query_text):
+            return dict(kwargs, query=vector, using=self.vector_name, search_params=params)
+
+        limit = max(self.prefetch_limit, kwargs["limit"])
+        weights = None
+        if self.identifier_weight != 1 and has_legal_identifier(query_text):
+            weights = [1.0, self.identifier_weight]
+        return dict(
+            kwargs,
+            prefetch=[
+                models.Prefetch(query=vector, using=self.vector_name, limit=limit, params=params, filter=query_filter),
+                models.Prefetch(
+                    query=encode_query(query_text), using=self.sparse_vector_name, limit=limit, filter=query_filter
+                ),
+            ],
+            query=models.RrfQuery(rrf=models.Rrf(weights=weights)) if weights else models.FusionQuery(
+                fusion=models.Fusion.RRF
+            ),
+        )
+
+    def _cache_key(self, query_text: Optional[str], k: Optional[int], query_filter=None):
+        if self.result_cache is None or not query_text:
+            return None
+        settings = (
+            self.vector_name, self.sparse_vector_name, self.prefetch_limit, self.identifier_weight,
+            self.vector_size, self.oversampling, self.fetch_k, self.mmr_lambda,
+            query_filter.model_dump_json(exclude_none=True) if query_filter is not None else None
+        )
+        return self.result_cache.key(self.collection_name, query_text, k or self.k, settings)
+
+    def _cached(
+        self, query_text: Optional[str], k: Optional[int], query_filter, search: Callable[[], List[Document]]
+    ):
+        key = self._cache_key(query_text, k, query_filter)
+        if key is None:
+            return search()
+        docs, version = self.result_cache.lookup(key)
+        if docs is None:
+            docs = search()
+            self.result_cache.store(key, version, docs)
+        return docs
+
+    async def _acached(
+        self, query_text: Optional[str], k: Optional[int], query_filter,
+        search: Callable[[], Awaitable[List[Document]]]
+    ):
+        key = self._cache_key(query_text, k, query_filter)
+        if key is None:
+            return await search()
+        docs, version = await self.result_cache.alookup(key)
+        if docs is None:
+            docs = await search()
+            self.result_cache.store(key, version, docs)
+        return docs
+
+    def search_by_vector(
+        self, vector: List[float], k: Optional[int] = None, query_text: Optional[str] = None,
+        query_filter: Optional[models.Filter] = None
+    ) -> List[Document]:
+        """query_text: câu hỏi gốc (cần cho hybrid search và cache kết quả; None → chỉ dense)"""
+        return self._cached(
+            query_text, k, query_filter, lambda: self._search(vector, k, query_text, query_filter)
+        )
+
+    async def asearch_by_vector(
+        self, vector: List[float], k: Optional[int] = None, query_text: Optional[str] = None,
+        query_filter: Optional[models.Filter] = None
+    ) -> List[Document]:
+        return await self._acached(
+            query_text, k, query_filter, lambda: self._asearch(vector, k, query_text, query_filter)
+        )
+
+    def _search(
+        self, vector: List[float], k: Optional[int], query_text: Optional[str], query_filter=None
+    ) -> List[Document]:
+        res = self.client.query_points(**self._query_kwargs(vector, k, query_text, query_filter))
+        if query_filter is not None and self._filter_fallback(res.points):
+            res = self.client.query_points(**self._query_kwargs(vector, k, query_text))
+        return points_to_documents(self._select(res.points, k))
+
+    async def _asearch(
+        self, vector: List[float], k: Optional[int], query_text: Optional[str], query_filter=None
+    ) -> List[Document]:
+        if self.async_client is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._search, vector, k, query_text, query_filter)
+
+        res = await self.async_client.query_points(**self._query_kwargs(vector, k, query_text, query_filter))
+        if query_filter is not None and self._filter_fallback(res.points):
+            res = await self.async_client.query_points(**self._query_kwargs(vector, k, query_text))
+        return points_to_documents(self._select(res.points, k))
+
+    def _filter_fallback(self, points) -> bool:
+        """Lọc payload không còn kết quả nào → tìm lại không lọc"""
+        metrics.counter("retrieval_filter_total").inc(label="fallback" if not points else "filtered")
+        return not points
+
+    def _select(self, points, k: Optional[int]):
+        """MMR trên các ứng viên đã lấy dư; point thiếu vector → giữ thứ tự của Qdrant"""
+        k = k or self.k
+        if not self._use_mmr(k) or len(points) <= k:
+            return points[:k]
+        vectors = []
+        for p in points:
+            v = p.vector.get(self.vector_name or "") if isinstance(p.vector, dict) else p.vector
+            if not v:
+                return points[:k]
+            vectors.append(v)
+        return [points[i] for i in mmr_select([p.score for p in points], vectors, k, self.mmr_lambda)]
+
+    # ---------------- LANGCHAIN RETRIEVER API ----------------
+    # Tra cache trước khi embed: trúng cache thì không cần vector
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun,
+        query_filter: Optional[models.Filter] = None
+    ) -> List[Document]:
+        def search():
+            return self._search(self.embedding.embed_query(query), None, query, query_filter)
+
+        return self._cached(query, None, query_filter, search)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun,
+        query_filter: Optional[models.Filter] = None
+    ) -> List[Document]:
+        async def search():
+            return await self._asearch(await self.embedding.aembed_query(query), None, query, query_filter)
+
+        return await self._acached(query, None, query_filter, search)
@@ -0,0 +1,122 @@
+# vectordb/sparse.py
+"""
+Sparse vector kiểu BM25 cho văn bản pháp luật tiếng Việt (hybrid search).
+
+Dense search (embedding) hay trượt các định danh chính xác: "Điều 35",
+"BHXH", "145/2020/NĐ-CP", mã ngành "46510"... Sparse vector giữ nguyên từng token:
+- Token: âm tiết + cặp âm tiết liền nhau (từ ghép tiếng Việt: "bảo hiểm", "thử việc")
+- Định danh pháp luật giữ thành 1 token: "điều 35", "khoản 2", "145/2020/nđ-cp"
+- Viết tắt thông dụng mở rộng thêm dạng đầy đủ (bhxh → bảo hiểm xã hội) ở cả 2 phía
+- Index token = crc32 (ổn định giữa các process / lần ingest, không cần lưu từ điển)
+
+Trọng số: tài liệu dùng phần TF của BM25 (k1, b, độ dài tài liệu trung bình);
+câu hỏi mỗi token = 1. IDF do Qdrant tính (sparse vector cấu hình modifier=IDF).
+"""
+import os
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Dict, List
+
+from qdrant_client import models
+
+SPARSE_VECTOR_NAME = os.getenv("QDRANT_SPARSE_VECTOR_NAME", "bm25")
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Độ dài trung bình (số token) của 1 chunk; backfill tính lại từ dữ liệu thật
+BM25_AVG_DOC_TOKENS = float(os.getenv("BM25_AVG_DOC_TOKENS", "300"))
+
+# Điều / khoản / chương... + số (La Mã hoặc Ả Rập)
+_STRUCTURE_RE = re.compile(r"\b(điều|khoản|điểm|chương|mục|phụ lục)\s+(\d+[a-zđ]?|[ivxlc]+)\b")
+# Số hiệu văn bản: 145/2020/nđ-cp, 36/2025/qđ-ttg, 10/2012/qh13
+_DOC_NUMBER_RE = re.compile(r"\b\d+/\d{4}/[a-zđ0-9]+(?:-[a-zđ0-9]+)*")
+# Mã ngành VSIC / mã 4-5 chữ số
+_CODE_RE = re.compile(r"\b\d{4,5}\b")
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Hư từ quá phổ biến, không giúp phân biệt tài liệu
+STOPWORDS = frozenset({
+    "và", "của", "là", "các", "những", "được", "cho", "trong", "theo", "với",
+    "này", "để", "từ", "về", "khi", "thì", "một", "có", "tại", "do", "hoặc",
+    "the", "of", "and", "to", "in", "a", "is", "for",
+})
+
+# Viết tắt ↔ dạng đầy đủ: tài liệu viết "bảo hiểm xã hội", người hỏi gõ "bhxh" (và ngược lại)
+ABBREVIATIONS: Dict[str, str] = {
+    "bhxh": "bảo hiểm xã hội",
+    "bhyt": "bảo hiểm y tế",
+    "bhtn": "bảo hiểm thất nghiệp",
+    "hđlđ": "hợp đồng lao động",
+    "nlđ": "người lao động",
+    "nsdlđ": "người sử dụng lao động",
+    "kcn": "khu công nghiệp",
+    "ccn": "cụm công nghiệp",
+    "mst": "mã số thuế",
+    "tndn": "thu nhập doanh nghiệp",
+    "tncn": "thu nhập cá nhân",
+    "gtgt": "giá trị gia tăng",
+    "vsic": "hệ thống ngành kinh tế",
+}
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFC", (text or "").lower())
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text)
+
+
+def _unigrams_bigrams(words: List[str]) -> List[str]:
+    tokens = [w for w in words if w not in STOPWORDS]
+    tokens += [f"{a} {b}" for a, b in zip(words, words[1:]) if a not in STOPWORDS and b not in STOPWORDS]
+    return tokens
+
+
+def tokenize(text: str) -> List[str]:
+    """Token của 1 văn bản (có lặp lại — dùng để đếm TF)"""
+    t = _normalize(text)
+    words = _words(t)
+
+    tokens = [f"{kind} {num}" for kind, num in _STRUCTURE_RE.findall(t)]
+    tokens += _DOC_NUMBER_RE.findall(t)
+    tokens += _unigrams_bigrams(words)
+    for w in words:
+        if w in ABBREVIATIONS:
+            tokens += _unigrams_bigrams(ABBREVIATIONS[w].split())
+    return tokens
+
+
+def has_legal_identifier(text: str) -> bool:
+    """Câu hỏi có định danh chính xác (điều/khoản, số hiệu văn bản, mã 4-5 chữ số)"""
+    t = _normalize(text)
+    return bool(_STRUCTURE_RE.search(t) or _DOC_NUMBER_RE.search(t) or _CODE_RE.search(t))
+
+
+def _token_index(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8")) & 0x7FFFFFFF
+
+
+def _to_sparse(weights: Dict[int, float]) -> models.SparseVector:
+    indices = sorted(weights)
+    return models.SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+
+def encode_document(text: str, avg_doc_tokens: float = BM25_AVG_DOC_TOKENS) -> models.SparseVector:
+    tokens = tokenize(text)
+    doc_len = len(tokens) or 1
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / avg_doc_tokens)
+    weights: Dict[int, float] = Counter()
+    for token, tf in Counter(tokens).items():
+        # Trùng index (crc32) → cộng dồn
+        weights[_token_index(token)] += tf * (BM25_K1 + 1) / (tf + norm)
+    return _to_sparse(weights)
+
+
+def encode_query(text: str) -> models.SparseVector:
+    return _to_sparse({_token_index(token): 1.0 for token in set(tokenize(text))})
+
+
+def sparse_vector_params() -> models.SparseVectorParams:
+    return models.SparseVectorParams(modifier=models.Modifier.IDF)